@@ -0,0 +1,262 @@
+# Wczytywanie audio – każdy plik dekodowany jest raz do bufora w pamięci (mono, float32, 16000 Hz).
+#
+# Ten sam bufor trafia do Whispera i do enkodera mówców (resemblyzer), więc nie ma
+# ponownego dekodowania, resamplingu ani plików pośrednich na dysku
+# (chyba że użytkownik poprosi o zapis – save_wav). Wyjątek: tryb strumieniowy z diaryzacją dekoduje
+# nagranie raz do pliku PCM 16 kHz (PcmFile), z którego czytają fragmentami Whisper i enkoder mówców.
+# librosa (z numbą), moviepy i pydub importowane są dopiero przy użyciu ścieżek zapasowych –
+# zwykłe dekodowanie przez ffmpeg nie płaci za ich import.
+
+import os
+import time
+import shutil
+import logging
+import subprocess
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger("TranscriptionApp")
+
+# Częstotliwość próbkowania oczekiwana przez Whisper i resemblyzer.
+SAMPLE_RATE = 16000
+# Rozmiar porcji odczytywanej z potoku ffmpeg (1 MiB ≈ 33 s audio 16 kHz s16le).
+PIPE_CHUNK_BYTES = 1 << 20
+
+# Ścieżka do ffmpeg – z PATH, a w razie braku binarka dostarczana z imageio-ffmpeg (zależność moviepy).
+def get_ffmpeg_exe():
+    exe = shutil.which("ffmpeg")
+    if exe:
+        return exe
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+# Strumieniowe dekodowanie przez ffmpeg: tylko pierwsza ścieżka audio (bez dekodowania klatek wideo),
+# od razu mono PCM 16 kHz przez potok – bez pliku pośredniego.
+# Zwraca (audio, statystyki) – bajty wejścia, bajty PCM, sekundy audio i czas wykonania.
+def decode_ffmpeg(file_path, sr=SAMPLE_RATE):
+    cmd = [
+        get_ffmpeg_exe(), "-nostdin", "-loglevel", "error", "-threads", "0",
+        "-i", file_path,
+        "-map", "0:a:0", "-vn", "-sn", "-dn",
+        "-ac", "1", "-ar", str(sr), "-f", "s16le", "-acodec", "pcm_s16le", "-",
+    ]
+    start = time.time()
+    pcm = bytearray()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            chunk = process.stdout.read(PIPE_CHUNK_BYTES)
+            if not chunk:
+                break
+            pcm.extend(chunk)
+        stderr = process.stderr.read()
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+        process.wait()
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg zakończył się kodem {process.returncode}: {stderr.decode('utf-8', errors='replace').strip()}")
+    audio = np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+    stats = {
+        "method": "ffmpeg",
+        "input_bytes": os.path.getsize(file_path),
+        "pcm_bytes": len(pcm),
+        "audio_seconds": len(audio) / sr,
+        "elapsed_seconds": time.time() - start,
+    }
+    return audio, stats
+
+# Dekodowanie strumieniowe w oknach: generator zwraca kolejne fragmenty mono float32 16 kHz
+# o długości window_seconds (ostatni może być krótszy). W pamięci jest naraz tylko jedno okno.
+# start_seconds > 0 rozpoczyna odczyt od wskazanego miejsca (wznawianie z punktu kontrolnego).
+def stream_ffmpeg_windows(file_path, window_seconds, sr=SAMPLE_RATE, start_seconds=0.0):
+    seek = ["-ss", f"{start_seconds:.3f}"] if start_seconds > 0 else []
+    cmd = [
+        get_ffmpeg_exe(), "-nostdin", "-loglevel", "error", "-threads", "0",
+        *seek, "-i", file_path,
+        "-map", "0:a:0", "-vn", "-sn", "-dn",
+        "-ac", "1", "-ar", str(sr), "-f", "s16le", "-acodec", "pcm_s16le", "-",
+    ]
+    window_bytes = int(window_seconds * sr) * 2
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    finished = False
+    try:
+        while True:
+            data = process.stdout.read(window_bytes)
+            if not data:
+                break
+            # Nieparzysta liczba bajtów może wystąpić tylko na samym końcu strumienia.
+            data = data[:len(data) - len(data) % 2]
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+        stderr = process.stderr.read()
+        finished = True
+    finally:
+        # Przerwanie generatora (np. anulowanie) – kończymy ffmpeg, zamiast czekać na resztę pliku.
+        if not finished:
+            process.kill()
+        process.stdout.close()
+        process.stderr.close()
+        process.wait()
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg zakończył się kodem {process.returncode}: {stderr.decode('utf-8', errors='replace').strip()}")
+
+# Okna z bufora już wczytanego do pamięci (widoki, bez kopiowania), od start_seconds.
+def iter_buffer_windows(audio, window_seconds, sr=SAMPLE_RATE, start_seconds=0.0):
+    window = int(window_seconds * sr)
+    for start in range(int(start_seconds * sr), len(audio), window):
+        yield audio[start:start + window]
+
+# Plik PCM mono 16 kHz 16-bit bez nagłówka (s16le) czytany przez mapowanie pamięci – system wczytuje tylko
+# odczytywane fragmenty, więc zajęta pamięć nie zależy od długości nagrania (tryb strumieniowy z diaryzacją).
+class PcmFile:
+    def __init__(self, path, sr=SAMPLE_RATE):
+        self.path = path
+        self.sr = sr
+        size = os.path.getsize(path) // 2
+        self._data = np.memmap(path, dtype=np.int16, mode="r", shape=(size,)) if size else np.zeros(0, np.int16)
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def duration(self):
+        return len(self) / self.sr
+
+    # Próbki [start, stop) jako float32; fragmenty poza nagraniem (także ujemne indeksy) wypełniane są zerami.
+    def read(self, start, stop):
+        out = np.zeros(max(0, stop - start), dtype=np.float32)
+        lo, hi = max(start, 0), min(stop, len(self))
+        if hi > lo:
+            out[lo - start:hi - start] = self._data[lo:hi] / np.float32(32768.0)
+        return out
+
+    # Kolejne fragmenty po block_seconds (jak iter_buffer_windows), od start_seconds.
+    def blocks(self, block_seconds, start_seconds=0.0):
+        block = int(block_seconds * self.sr)
+        for start in range(int(start_seconds * self.sr), len(self), block):
+            yield self.read(start, min(start + block, len(self)))
+
+    # Zwalnia mapowanie (w Windows plik nie może zostać usunięty, dopóki jest zmapowany).
+    def close(self):
+        self._data = np.zeros(0, np.int16)
+
+# Próbki [start, stop) z bufora w pamięci lub z PcmFile – z zerami poza zakresem nagrania.
+def read_samples(audio, start, stop):
+    if isinstance(audio, PcmFile):
+        return audio.read(start, stop)
+    out = np.zeros(max(0, stop - start), dtype=np.float32)
+    lo, hi = max(start, 0), min(stop, len(audio))
+    if hi > lo:
+        out[lo - start:hi - start] = audio[lo:hi]
+    return out
+
+# Dekodowanie ffmpeg prosto do pliku PCM (bez potoku i bez bufora w pamięci). Zapis do pliku tymczasowego
+# i zmiana nazwy – istniejący plik jest zawsze kompletny i można go użyć ponownie przy wznowieniu.
+# Zwraca (PcmFile, statystyki) jak decode_ffmpeg.
+def decode_ffmpeg_to_pcm(file_path, pcm_path, sr=SAMPLE_RATE):
+    start = time.time()
+    tmp_path = f"{pcm_path}.tmp"
+    cmd = [
+        get_ffmpeg_exe(), "-nostdin", "-loglevel", "error", "-threads", "0", "-y",
+        "-i", file_path,
+        "-map", "0:a:0", "-vn", "-sn", "-dn",
+        "-ac", "1", "-ar", str(sr), "-f", "s16le", "-acodec", "pcm_s16le", tmp_path,
+    ]
+    process = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg zakończył się kodem {process.returncode}: {process.stderr.decode('utf-8', errors='replace').strip()}")
+    os.replace(tmp_path, pcm_path)
+    pcm = PcmFile(pcm_path, sr=sr)
+    stats = {
+        "method": "ffmpeg (plik PCM)",
+        "input_bytes": os.path.getsize(file_path),
+        "pcm_bytes": os.path.getsize(pcm_path),
+        "audio_seconds": pcm.duration,
+        "elapsed_seconds": time.time() - start,
+    }
+    return pcm, stats
+
+# Dotychczasowa ścieżka dla wideo: moviepy zapisuje pełny WAV do folderu tymczasowego, potem dekodowanie.
+# Zostawiona do porównania z decode_ffmpeg na tym samym pliku (te same statystyki).
+def extract_audio_moviepy(file_path, temp_dir, sr=SAMPLE_RATE):
+    import librosa
+    import moviepy.editor as mp
+    start = time.time()
+    os.makedirs(temp_dir, exist_ok=True)
+    base, _ = os.path.splitext(os.path.basename(file_path))
+    wav_path = os.path.join(temp_dir, base + ".wav")
+    video = mp.VideoFileClip(file_path)
+    try:
+        video.audio.write_audiofile(wav_path, logger=None)
+    finally:
+        video.close()
+    logger.info(f"Audio zapisane do: {wav_path}")
+    audio, _ = librosa.load(wav_path, sr=sr, mono=True)
+    audio = audio.astype(np.float32)
+    stats = {
+        "method": "moviepy",
+        "input_bytes": os.path.getsize(file_path),
+        "pcm_bytes": os.path.getsize(wav_path),
+        "audio_seconds": len(audio) / sr,
+        "elapsed_seconds": time.time() - start,
+    }
+    return audio, stats
+
+# Czytelny opis statystyk wyodrębniania do logu.
+def format_extraction_stats(stats):
+    speed = stats["audio_seconds"] / stats["elapsed_seconds"] if stats["elapsed_seconds"] > 0 else 0.0
+    return (f"{stats['method']}: wejście {stats['input_bytes'] / 1e6:.1f} MB, "
+            f"PCM {stats['pcm_bytes'] / 1e6:.1f} MB, {stats['audio_seconds']:.1f} s audio "
+            f"w {stats['elapsed_seconds']:.2f} s ({speed:.0f}x czasu rzeczywistego)")
+
+# Dekoduje plik do mono float32 16 kHz. Najpierw ffmpeg (jedno dekodowanie z resamplingiem),
+# w razie błędu librosa (soundfile/audioread), a na końcu pydub.
+def load_audio(file_path, sr=SAMPLE_RATE):
+    errors = []
+    try:
+        audio, _ = decode_ffmpeg(file_path, sr=sr)
+        return audio
+    except Exception as e:
+        errors.append(f"ffmpeg: {str(e)}")
+        logger.warning(f"Dekodowanie ffmpeg nie powiodło się, próbuję librosa: {str(e)}")
+    try:
+        import librosa
+        y, _ = librosa.load(file_path, sr=sr, mono=True)
+        return y.astype(np.float32)
+    except Exception as e:
+        errors.append(f"librosa: {str(e)}")
+        logger.warning(f"Dekodowanie librosa nie powiodło się, próbuję pydub: {str(e)}")
+    try:
+        from pydub import AudioSegment
+        segment = AudioSegment.from_file(file_path).set_channels(1).set_frame_rate(sr)
+        samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+        return samples / float(1 << (8 * segment.sample_width - 1))
+    except Exception as e:
+        errors.append(f"pydub: {str(e)}")
+    raise Exception(f"Nie można zdekodować audio: {'; '.join(errors)}")
+
+# Weryfikacja bufora w pamięci (zamiast ponownego wczytywania pliku).
+def validate_audio(audio, sr=SAMPLE_RATE):
+    if audio is None or len(audio) == 0:
+        raise Exception("Plik audio jest pusty.")
+    if not np.all(np.isfinite(audio)):
+        raise Exception("Plik audio zawiera nieprawidłowe próbki (NaN/Inf).")
+    if not np.any(audio):
+        logger.warning("Plik audio zawiera wyłącznie ciszę.")
+    logger.info(f"Audio wczytane do pamięci: {len(audio) / sr:.1f} s, {sr} Hz, mono.")
+
+# Zapis bufora jako WAV PCM 16-bit – tylko na życzenie użytkownika.
+def save_wav(path, audio, sr=SAMPLE_RATE):
+    sf.write(path, audio, sr, subtype="PCM_16")
+
+# Szacowany czas trwania pliku w sekundach bez dekodowania – do kolejności plików w partii i postępu.
+# Gdy soundfile nie potrafi odczytać nagłówka (np. wideo), przyjmujemy ~128 kbit/s z rozmiaru pliku.
+def estimate_duration(file_path):
+    try:
+        return sf.info(file_path).duration
+    except Exception:
+        try:
+            return os.path.getsize(file_path) / 16000
+        except OSError:
+            return 0.0
@@ -0,0 +1,307 @@
+# Benchmark etapów przetwarzania – do doboru sprzętu i wykrywania regresji wydajności przed wydaniem.
+#
+# Przykład:
+#   python -m benchmark --models tiny base small --durations 30 120 600
+#   python -m benchmark --models base --sources test --compare benchmark_results/benchmark_20260101_120000.json
+#
+# Każdy przebieg (źródło × długość × model) działa w osobnym procesie w trybie CPU, więc ładowanie modelu
+# jest "na zimno", a szczytowe zużycie pamięci (RSS) dotyczy tylko tego przebiegu. Mierzone etapy:
+#   probe      – odczyt nagłówka i długości pliku (audio.estimate_duration),
+#   decode     – dekodowanie i resampling do mono 16 kHz (ffmpeg, jak w silniku),
+#   model_load – ładowanie Whispera, encoder_load – ładowanie enkodera głosu,
+#   transcribe – dekodowanie Whisperem, embedding – osadzenia głosu, clustering – klastrowanie mówców,
+#   assignment – przypisanie mówców do segmentów, export – zapis wszystkich formatów (export.py).
+# Źródła: "synthetic" (wygenerowany sygnał o cechach mowy dwóch mówców, WAV 44,1 kHz stereo – resampling
+# jest rzeczywiście wykonywany) oraz "test" (nagranie z folderu test/ zapętlone do zadanej długości).
+# Wynik zapisywany jest jako JSON (benchmark_results/benchmark_<data>.json) razem z wersjami bibliotek.
+# --startup dodaje pomiar czasu uruchomienia: import modułów CLI/silnika w świeżym procesie (z listą
+# ciężkich bibliotek, które zostały przy tym zaimportowane – powinna być pusta) oraz czas do pokazania okna GUI.
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+
+import numpy as np
+
+from audio import SAMPLE_RATE, get_ffmpeg_exe
+from metrics import peak_rss_mb
+
+logger = logging.getLogger("TranscriptionApp")
+
+BENCHMARK_FORMAT_VERSION = 1
+DEFAULT_OUTPUT_DIR = "benchmark_results"
+TEST_SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test",
+                           "Pierwsze_slowa_Jana_Pawla_II_do_Rodakow — kopia.mp3")
+SOURCES = ["synthetic", "test"]
+# Częstotliwość i liczba kanałów pliku syntetycznego – inne niż 16 kHz mono, aby mierzyć resampling.
+SYNTHETIC_SAMPLE_RATE = 44100
+# Etap jest uznawany za regresję, gdy jest wolniejszy o więcej niż ten ułamek (przy --compare).
+DEFAULT_REGRESSION_THRESHOLD = 0.15
+# Krótsze etapy (sekundy) nie są porównywane – różnice to głównie szum pomiaru.
+MIN_COMPARED_SECONDS = 0.5
+# Moduły uruchamiane przy pomiarze startu i biblioteki, których import przy starcie jest regresją.
+STARTUP_MODULES = ["cli", "engine"]
+HEAVY_MODULES = ["torch", "whisper", "resemblyzer", "spectralcluster", "librosa", "moviepy", "pydub"]
+STARTUP_SNIPPET = ("import sys, time, json; start = time.perf_counter(); import {module}; "
+                   "print(json.dumps({{'seconds': time.perf_counter() - start, "
+                   "'heavy_modules': [m for m in {heavy!r} if m in sys.modules]}}))")
+
+# Sygnał o cechach mowy: naprzemienne wypowiedzi dwóch "mówców" (różna wysokość tonu), harmoniczne
+# z intonacją, obwiednia sylab ~4 Hz, szum spółgłosek i przerwy między wypowiedziami. Powtarzalny (seed).
+def synthetic_speech(duration, sr=SAMPLE_RATE, speakers=(115.0, 205.0), seed=0):
+    rng = np.random.default_rng(seed)
+    total = int(duration * sr)
+    audio = np.zeros(total, dtype=np.float32)
+    pos = 0
+    turn = 0
+    while pos < total:
+        n = min(int(rng.uniform(2.0, 6.0) * sr), total - pos)
+        t = np.arange(n) / sr
+        f0 = speakers[turn % len(speakers)]
+        pitch = f0 * (1.0 + 0.08 * np.sin(2 * np.pi * rng.uniform(0.3, 1.5) * t + rng.uniform(0, 2 * np.pi)))
+        phase = 2 * np.pi * np.cumsum(pitch) / sr
+        voiced = np.zeros(n)
+        for k in range(1, 16):
+            voiced += np.sin(k * phase) * np.exp(-k / (4.0 + turn % len(speakers)))
+        syllables = np.sin(np.pi * rng.uniform(3.5, 5.0) * t) ** 2
+        noise = np.convolve(rng.standard_normal(n), np.ones(4) / 4, mode="same") * (1.0 - syllables)
+        audio[pos:pos + n] = (0.25 * voiced * syllables + 0.03 * noise).astype(np.float32)
+        pos += n + int(rng.uniform(0.3, 1.0) * sr)
+        turn += 1
+    peak = np.abs(audio).max()
+    return audio / peak * 0.8 if peak > 0 else audio
+
+# Plik wejściowy przebiegu o zadanej długości. Nagranie testowe jest zapętlane przez ffmpeg bez ponownego
+# kodowania (-c copy), więc dekodowanie mierzy rzeczywisty koszt MP3.
+def prepare_input(source, duration, work_dir):
+    if source == "synthetic":
+        import soundfile as sf
+        import librosa
+        path = os.path.join(work_dir, f"synthetic_{duration}s.wav")
+        audio = librosa.resample(synthetic_speech(duration), orig_sr=SAMPLE_RATE, target_sr=SYNTHETIC_SAMPLE_RATE)
+        sf.write(path, np.stack([audio, audio], axis=1), SYNTHETIC_SAMPLE_RATE, subtype="PCM_16")
+        return path
+    if source == "test":
+        if not os.path.exists(TEST_SAMPLE):
+            raise Exception(f"Brak nagrania testowego: {TEST_SAMPLE}")
+        path = os.path.join(work_dir, f"test_{duration}s.mp3")
+        cmd = [get_ffmpeg_exe(), "-nostdin", "-loglevel", "error", "-y", "-stream_loop", "-1",
+               "-i", TEST_SAMPLE, "-t", str(duration), "-map", "0:a:0", "-c", "copy", path]
+        subprocess.run(cmd, check=True)
+        return path
+    raise Exception(f"Nieznane źródło benchmarku: {source}")
+
+# Mierzy czas i pamięć kolejnych etapów jednego przebiegu.
+class StageTimer:
+    def __init__(self, audio_seconds=None):
+        self.audio_seconds = audio_seconds
+        self.stages = {}
+
+    def run(self, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        value = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        self.stages[name] = {
+            "seconds": round(seconds, 4),
+            "cpu_seconds": round(time.process_time() - cpu_start, 4),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        logger.info(f"  {name}: {seconds:.2f} s")
+        return value
+
+    def finish(self):
+        for stats in self.stages.values():
+            stats["rtf"] = round(stats["seconds"] / self.audio_seconds, 5) if self.audio_seconds else None
+
+# Jeden przebieg w procesie potomnym. Zwraca słownik wyników (bez wyjątku – błąd trafia do pola "error").
+def run_case(source, duration, model_size, threads=None):
+    import torch
+    import whisper
+    from audio import estimate_duration
+    from audio import decode_ffmpeg
+    from diarization import DiarizationResult, embed_windows, cluster_embeddings, assign_speakers, get_encoder
+    from export import export_results
+    from engine import DEFAULT_EXPORT_FORMATS
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+    if threads:
+        torch.set_num_threads(threads)
+    case = {"source": source, "duration_seconds": duration, "model_size": model_size,
+            "torch_threads": torch.get_num_threads()}
+    logger.info(f"Benchmark: {source}, {duration} s, model {model_size}")
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as work_dir:
+        try:
+            path = prepare_input(source, duration, work_dir)
+            timer = StageTimer()
+            timer.run("probe", estimate_duration, path)
+            audio, _ = timer.run("decode", decode_ffmpeg, path)
+            timer.audio_seconds = len(audio) / SAMPLE_RATE
+            model = timer.run("model_load", whisper.load_model, model_size, device="cpu")
+            result = timer.run("transcribe", model.transcribe, audio, language="pl", fp16=False)
+            encoder = timer.run("encoder_load", get_encoder, "cpu")
+            starts, ends, embeddings = timer.run("embedding", embed_windows, audio, encoder)
+            segments = result.get("segments", [])
+            if len(embeddings) > 1:
+                labels = timer.run("clustering", cluster_embeddings, embeddings, "advanced")
+                diarization = DiarizationResult(starts, ends, embeddings, labels, 0.0, 0.0)
+                segments = timer.run("assignment", assign_speakers, segments, diarization)
+            timer.run("export", export_results, os.path.join(work_dir, "wynik"), DEFAULT_EXPORT_FORMATS + ["msgpack"],
+                      result, segments)
+            timer.finish()
+            total = sum(stats["seconds"] for stats in timer.stages.values())
+            case.update({
+                "audio_seconds": round(timer.audio_seconds, 3),
+                "stages": timer.stages,
+                "total_seconds": round(total, 4),
+                "rtf": round(total / timer.audio_seconds, 5),
+                # Godziny nagrania przetwarzane w godzinę pracy (bez ładowania modeli – te są jednorazowe).
+                "throughput_audio_hours_per_hour": round(
+                    timer.audio_seconds / max(total - timer.stages["model_load"]["seconds"]
+                                              - timer.stages["encoder_load"]["seconds"], 1e-9), 3),
+                "peak_rss_mb": peak_rss_mb(),
+                "segments": len(segments),
+                "windows": int(len(embeddings)),
+                "error": None,
+            })
+        except Exception as e:
+            logger.error(f"Błąd przebiegu benchmarku: {str(e)}")
+            case["error"] = str(e)
+    return case
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+def environment_info():
+    from result_cache import software_versions
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": git_commit(),
+        "versions": software_versions(),
+    }
+
+# Czas uruchomienia w świeżych procesach (zimny start interpretera, bez pamięci podręcznej modułów w procesie).
+def measure_startup(repeats=3):
+    here = os.path.dirname(os.path.abspath(__file__))
+    startup = {}
+    for module in STARTUP_MODULES:
+        runs = []
+        for _ in range(repeats):
+            out = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET.format(module=module, heavy=HEAVY_MODULES)],
+                                 capture_output=True, text=True, cwd=here)
+            if out.returncode != 0:
+                startup[f"import {module}"] = {"error": out.stderr.strip().splitlines()[-1:]}
+                break
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        else:
+            startup[f"import {module}"] = {"seconds": round(min(run["seconds"] for run in runs), 4),
+                                           "heavy_modules": runs[-1]["heavy_modules"]}
+    out = subprocess.run([sys.executable, os.path.join(here, "main.py"), "--measure-startup"],
+                         capture_output=True, text=True, cwd=here)
+    lines = [line for line in out.stdout.splitlines() if line.startswith("startup_seconds=")]
+    startup["gui"] = {"seconds": float(lines[-1].split("=", 1)[1])} if lines else {"error": "brak wyniku (GUI niedostępne?)"}
+    for name, stats in startup.items():
+        if "seconds" in stats:
+            heavy = stats.get("heavy_modules")
+            logger.info(f"Start – {name}: {stats['seconds']:.2f} s" + (f" (zaimportowano: {', '.join(heavy)})" if heavy else ""))
+        else:
+            logger.warning(f"Start – {name}: {stats['error']}")
+    return startup
+
+def case_key(case):
+    return (case["source"], case["duration_seconds"], case["model_size"])
+
+# Porównanie z wcześniejszym plikiem wyników. Zwraca listę regresji (opisy) – etapów wolniejszych o ponad threshold.
+def compare_results(previous, current, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    previous_cases = {case_key(case): case for case in previous.get("cases", []) if not case.get("error")}
+    regressions = []
+    for case in current["cases"]:
+        old = previous_cases.get(case_key(case))
+        if old is None or case.get("error"):
+            continue
+        for name, stats in case["stages"].items():
+            old_stats = old["stages"].get(name)
+            if old_stats is None or old_stats["seconds"] < MIN_COMPARED_SECONDS:
+                continue
+            ratio = stats["seconds"] / old_stats["seconds"]
+            line = (f"{case['source']} {case['duration_seconds']} s {case['model_size']} – {name}: "
+                    f"{old_stats['seconds']:.2f} s → {stats['seconds']:.2f} s ({ratio - 1:+.0%})")
+            if ratio > 1 + threshold:
+                regressions.append(line)
+                logger.warning(f"Regresja: {line}")
+            else:
+                logger.info(line)
+    return regressions
+
+def format_summary(case):
+    if case.get("error"):
+        return f"{case['source']:>9} {case['duration_seconds']:>6} s {case['model_size']:>6}  BŁĄD: {case['error']}"
+    rss = f"{case['peak_rss_mb']:.0f} MB" if case["peak_rss_mb"] is not None else "?"
+    return (f"{case['source']:>9} {case['duration_seconds']:>6} s {case['model_size']:>6}  RTF {case['rtf']:.3f}  "
+            f"przepustowość {case['throughput_audio_hours_per_hour']:.2f} h/h  szczyt RSS {rss}  "
+            f"(transkrypcja {case['stages']['transcribe']['seconds']:.1f} s)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="benchmark", description="Benchmark etapów transkrypcji w trybie CPU.")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base"], help="Rozmiary modelu Whisper.")
+    parser.add_argument("--durations", nargs="+", type=int, default=[30, 120], help="Długości nagrań (sekundy).")
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=list(SOURCES))
+    parser.add_argument("--threads", type=int, default=None, help="Liczba wątków torch (domyślnie jak w torch).")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Katalog plików wyników (JSON).")
+    parser.add_argument("--compare", default=None, metavar="PLIK", help="Porównaj z wcześniejszym plikiem wyników.")
+    parser.add_argument("--regression-threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="Dopuszczalne spowolnienie etapu przy --compare (ułamek, np. 0.15).")
+    parser.add_argument("--startup", action="store_true", help="Zmierz także czas uruchomienia CLI, silnika i GUI.")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = {"format_version": BENCHMARK_FORMAT_VERSION, "environment": environment_info(), "cases": []}
+    if args.startup:
+        results["startup"] = measure_startup()
+    # Osobny proces na przebieg ("spawn" – jak w parallel.py): zimny start modelu i niezależny pomiar pamięci.
+    context = multiprocessing.get_context("spawn")
+    for source in args.sources:
+        for duration in args.durations:
+            for model_size in args.models:
+                with context.Pool(1) as pool:
+                    case = pool.apply(run_case, (source, duration, model_size, args.threads))
+                results["cases"].append(case)
+                logger.info(format_summary(case))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    out_path = os.path.join(args.output_dir, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    logger.info(f"Wyniki benchmarku zapisane: {out_path}")
+    print("\n".join(format_summary(case) for case in results["cases"]))
+
+    failed = any(case.get("error") for case in results["cases"])
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        regressions = compare_results(previous, results, threshold=args.regression_threshold)
+        if regressions:
+            print(f"Wykryto {len(regressions)} regresji wydajności:\n" + "\n".join(regressions))
+            return 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# Punkty kontrolne i anulowanie – długie transkrypcje można przerwać i wznowić.
+#
+# W folderze "Tymczasowy_<nazwa_pliku>" zapisywany jest checkpoint.json (zatwierdzone segmenty,
+# bieżące przesunięcie w nagraniu, język i końcówka tekstu dla kolejnego okna) oraz diarization.npz
+# (wynik diaryzacji, gdy jest już gotowy). Wznowienie kontynuuje od ostatniego zapisu zamiast od 0 s.
+# Punkt kontrolny pasuje tylko do tego samego pliku (rozmiar, czas modyfikacji) i tych samych ustawień.
+#
+# Anulowanie jest kooperacyjne: zdarzenie cancel_event sprawdzane jest przed każdym 30-sekundowym
+# fragmentem dekodowanym przez Whisper oraz między partiami osadzeń głosu.
+
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from result_cache import output_settings
+
+logger = logging.getLogger("TranscriptionApp")
+
+CHECKPOINT_FILE = "checkpoint.json"
+DIARIZATION_FILE = "diarization.npz"
+
+# Zgłaszany po anulowaniu – stan zapisany w punkcie kontrolnym pozwala wznowić pracę.
+class TranscriptionCancelled(Exception):
+    pass
+
+def check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise TranscriptionCancelled("Transkrypcja anulowana przez użytkownika.")
+
+# Whisper dekoduje nagranie fragmentami po 30 s przez model.decode – na czas transkrypcji metoda
+# jest opakowywana sprawdzeniem anulowania, więc przerwanie następuje najpóźniej po jednym fragmencie.
+# Model z puli może być używany przez kilka transkrypcji naraz: opakowanie jest instalowane raz (licznik
+# użyć pod blokadą) i sprawdza zdarzenie anulowania bieżącego wątku, a zdejmowane po ostatnim użyciu.
+_decode_lock = threading.Lock()
+_decode_patches = {}
+_thread_state = threading.local()
+
+def _patch_decode(model):
+    original_decode = model.decode
+    def decode(*args, **kwargs):
+        check_cancelled(getattr(_thread_state, "cancel_event", None))
+        return original_decode(*args, **kwargs)
+    model.decode = decode
+
+@contextmanager
+def cancellable(model, cancel_event):
+    if cancel_event is None:
+        yield model
+        return
+    with _decode_lock:
+        if id(model) not in _decode_patches:
+            _patch_decode(model)
+            _decode_patches[id(model)] = 0
+        _decode_patches[id(model)] += 1
+    previous_event = getattr(_thread_state, "cancel_event", None)
+    _thread_state.cancel_event = cancel_event
+    try:
+        yield model
+    finally:
+        _thread_state.cancel_event = previous_event
+        with _decode_lock:
+            _decode_patches[id(model)] -= 1
+            if _decode_patches[id(model)] == 0:
+                del _decode_patches[id(model)]
+                del model.decode
+
+class Checkpoint:
+    def __init__(self, temp_dir, file_path, options):
+        self.temp_dir = temp_dir
+        self.path = os.path.join(temp_dir, CHECKPOINT_FILE)
+        self.diarization_path = os.path.join(temp_dir, DIARIZATION_FILE)
+        st = os.stat(file_path)
+        self.fingerprint = {
+            "file": os.path.abspath(file_path),
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "settings": output_settings(options),
+            "streaming": options.streaming,
+            "window_seconds": options.stream_window_seconds if options.streaming else options.checkpoint_seconds,
+        }
+
+    # Zwraca zapisany stan albo None, gdy punktu kontrolnego nie ma lub dotyczy innego pliku/ustawień.
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("fingerprint") != self.fingerprint:
+            logger.warning("Punkt kontrolny dotyczy innej wersji pliku lub innych ustawień – zaczynam od początku.")
+            return None
+        logger.info(f"Wznawianie od punktu kontrolnego: {state['offset']:.1f} s nagrania.")
+        return state
+
+    # Zapis atomowy – przerwanie w trakcie zapisu nie psuje poprzedniego punktu kontrolnego.
+    def save(self, state):
+        os.makedirs(self.temp_dir, exist_ok=True)
+        state = dict(state, fingerprint=self.fingerprint)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def save_diarization(self, diarization):
+        os.makedirs(self.temp_dir, exist_ok=True)
+        tmp_path = f"{self.diarization_path}.tmp.npz"
+        np.savez(tmp_path, window_starts=diarization.window_starts, window_ends=diarization.window_ends,
+                 labels=diarization.labels, fingerprint=np.array(json.dumps(self.fingerprint, sort_keys=True)),
+                 speaker_names=np.array(json.dumps(diarization.speaker_names)))
+        os.replace(tmp_path, self.diarization_path)
+
+    # Zwraca słownik tablic (window_starts, window_ends, labels) i nazw mówców z galerii
+    # (speaker_names, {etykieta: nazwa}) lub None.
+    def load_diarization(self):
+        try:
+            with np.load(self.diarization_path) as data:
+                if str(data["fingerprint"]) != json.dumps(self.fingerprint, sort_keys=True):
+                    return None
+                saved = {name: data[name] for name in ("window_starts", "window_ends", "labels")}
+                names = json.loads(str(data["speaker_names"])) if "speaker_names" in data.files else {}
+                saved["speaker_names"] = {int(label): name for label, name in names.items()}
+                return saved
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def remove(self):
+        for path in (self.path, self.diarization_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        try:
+            os.rmdir(self.temp_dir)
+        except OSError:
+            pass
@@ -0,0 +1,323 @@
+# Wiersz poleceń – transkrypcja bez interfejsu graficznego (np. na serwerach bez ekranu).
+#
+# Przykład:
+#   python -m cli "nagrania/*.mp3" wywiad.mp4 --model medium --hardware cpu --formats txt srt
+#   python -m cli "archiwum/*.wav" --hardware cpu --workers 8 --threads-per-worker 4
+#   python -m cli sesja_rady.mp3 --checkpoints (punkty kontrolne; po przerwaniu Ctrl+C – kontynuacja z --resume)
+#   python -m cli "nagrania/*.mp3" --enqueue --priority 5     (dodanie do trwałej kolejki zadań)
+#   python -m cli --run-queue --watch //serwer/nagrania --model medium   (ciągła obsługa kolejki i folderu)
+#   python -m cli --search "budżet gminy" --search-limit 20              (wyszukiwanie w archiwum transkrypcji)
+#   python -m cli --index-backfill D:/nagrania                           (indeksowanie istniejących wyników)
+#   python -m cli "nagrania/*.mp3" --speaker-gallery                     (te same etykiety mówców we wszystkich plikach)
+#   python -m cli --speaker-name 7 "Jan Kowalski"                        (nazwa mówcy z galerii)
+#
+# Korzysta z tego samego silnika co GUI (engine.TranscriptionEngine).
+
+import sys
+import json
+import time
+import glob
+import logging
+import argparse
+import threading
+
+from result_cache import ResultCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_MB
+from engine import (TranscriptionEngine, TranscriptionOptions, EXPORT_FORMATS, DEFAULT_EXPORT_FORMATS, MODEL_SIZES,
+                    HARDWARE_MODES, DIARIZATION_METHODS, VIDEO_EXTRACTION_METHODS, SUPPORTED_EXTENSIONS,
+                    default_hardware_mode)
+from job_queue import JobQueue, FolderWatcher, QueueRunner, DEFAULT_QUEUE_PATH, DEFAULT_MAX_ATTEMPTS, DEFAULT_SETTLE_SECONDS
+from search_index import SearchIndex, DEFAULT_INDEX_PATH, DEFAULT_SEARCH_LIMIT, backfill_folder, format_ms
+from speaker_gallery import SpeakerGallery, DEFAULT_GALLERY_PATH, DEFAULT_MATCH_THRESHOLD, WINDOWS_PER_SECOND
+
+logger = logging.getLogger("TranscriptionApp")
+
+# Rozwija wzorce (np. "*.mp3", "**/*.wav") do listy plików, zachowując kolejność i usuwając powtórzenia.
+def expand_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            logger.warning(f"Brak plików pasujących do: {pattern}")
+        for path in matches:
+            if path not in files:
+                files.append(path)
+    return files
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Program Zapisywacz Tekstu 2025 – transkrypcja z wiersza poleceń.")
+    parser.add_argument("inputs", nargs="*", help="Pliki lub wzorce (glob) do transkrypcji.")
+    parser.add_argument("--model", choices=MODEL_SIZES, default="large", help="Rozmiar modelu Whisper.")
+    parser.add_argument("--hardware", choices=HARDWARE_MODES, default=None,
+                        help="Tryb przetwarzania (domyślnie gpu_cpu, gdy CUDA jest dostępna, w przeciwnym razie cpu).")
+    parser.add_argument("--no-polish", action="store_true", help="Nie wymuszaj języka polskiego (automatyczne wykrywanie).")
+    parser.add_argument("--no-diarization", action="store_true", help="Wyłącz rozpoznawanie mówców.")
+    parser.add_argument("--diarization-method", choices=DIARIZATION_METHODS, default="advanced")
+    parser.add_argument("--formats", nargs="+", choices=EXPORT_FORMATS, default=list(DEFAULT_EXPORT_FORMATS),
+                        help="Formaty eksportu (msgpack – binarny wynik do ponownego przetwarzania).")
+    parser.add_argument("--json-compact", action="store_true",
+                        help="Zwarty JSON – bez wcięć i bez identyfikatorów tokenów Whispera.")
+    parser.add_argument("--json-tokens", action="store_true", help="Zachowaj identyfikatory tokenów w zwartym JSON.")
+    parser.add_argument("--output-dir", default=None, help="Katalog wyjściowy (domyślnie katalog pliku źródłowego).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Liczba procesów roboczych w trybie cpu (każdy z własnym modelem).")
+    parser.add_argument("--quantize", action="store_true",
+                        help="W trybie cpu użyj modelu int8 (szybszy; skwantyzowany model zapisywany jest na dysku).")
+    parser.add_argument("--cpu-threads", type=int, default=None,
+                        help="Liczba wątków torch w trybie cpu (domyślnie liczba rdzeni fizycznych).")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Liczba wątków torch na proces (domyślnie liczba rdzeni / liczba procesów).")
+    parser.add_argument("--keep-audio", action="store_true",
+                        help="Zapisz zdekodowane audio 16 kHz do folderu Tymczasowy_<nazwa_pliku>.")
+    parser.add_argument("--video-extraction", choices=VIDEO_EXTRACTION_METHODS, default="ffmpeg",
+                        help="Sposób wyodrębniania audio z wideo (ffmpeg – strumieniowo, moviepy – przez plik WAV).")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Transkrypcja w oknach ze stałym zużyciem pamięci i zapisem wyników na bieżąco (długie nagrania).")
+    parser.add_argument("--window", type=int, default=600, help="Długość okna w trybie strumieniowym (sekundy).")
+    parser.add_argument("--vad", action="store_true", help="Pomijaj ciszę i muzykę (webrtcvad) przed Whisperem.")
+    parser.add_argument("--vad-aggressiveness", type=int, choices=[0, 1, 2, 3], default=2,
+                        help="Agresywność VAD (0 – najłagodniej, 3 – najostrzej).")
+    parser.add_argument("--remove-duplicates", action="store_true",
+                        help="Wykrywaj pętle powtórzeń i halucynacje (ponowne dekodowanie fragmentu) i usuwaj duplikaty segmentów.")
+    parser.add_argument("--checkpoints", action="store_true",
+                        help="Zapisuj punkty kontrolne (dłuższe pliki transkrybowane są wtedy w oknach --checkpoint-seconds).")
+    parser.add_argument("--resume", action="store_true",
+                        help="Wznów przerwane transkrypcje od ostatniego punktu kontrolnego (włącza --checkpoints).")
+    parser.add_argument("--checkpoint-seconds", type=int, default=300,
+                        help="Co ile sekund nagrania zapisywany jest punkt kontrolny.")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Zapisuj metryki etapów (<nazwa>_metrics.json) i podsumowanie partii (logs/metryki_partii_*.json).")
+    parser.add_argument("--profile-stage", default=None, metavar="ETAP",
+                        help="Profiluj (cProfile) tylko wskazany etap, np. transcribe, decode, diarization.embedding, export.")
+    parser.add_argument("--no-cache", action="store_true", help="Nie korzystaj z pamięci podręcznej wyników.")
+    parser.add_argument("--cache-dir", default=None, help=f"Katalog pamięci podręcznej (domyślnie {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_CACHE_MAX_MB, help="Limit rozmiaru pamięci podręcznej (MB).")
+    parser.add_argument("--cache-stats", action="store_true", help="Wyświetl statystyki pamięci podręcznej i zakończ.")
+    parser.add_argument("--cache-clear", action="store_true", help="Usuń wszystkie wpisy pamięci podręcznej i zakończ.")
+    parser.add_argument("--cache-invalidate", nargs="+", metavar="PLIK", help="Unieważnij wpisy dla wskazanych plików i zakończ.")
+    parser.add_argument("--queue-db", default=None, help=f"Plik kolejki zadań (domyślnie {DEFAULT_QUEUE_PATH}).")
+    parser.add_argument("--enqueue", action="store_true", help="Dodaj pliki do kolejki zadań (z bieżącymi ustawieniami) i zakończ.")
+    parser.add_argument("--priority", type=int, default=0, help="Priorytet dodawanych zadań (wyższy – wcześniej).")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="Liczba prób zadania przed oznaczeniem jako nieudane.")
+    parser.add_argument("--run-queue", action="store_true",
+                        help="Obsługuj kolejkę zadań w pętli (model pozostaje w pamięci) do przerwania Ctrl+C.")
+    parser.add_argument("--watch", action="append", default=[], metavar="FOLDER",
+                        help="Obserwuj folder i dodawaj nowe nagrania do kolejki (razem z --run-queue; można podać wiele razy).")
+    parser.add_argument("--watch-recursive", action="store_true", help="Obserwuj także podfoldery.")
+    parser.add_argument("--settle-seconds", type=int, default=DEFAULT_SETTLE_SECONDS,
+                        help="Plik trafia do kolejki, gdy nie zmienia się przez tyle sekund.")
+    parser.add_argument("--queue-status", action="store_true", help="Wyświetl stan kolejki zadań i zakończ.")
+    parser.add_argument("--queue-retry", type=int, nargs="+", metavar="ID", help="Ponów wskazane zadania i zakończ.")
+    parser.add_argument("--index-db", default=None, help=f"Plik indeksu wyszukiwania (domyślnie {DEFAULT_INDEX_PATH}).")
+    parser.add_argument("--index", action="store_true", help="Dopisuj wyniki do indeksu wyszukiwania (--search).")
+    parser.add_argument("--search", default=None, metavar="ZAPYTANIE",
+                        help="Wyszukaj segmenty w indeksie (wszystkie słowa; fraza w cudzysłowie i inna składnia FTS5) i zakończ.")
+    parser.add_argument("--search-limit", type=int, default=DEFAULT_SEARCH_LIMIT, help="Maksymalna liczba wyników wyszukiwania.")
+    parser.add_argument("--search-speaker", default=None, metavar="MÓWCA", help="Tylko segmenty wskazanego mówcy (np. Osoba1).")
+    parser.add_argument("--search-path", default=None, metavar="TEKST", help="Tylko pliki, których ścieżka zawiera tekst.")
+    parser.add_argument("--search-json", action="store_true", help="Wyniki wyszukiwania jako JSON.")
+    parser.add_argument("--index-backfill", nargs="+", metavar="FOLDER",
+                        help="Dołącz do indeksu istniejące wyniki JSON z folderów wyniki_* (rekurencyjnie) i zakończ.")
+    parser.add_argument("--speaker-gallery", action="store_true",
+                        help="Dopasowuj mówców do trwałej galerii – ta sama osoba ma tę samą etykietę we wszystkich plikach.")
+    parser.add_argument("--gallery-db", default=None, help=f"Plik galerii mówców (domyślnie {DEFAULT_GALLERY_PATH}).")
+    parser.add_argument("--speaker-threshold", type=float, default=DEFAULT_MATCH_THRESHOLD,
+                        help="Minimalne podobieństwo kosinusowe (0–1) klastra do znanego mówcy z galerii.")
+    parser.add_argument("--speakers", action="store_true", help="Wyświetl mówców z galerii i zakończ.")
+    parser.add_argument("--speaker-name", nargs=2, metavar=("ID", "NAZWA"),
+                        help="Nadaj nazwę mówcy z galerii (pusta nazwa przywraca \"Mówca<ID>\") i zakończ.")
+    parser.add_argument("--speaker-merge", type=int, nargs=2, metavar=("ID", "ID_DOŁĄCZANY"),
+                        help="Połącz dwóch mówców z galerii (ta sama osoba) i zakończ.")
+    parser.add_argument("--speaker-remove", type=int, nargs="+", metavar="ID", help="Usuń mówców z galerii i zakończ.")
+    return parser
+
+def options_from_args(args):
+    return TranscriptionOptions(
+        model_size=args.model,
+        hardware_mode=args.hardware or default_hardware_mode(),
+        force_polish=not args.no_polish,
+        enable_speaker_diarization=not args.no_diarization,
+        diarization_method=args.diarization_method,
+        export_formats=list(args.formats),
+        json_compact=args.json_compact,
+        json_tokens=not args.json_compact or args.json_tokens,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        quantize=args.quantize,
+        cpu_threads=args.cpu_threads,
+        keep_intermediate_audio=args.keep_audio,
+        video_extraction=args.video_extraction,
+        streaming=args.streaming,
+        stream_window_seconds=args.window,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        cache_max_mb=args.cache_max_mb,
+        vad=args.vad,
+        vad_aggressiveness=args.vad_aggressiveness,
+        remove_duplicates=args.remove_duplicates,
+        search_index=args.index,
+        index_path=args.index_db,
+        speaker_gallery=args.speaker_gallery,
+        gallery_path=args.gallery_db,
+        speaker_threshold=args.speaker_threshold,
+        checkpoints=args.checkpoints or args.resume,
+        checkpoint_seconds=args.checkpoint_seconds,
+        resume=args.resume,
+        metrics=args.metrics,
+        profile_stage=args.profile_stage,
+    )
+
+# Polecenia administracyjne pamięci podręcznej (--cache-stats, --cache-clear, --cache-invalidate).
+def manage_cache(args):
+    cache = ResultCache(args.cache_dir or DEFAULT_CACHE_DIR, max_mb=args.cache_max_mb)
+    if args.cache_clear:
+        logger.info(f"Usunięto {cache.invalidate()} wpisów pamięci podręcznej.")
+    for pattern in args.cache_invalidate or []:
+        for path in expand_inputs([pattern]):
+            logger.info(f"Unieważniono {cache.invalidate(path)} wpisów dla {path}.")
+    stats = cache.stats()
+    print(f"Pamięć podręczna {cache.cache_dir}: {stats['entries']} wpisów, {stats['size_mb']:.1f} z {stats['max_mb']:.0f} MB.")
+    return 0
+
+# Polecenia kolejki zadań (--queue-status, --queue-retry, --enqueue).
+def manage_queue(args):
+    queue = JobQueue(args.queue_db or DEFAULT_QUEUE_PATH, max_attempts=args.max_attempts)
+    for job_id in args.queue_retry or []:
+        if queue.retry(job_id):
+            logger.info(f"Zadanie {job_id} wróciło do kolejki.")
+        else:
+            logger.warning(f"Nie można ponowić zadania {job_id} (brak zadania lub jest właśnie przetwarzane).")
+    if args.enqueue:
+        files = expand_inputs(args.inputs)
+        if not files:
+            logger.error("Nie znaleziono plików do dodania do kolejki.")
+            return 2
+        options = options_from_args(args)
+        for path in files:
+            queue.enqueue(path, options, priority=args.priority)
+    counts = queue.counts()
+    print(f"Kolejka {queue.path}: " + ", ".join(f"{state} {count}" for state, count in counts.items()))
+    if args.queue_status:
+        for job in queue.jobs(limit=50):
+            error = f" – {job['error']}" if job["error"] else ""
+            print(f"{job['id']:>6} {job['state']:>8} p{job['priority']:<3} próby {job['attempts']}  {job['path']}{error}")
+    return 0
+
+# Polecenia indeksu wyszukiwania (--search, --index-backfill). Czasy wyników w milisekundach.
+def manage_index(args):
+    index = SearchIndex(args.index_db or DEFAULT_INDEX_PATH)
+    for folder in args.index_backfill or []:
+        files, segments = backfill_folder(index, folder, extensions=SUPPORTED_EXTENSIONS)
+        logger.info(f"Dołączono {files} plików ({segments} segmentów) z {folder}.")
+    if args.search is None:
+        stats = index.stats()
+        print(f"Indeks {index.path}: {stats['files']} plików, {stats['segments']} segmentów, {stats['size_mb']:.1f} MB.")
+        return 0
+    try:
+        matches = index.search(args.search, limit=args.search_limit, speaker=args.search_speaker, path_filter=args.search_path)
+    except Exception as e:
+        logger.error(str(e))
+        return 2
+    if args.search_json:
+        print(json.dumps(matches, ensure_ascii=False, indent=2))
+        return 0
+    for match in matches:
+        speaker = f"{match['speaker']}: " if match["speaker"] else ""
+        print(f"{match['file']}\t{match['start_ms']}\t{match['end_ms']}\t"
+              f"[{format_ms(match['start_ms'])}] {speaker}{match['snippet']}")
+    logger.info(f"Znaleziono {len(matches)} segmentów.")
+    return 0
+
+# Polecenia galerii mówców (--speakers, --speaker-name, --speaker-merge, --speaker-remove).
+def manage_gallery(args):
+    gallery = SpeakerGallery(args.gallery_db or DEFAULT_GALLERY_PATH)
+    if args.speaker_name:
+        speaker_id, name = args.speaker_name
+        if not speaker_id.isdigit() or not gallery.rename(int(speaker_id), name.strip()):
+            logger.error(f"Brak mówcy {speaker_id} w galerii.")
+            return 2
+        logger.info(f"Mówca {speaker_id}: {name.strip() or f'Mówca{speaker_id}'}.")
+    if args.speaker_merge:
+        target_id, source_id = args.speaker_merge
+        if not gallery.merge(target_id, source_id):
+            logger.error(f"Nie można połączyć mówców {target_id} i {source_id}.")
+            return 2
+        logger.info(f"Mówca {source_id} dołączony do mówcy {target_id}.")
+    for speaker_id in args.speaker_remove or []:
+        if gallery.remove(speaker_id):
+            logger.info(f"Usunięto mówcę {speaker_id} z galerii.")
+        else:
+            logger.warning(f"Brak mówcy {speaker_id} w galerii.")
+    speakers = gallery.speakers()
+    print(f"Galeria {gallery.path}: {len(speakers)} mówców.")
+    if args.speakers:
+        for speaker in speakers:
+            name = speaker["name"] or f"Mówca{speaker['id']}"
+            updated = time.strftime("%Y-%m-%d", time.localtime(speaker["updated"]))
+            print(f"{speaker['id']:>6}  {name:<30} plików {speaker['files']:<5} "
+                  f"mowy {speaker['windows'] / WINDOWS_PER_SECOND / 60:.1f} min  ostatnio {updated}")
+    return 0
+
+# Ciągła obsługa kolejki (--run-queue) z opcjonalną obserwacją folderów; Ctrl+C zatrzymuje ją po zapisie
+# punktu kontrolnego bieżącego zadania, które wraca do kolejki.
+def run_queue(args):
+    queue = JobQueue(args.queue_db or DEFAULT_QUEUE_PATH, max_attempts=args.max_attempts)
+    options = options_from_args(args)
+    for pattern in args.inputs:
+        for path in expand_inputs([pattern]):
+            queue.enqueue(path, options, priority=args.priority)
+    watchers = [FolderWatcher(folder, queue, options, priority=args.priority, settle_seconds=args.settle_seconds,
+                              recursive=args.watch_recursive) for folder in args.watch]
+    runner = QueueRunner(TranscriptionEngine(status_callback=logger.debug), queue, watchers)
+    worker = threading.Thread(target=runner.run)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        logger.info("Zatrzymywanie obsługi kolejki – czekam na zapis punktu kontrolnego bieżącego zadania...")
+        runner.stop()
+        worker.join()
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.cache_stats or args.cache_clear or args.cache_invalidate:
+        return manage_cache(args)
+    if args.search is not None or args.index_backfill:
+        return manage_index(args)
+    if args.speakers or args.speaker_name or args.speaker_merge or args.speaker_remove:
+        return manage_gallery(args)
+    if args.run_queue:
+        return run_queue(args)
+    if args.enqueue or args.queue_status or args.queue_retry:
+        return manage_queue(args)
+    if args.watch:
+        logger.error("--watch wymaga --run-queue.")
+        return 2
+    files = expand_inputs(args.inputs)
+    if not files:
+        logger.error("Nie znaleziono plików do transkrypcji.")
+        return 2
+    engine = TranscriptionEngine(status_callback=logger.debug)
+    # Partia działa w osobnym wątku, aby Ctrl+C mogło anulować ją kooperacyjnie (z zapisem punktu kontrolnego).
+    outcome = {}
+    worker = threading.Thread(target=lambda: outcome.update(results=engine.run_batch(files, options_from_args(args))))
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        logger.info("Anulowanie – czekam na zapis punktu kontrolnego (uruchom ponownie z --resume, aby wznowić)...")
+        engine.cancel()
+        worker.join()
+    results = outcome.get("results", [])
+    failed = [r for r in results if not r["ok"]]
+    logger.info(f"Zakończono: {len(results) - len(failed)} z {len(results)} plików przetworzonych poprawnie.")
+    if any(r.get("cancelled") for r in results):
+        return 130
+    return 1 if failed or not results else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
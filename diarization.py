@@ -0,0 +1,249 @@
+# Diaryzacja (rozpoznawanie mówców) – resemblyzer + spectralcluster.
+#
+# Podzielona na dwa etapy, aby mogła działać równolegle z Whisperem:
+#   • embed_and_cluster – zależy tylko od audio (osadzenia głosu i klastrowanie),
+#   • assign_speakers   – łączy wynik diaryzacji z segmentami transkrypcji.
+
+import time
+import logging
+import threading
+from contextlib import nullcontext
+
+import numpy as np
+import torch
+from resemblyzer import VoiceEncoder
+from resemblyzer.hparams import (partials_n_frames, mel_window_step, mel_window_length, mel_n_channels,
+                                 audio_norm_target_dBFS, model_embedding_size)
+from spectralcluster import SpectralClusterer
+
+from audio import SAMPLE_RATE, read_samples
+from vad import SpeechDetector
+from checkpoint import check_cancelled
+
+logger = logging.getLogger("TranscriptionApp")
+
+def _no_span(name):
+    return nullcontext()
+
+# Liczba okien częściowych przetwarzanych w jednym przebiegu enkodera.
+EMBED_BATCH_SIZE = 256
+# Gęstość okien częściowych (na sekundę) – jak dotychczasowe rate=16 w embed_utterance.
+PARTIALS_RATE = 16
+
+# Powyżej tej liczby okien (~30 min nagrania) pełna macierz podobieństwa jest zbyt duża
+# i metody "basic"/"advanced" przechodzą na klastrowanie dla długich nagrań ("long").
+DENSE_CLUSTERING_MAX_WINDOWS = 30000
+# Metoda "long": maksymalna liczba centroidów w spectral clustering, minimalny rozmiar grupy
+# (16 okien ≈ 1 s) i próg podobieństwa sąsiednich okien, poniżej którego zaczyna się nowa grupa.
+MAX_CENTROIDS = 3000
+MIN_GROUP_WINDOWS = 16
+CHANGE_THRESHOLD = 0.7
+
+# Wynik etapu zależnego tylko od audio – granice okien (w sekundach, posortowane), ich osadzenia,
+# etykiety mówców oraz czasy podetapów. speaker_names – nazwy mówców z galerii (speaker_gallery.py)
+# dla etykiet klastrów; klastry bez wpisu dostają etykietę "Osoba<n>" tego pliku.
+class DiarizationResult:
+    def __init__(self, window_starts, window_ends, embeddings, labels, embed_seconds, cluster_seconds,
+                 speaker_names=None):
+        self.window_starts = window_starts
+        self.window_ends = window_ends
+        self.embeddings = embeddings
+        self.labels = labels
+        self.embed_seconds = embed_seconds
+        self.cluster_seconds = cluster_seconds
+        self.speaker_names = speaker_names or {}
+
+    def speaker_name(self, label):
+        if label is None:
+            return "NieznanyMówca"
+        return self.speaker_names.get(label, f"Osoba{label+1}")
+
+    @property
+    def timestamps(self):
+        return (self.window_starts + self.window_ends) / 2
+
+# Długość fragmentu nagrania (w sekundach) czytanego naraz przy liczeniu głośności, VAD i mel-spektrogramu.
+EMBED_BLOCK_SECONDS = 30
+
+# Wzmocnienie jak resemblyzer.audio.normalize_volume (increase_only) – ze średniej kwadratów liczonej
+# fragmentami, razem z wykrywaniem mowy. Zwraca (wzmocnienie, fragmenty mowy).
+def _gain_and_speech(audio, n_samples, sr, block):
+    detector = SpeechDetector(sr=sr)
+    square_sum = 0.0
+    for start in range(0, n_samples, block):
+        chunk = read_samples(audio, start, min(start + block, n_samples))
+        square_sum += float(np.dot(chunk.astype(np.float64), chunk))
+        detector.feed(chunk)
+    rms = np.sqrt(square_sum / n_samples) if n_samples else 0.0
+    if rms == 0:
+        return 1.0, detector.finish()
+    change_dB = audio_norm_target_dBFS - 20 * np.log10(rms)
+    return (10 ** (change_dB / 20) if change_dB > 0 else 1.0), detector.finish()
+
+# Mel-spektrogram ramek [first, last) jak resemblyzer.audio.wav_to_mel_spectrogram dla całego nagrania
+# (librosa z center=True dopełnia zerami), ale liczony tylko z potrzebnego wycinka próbek.
+def _mel_frames(audio, first, last, gain, sr):
+    import librosa
+    n_fft = int(sr * mel_window_length / 1000)
+    hop = int(sr * mel_window_step / 1000)
+    start = first * hop - n_fft // 2
+    samples = read_samples(audio, start, (last - 1) * hop - n_fft // 2 + n_fft) * np.float32(gain)
+    mel = librosa.feature.melspectrogram(y=samples, sr=sr, n_fft=n_fft, hop_length=hop, n_mels=mel_n_channels, center=False)
+    return mel.astype(np.float32).T
+
+# Osadzenia wszystkich okien częściowych pliku; okna (1,6 s co ~60 ms) przechodzą przez enkoder w dużych partiach.
+# Okna bez mowy (webrtcvad) są pomijane, ale – inaczej niż przy trim_long_silences – bez przesuwania osi czasu.
+# audio to bufor w pamięci albo audio.PcmFile: głośność i mowa liczone są w pierwszym przebiegu, a mel-spektrogram
+# w drugim, fragmentami po ~EMBED_BLOCK_SECONDS, więc pamięć nie rośnie z długością nagrania (poza osadzeniami).
+# Zwraca (początki okien, końce okien, osadzenia).
+# cancel_event (checkpoint.py) sprawdzany jest między partiami, więc anulowanie nie czeka na koniec pliku.
+def embed_windows(audio, encoder, sr=SAMPLE_RATE, batch_size=EMBED_BATCH_SIZE, rate=PARTIALS_RATE, cancel_event=None,
+                  block_seconds=EMBED_BLOCK_SECONDS):
+    n_samples = len(audio)
+    block = int(block_seconds * sr)
+    gain, speech = _gain_and_speech(audio, n_samples, sr, block)
+    frame_seconds = mel_window_step / 1000
+    hop = int(sr * frame_seconds)
+    n_frames = 1 + n_samples // hop if n_samples else 0
+    frame_step = max(1, int(round((sr / rate) / (sr * frame_seconds))))
+    n_windows = (n_frames - partials_n_frames) // frame_step + 1 if n_frames >= partials_n_frames else 0
+    window_starts = np.arange(n_windows) * frame_step * frame_seconds
+    window_ends = window_starts + partials_n_frames * frame_seconds
+    # Tylko okna, których środek wypada we fragmencie mowy.
+    if speech:
+        centers = (window_starts + window_ends) / 2
+        bounds = np.array(speech).reshape(-1)
+        keep = np.searchsorted(bounds, centers, side="right") % 2 == 1
+    else:
+        keep = np.zeros(n_windows, dtype=bool)
+    indices = np.flatnonzero(keep)
+    embeddings = np.zeros((len(indices), model_embedding_size), dtype=np.float32)
+    windows_per_block = max(1, block // (hop * frame_step))
+    done = 0
+    with torch.no_grad():
+        for block_start in range(0, n_windows, windows_per_block):
+            check_cancelled(cancel_event)
+            block_idx = indices[(indices >= block_start) & (indices < block_start + windows_per_block)]
+            if len(block_idx) == 0:
+                continue
+            first = int(block_idx[0]) * frame_step
+            mel = _mel_frames(audio, first, int(block_idx[-1]) * frame_step + partials_n_frames, gain, sr)
+            for batch_start in range(0, len(block_idx), batch_size):
+                check_cancelled(cancel_event)
+                batch_idx = block_idx[batch_start:batch_start + batch_size]
+                frames = (batch_idx[:, None] * frame_step - first) + np.arange(partials_n_frames)[None, :]
+                mels = torch.from_numpy(mel[frames]).to(encoder.device)
+                embeddings[done:done + len(batch_idx)] = encoder(mels).cpu().numpy()
+                done += len(batch_idx)
+    return window_starts[indices], window_ends[indices], embeddings
+
+# Osadzenia głosu i klastrowanie. Zwraca DiarizationResult lub None, gdy danych jest za mało.
+# metrics (metrics.FileMetrics) mierzy podetapy "diarization.embedding" i "diarization.clustering".
+def embed_and_cluster(audio, encoder, method="advanced", sr=SAMPLE_RATE, cancel_event=None, metrics=None):
+    span = metrics.span if metrics is not None else _no_span
+    embed_start = time.time()
+    with span("diarization.embedding"):
+        window_starts, window_ends, embeddings = embed_windows(audio, encoder, sr=sr, cancel_event=cancel_event)
+    embed_seconds = time.time() - embed_start
+    logger.info(f"Osadzenia głosu: {len(embeddings)} okien w {embed_seconds:.1f} s.")
+    if len(embeddings) <= 1:
+        logger.warning("Za mało danych do diaryzacji, pomijam...")
+        return None
+    cluster_start = time.time()
+    with span("diarization.clustering"):
+        labels = cluster_embeddings(embeddings, method)
+    return DiarizationResult(window_starts, window_ends, embeddings, labels, embed_seconds, time.time() - cluster_start)
+
+# Etykiety mówców dla osadzeń okien wybraną metodą ("basic"/"advanced" – pełna macierz, "long" – centroidy).
+def cluster_embeddings(embeddings, method="advanced"):
+    if method != "long" and len(embeddings) > DENSE_CLUSTERING_MAX_WINDOWS:
+        logger.warning(f"{len(embeddings)} okien to za dużo dla pełnej macierzy podobieństwa – "
+                       f"używam klastrowania dla długich nagrań.")
+        method = "long"
+    if method == "long":
+        return cluster_long(embeddings)
+    clusterer = SpectralClusterer(min_clusters=2, max_clusters=10)
+    return np.asarray(clusterer.predict(embeddings)).astype(int)
+
+# Grupowanie okien w krótkie, jednorodne fragmenty: nowa grupa zaczyna się, gdy podobieństwo
+# kosinusowe sąsiednich okien spada poniżej progu (zmiana mówcy) albo grupa osiąga group_size okien.
+# Zwraca numer grupy dla każdego okna (grupy są kolejne w czasie).
+def group_windows(embeddings, group_size, change_threshold=CHANGE_THRESHOLD):
+    n = len(embeddings)
+    change = np.zeros(n, dtype=bool)
+    change[0] = True
+    if n > 1:
+        similarity = np.einsum("ij,ij->i", embeddings[1:], embeddings[:-1])
+        change[1:] = similarity < change_threshold
+    run_id = np.cumsum(change) - 1
+    run_starts = np.flatnonzero(change)
+    position = np.arange(n) - run_starts[run_id]
+    split = change | (position % group_size == 0)
+    return np.cumsum(split) - 1
+
+# Klastrowanie dla długich nagrań: okna są najpierw łączone w grupy (group_windows), spectral clustering
+# działa na znormalizowanych centroidach grup (co najwyżej ~max_centroids), a etykiety wracają do okien.
+# Pamięć macierzy podobieństwa jest stała, a koszt reszty kroków rośnie liniowo z długością nagrania.
+def cluster_long(embeddings, max_centroids=MAX_CENTROIDS):
+    group_size = max(MIN_GROUP_WINDOWS, int(np.ceil(len(embeddings) / max_centroids)))
+    group_ids = group_windows(embeddings, group_size)
+    n_groups = int(group_ids[-1]) + 1
+    # Gdy zmian mówcy jest bardzo dużo, grupy są łączone parami, aż zmieszczą się w limicie.
+    while n_groups > max_centroids:
+        group_ids = group_ids // 2
+        n_groups = int(group_ids[-1]) + 1
+    centroids = np.zeros((n_groups, embeddings.shape[1]), dtype=np.float64)
+    np.add.at(centroids, group_ids, embeddings)
+    centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-9)
+    logger.info(f"Klastrowanie dla długich nagrań: {len(embeddings)} okien → {n_groups} centroidów.")
+    clusterer = SpectralClusterer(min_clusters=2, max_clusters=10)
+    # Dwie grupy lub mniej (krótkie nagranie) – za mało centroidów; okna klastrowane są bezpośrednio,
+    # jak w metodach z pełną macierzą (jest ich wtedy niewiele).
+    if n_groups <= 2:
+        return np.asarray(clusterer.predict(embeddings)).astype(int)
+    centroid_labels = np.asarray(clusterer.predict(centroids)).astype(int)
+    return centroid_labels[group_ids]
+
+# Mówca segmentu: głosowanie większościowe okien nachodzących na [start, end], ważone długością nakładania.
+# Okna są posortowane, więc zakres nachodzących okien wyznaczają dwa wyszukiwania binarne (bez przeglądania
+# wszystkich okien dla każdego segmentu). Segment bez żadnego okna dostaje mówcę najbliższego okna.
+def segment_speakers(segments, diarization):
+    starts = diarization.window_starts
+    ends = diarization.window_ends
+    labels = diarization.labels
+    n_labels = int(labels.max()) + 1
+    seg_starts = np.array([seg["start"] for seg in segments], dtype=np.float64)
+    seg_ends = np.array([seg["end"] for seg in segments], dtype=np.float64)
+    lo = np.searchsorted(ends, seg_starts, side="right")
+    hi = np.searchsorted(starts, seg_ends, side="left")
+    centers = (starts + ends) / 2
+    speakers = []
+    for i in range(len(segments)):
+        if hi[i] > lo[i]:
+            overlap = np.minimum(ends[lo[i]:hi[i]], seg_ends[i]) - np.maximum(starts[lo[i]:hi[i]], seg_starts[i])
+            votes = np.bincount(labels[lo[i]:hi[i]], weights=np.maximum(overlap, 0.0), minlength=n_labels)
+            speakers.append(int(votes.argmax()))
+        else:
+            mid = (seg_starts[i] + seg_ends[i]) / 2
+            j = int(np.searchsorted(centers, mid))
+            candidates = [k for k in (j - 1, j) if 0 <= k < len(centers)]
+            speakers.append(int(labels[min(candidates, key=lambda k: abs(centers[k] - mid))]) if candidates else None)
+    return speakers
+
+# Przypisanie mówców do segmentów transkrypcji – wymaga wyników obu etapów.
+def assign_speakers(segments, diarization):
+    diarized_segments = []
+    for seg, label in zip(segments, segment_speakers(segments, diarization)):
+        speaker = diarization.speaker_name(label)
+        diarized_segments.append({"start": seg["start"], "end": seg["end"], "text": f"{speaker}: {seg['text'].strip()}"})
+    return diarized_segments
+
+# Enkoder głosu na wskazanym urządzeniu – tworzony raz i używany dla kolejnych plików.
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+def get_encoder(device):
+    with _encoders_lock:
+        if device not in _encoders:
+            _encoders[device] = VoiceEncoder(device=device, verbose=False)
+        return _encoders[device]
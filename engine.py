@@ -0,0 +1,750 @@
+# Silnik transkrypcji – cała praca (konwersja, Whisper, diaryzacja, eksport) bez zależności od Tkintera.
+#
+# Z silnika korzysta zarówno interfejs graficzny (main.py), jak i wiersz poleceń (cli.py).
+# Ustawienia przekazywane są zwykłym obiektem TranscriptionOptions zamiast zmiennych tk.
+# torch, whisper i moduł diaryzacji (resemblyzer, spectralcluster) importowane są przy pierwszym użyciu,
+# więc import silnika – a z nim start GUI i CLI – nie czeka na ciężkie biblioteki.
+
+import os
+import time
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from export import export_results
+from quantization import load_quantized_model, configure_cpu_threads, DEFAULT_QUANTIZED_DIR
+from metrics import FileMetrics, summarize_batch, format_batch_summary
+from checkpoint import Checkpoint, TranscriptionCancelled, cancellable, check_cancelled
+from vad import transcribe_with_vad
+from repetition import RepetitionFilter
+from search_index import SearchIndex, DEFAULT_INDEX_PATH
+from speaker_gallery import SpeakerGallery, DEFAULT_GALLERY_PATH, DEFAULT_MATCH_THRESHOLD
+from result_cache import ResultCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_MB, hash_audio
+from audio import (SAMPLE_RATE, load_audio, validate_audio, save_wav, decode_ffmpeg,
+                   extract_audio_moviepy, format_extraction_stats, iter_buffer_windows, PcmFile, decode_ffmpeg_to_pcm)
+
+logger = logging.getLogger("TranscriptionApp")
+
+SUPPORTED_EXTENSIONS = ['.mp3', '.mp4', '.wav', '.m4a', '.flac', '.opus', '.aiff', '.mov', '.avi', '.mkv']
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv']
+EXPORT_FORMATS = ["txt", "srt", "vtt", "json", "csv", "msgpack"]
+# Format binarny (msgpack) służy do ponownego przetwarzania – domyślnie nie jest zapisywany.
+DEFAULT_EXPORT_FORMATS = ["txt", "srt", "vtt", "json", "csv"]
+MODEL_SIZES = ["tiny", "base", "small", "medium", "large"]
+HARDWARE_MODES = ["cpu", "gpu_cpu", "gpu"]
+DIARIZATION_METHODS = ["basic", "advanced", "long"]
+VIDEO_EXTRACTION_METHODS = ["ffmpeg", "moviepy"]
+# Plik PCM 16 kHz w folderze tymczasowym (tryb strumieniowy z diaryzacją).
+PCM_FILE = "audio_16k.pcm"
+
+# Funkcja zwracająca ścieżkę folderu logów – w katalogu źródłowym.
+def get_log_dir(base_dir):
+    log_dir = os.path.join(base_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    return log_dir
+
+# Zamiana trybu sprzętowego ("cpu", "gpu_cpu", "gpu") na urządzenie torch.
+def resolve_device(hardware_mode):
+    if hardware_mode == "cpu":
+        logger.info("Tryb sprzętowy: Tylko CPU.")
+        return "cpu"
+    if hardware_mode == "gpu":
+        logger.info("Tryb sprzętowy: Tylko GPU (eksperymentalny).")
+        return "cuda"
+    logger.info("Tryb sprzętowy: GPU i CPU.")
+    return "cuda"
+
+# Domyślny tryb sprzętowy – "gpu_cpu", gdy CUDA jest dostępna, w przeciwnym razie "cpu".
+def default_hardware_mode():
+    import torch
+    return "gpu_cpu" if torch.cuda.is_available() else "cpu"
+
+# Ustawienia jednego przebiegu transkrypcji.
+# output_dir=None oznacza zapis wyników obok pliku źródłowego (folder "wyniki_<nazwa_pliku>").
+# workers > 1 w trybie "cpu" włącza przetwarzanie partii w wielu procesach (parallel.py);
+# threads_per_worker=None dobiera liczbę wątków torch tak, by procesy razem nie przekroczyły liczby rdzeni.
+# video_extraction: "ffmpeg" (strumień audio prosto do PCM 16 kHz) lub "moviepy" (dotychczasowy zapis pełnego WAV).
+# streaming=True przetwarza nagranie w oknach stream_window_seconds i dopisuje wyniki na bieżąco (streaming.py).
+# vad=True wysyła do Whispera tylko fragmenty mowy wykryte przez webrtcvad (vad_aggressiveness 0–3, vad.py).
+# use_cache=True pomija pliki, dla których wynik jest już w pamięci podręcznej (result_cache.py);
+# cache_dir=None oznacza katalog domyślny w Dokumentach.
+# checkpoints=True zapisuje punkty kontrolne co checkpoint_seconds nagrania (dłuższe pliki są wtedy
+# transkrybowane w oknach z kontekstem przenoszonym między nimi, co zmienia tekst na granicach okien – dlatego
+# domyślnie wyłączone), a resume=True wznawia od ostatniego punktu kontrolnego (checkpoint.py).
+# quantize=True w trybie "cpu" używa modelu z warstwami liniowymi int8 zapisanego w quantized_dir
+# (None – katalog domyślny); cpu_threads=None dobiera liczbę wątków torch do rdzeni fizycznych (quantization.py).
+# metrics=True zapisuje pomiary etapów do "<nazwa>_metrics.json" obok wyników i podsumowanie partii do
+# "logs/metryki_partii_<data>.json" (domyślnie wyłączone), a profile_stage (np. "transcribe") uruchamia profiler
+# tylko dla wskazanego etapu (metrics.py).
+# json_compact=True zapisuje JSON bez wcięć, json_tokens=False pomija identyfikatory tokenów Whispera (export.py);
+# domyślnie JSON ma dotychczasową postać – z wcięciami i tokenami.
+# keep_intermediate_audio=True zapisuje zdekodowane audio 16 kHz do "Tymczasowy_<nazwa_pliku>/processed_audio.wav"
+# (w trybie strumieniowym z diaryzacją zachowuje plik PCM "audio_16k.pcm").
+# search_index=True dopisuje segmenty do pełnotekstowego indeksu archiwum w index_path (None – plik domyślny,
+# search_index.py); domyślnie wyłączone – indeks jest wspólny dla wszystkich uruchomień.
+# remove_duplicates=True wykrywa pętle powtórzeń i halucynacje, dekoduje ponownie tylko ich fragmenty
+# i usuwa duplikaty segmentów (repetition.py).
+# speaker_gallery=True dopasowuje mówców z diaryzacji do trwałej galerii w gallery_path (None – plik domyślny),
+# więc ta sama osoba ma tę samą etykietę we wszystkich plikach; speaker_threshold to minimalne podobieństwo
+# kosinusowe do znanego mówcy (speaker_gallery.py).
+@dataclass
+class TranscriptionOptions:
+    model_size: str = "large"
+    hardware_mode: str = "gpu_cpu"
+    force_polish: bool = True
+    enable_speaker_diarization: bool = True
+    diarization_method: str = "advanced"
+    export_formats: list = field(default_factory=lambda: list(DEFAULT_EXPORT_FORMATS))
+    json_compact: bool = False
+    json_tokens: bool = True
+    output_dir: str = None
+    workers: int = 1
+    threads_per_worker: int = None
+    keep_intermediate_audio: bool = False
+    video_extraction: str = "ffmpeg"
+    streaming: bool = False
+    vad: bool = False
+    vad_aggressiveness: int = 2
+    quantize: bool = False
+    quantized_dir: str = None
+    cpu_threads: int = None
+    metrics: bool = False
+    profile_stage: str = None
+    use_cache: bool = True
+    cache_dir: str = None
+    cache_max_mb: int = DEFAULT_CACHE_MAX_MB
+    checkpoints: bool = False
+    checkpoint_seconds: int = 300
+    resume: bool = False
+    stream_window_seconds: int = 600
+    remove_duplicates: bool = False
+    search_index: bool = False
+    index_path: str = None
+    speaker_gallery: bool = False
+    gallery_path: str = None
+    speaker_threshold: float = DEFAULT_MATCH_THRESHOLD
+
+# Pula załadowanych modeli Whisper – klucz (rozmiar modelu, urządzenie).
+# Model ładowany jest leniwie przy pierwszym użyciu i pozostaje w pamięci dla kolejnych plików
+# (również między kolejnymi partiami). Przy zmianie modelu lub trybu sprzętowego najdawniej
+# używane modele są usuwane (LRU), opcjonalnie z limitem pamięci zajmowanej przez wagi.
+class ModelPool:
+    def __init__(self, max_models=1, memory_budget_mb=None):
+        self.max_models = max_models
+        self.memory_budget_mb = memory_budget_mb
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Zwraca (model, trafienie) – trafienie=True, gdy model był już w puli.
+    # quantized=True (tylko CPU) – model z warstwami liniowymi int8 (quantization.py).
+    def get(self, model_size, device, quantized=False, quantized_dir=DEFAULT_QUANTIZED_DIR):
+        key = (model_size, device, quantized)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key], True
+            # Zwolnij miejsce przed ładowaniem nowego modelu, by nie trzymać dwóch naraz w VRAM.
+            self._evict(reserve=1)
+            if quantized:
+                model = load_quantized_model(model_size, quantized_dir)
+            else:
+                import whisper
+                model = whisper.load_model(model_size, device=device)
+            self._models[key] = model
+            self._evict(reserve=0)
+            return model, False
+
+    def clear(self):
+        with self._lock:
+            while self._models:
+                self._pop_oldest()
+
+    def _evict(self, reserve):
+        while self._models and len(self._models) + reserve > self.max_models:
+            self._pop_oldest()
+        if self.memory_budget_mb is not None:
+            # Zawsze zostawiamy co najmniej najnowszy model, nawet jeśli sam przekracza limit.
+            while len(self._models) > 1 and self._memory_mb() > self.memory_budget_mb:
+                self._pop_oldest()
+
+    def _pop_oldest(self):
+        (model_size, device, quantized), model = self._models.popitem(last=False)
+        del model
+        import torch
+        if device == "cuda" and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        logger.info(f"Usunięto z puli model Whisper ({model_size}, {device}{', int8' if quantized else ''}).")
+
+    def _memory_mb(self):
+        total = 0
+        for model in self._models.values():
+            total += sum(p.numel() * p.element_size() for p in model.parameters())
+        return total / (1024 * 1024)
+
+class TranscriptionEngine:
+    # status_callback otrzymuje krótkie komunikaty o bieżącym etapie (np. do paska statusu GUI),
+    # progress_callback(przetworzone_sekundy, długość_nagrania) – postęp pliku w sekundach nagrania
+    # (długość None, gdy nie jest znana, np. w trybie strumieniowym).
+    def __init__(self, model_pool=None, status_callback=None, progress_callback=None):
+        self.model_pool = model_pool if model_pool is not None else ModelPool(max_models=1)
+        self.status_callback = status_callback
+        self.progress_callback = progress_callback
+        self._caches = {}
+        self._indexes = {}
+        self._galleries = {}
+        # Anulowanie kooperacyjne – sprawdzane między plikami i w trakcie transkrypcji (checkpoint.py).
+        self.cancel_event = threading.Event()
+        # Profiler dla options.profile_stage: profiler(ścieżka) zwraca menedżer kontekstu; None – cProfile.
+        self.profiler = None
+        # Podsumowanie metryk ostatniej partii (metrics.summarize_batch) lub None.
+        self.last_batch_summary = None
+
+    # Prośba o przerwanie bieżącej partii; bieżący plik zostawia punkt kontrolny do wznowienia.
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _status(self, message):
+        if self.status_callback is not None:
+            self.status_callback(message)
+
+    def _progress(self, seconds, total_seconds):
+        if self.progress_callback is not None:
+            self.progress_callback(seconds, total_seconds)
+
+    # Przetwarza listę plików po kolei. Zwraca listę wyników – dla każdego pliku słownik
+    # z kluczami "file", "ok", "error" oraz "outputs" (ścieżki zapisanych plików).
+    # progress_callback(idx, total, file_path) wywoływany jest po każdym pliku,
+    # error_callback(file_path, exc) przy błędzie pliku (przetwarzanie jest kontynuowane).
+    # Po anulowaniu (cancel) przerwany plik i pozostałe pliki mają w wyniku "cancelled": True.
+    def run_batch(self, file_paths, options, progress_callback=None, error_callback=None):
+        self.cancel_event.clear()
+        if options.hardware_mode == "cpu" and options.workers > 1 and len(file_paths) > 1:
+            from parallel import run_batch_parallel
+            results = run_batch_parallel(file_paths, options, workers=options.workers,
+                                         threads_per_worker=options.threads_per_worker,
+                                         progress_callback=progress_callback, error_callback=error_callback,
+                                         status_callback=self.status_callback, cancel_event=self.cancel_event)
+        else:
+            results = self._run_batch_serial(file_paths, options, progress_callback, error_callback)
+        self.log_cache_stats()
+        self._write_batch_summary(file_paths, options, results)
+        return results
+
+    def _run_batch_serial(self, file_paths, options, progress_callback, error_callback):
+        total = len(file_paths)
+        results = []
+        for idx, file_path in enumerate(file_paths, start=1):
+            if self.cancel_event.is_set():
+                results.append({"file": file_path, "ok": False, "error": "Anulowano.", "outputs": {}, "cancelled": True})
+                continue
+            try:
+                self._status(f"Przetwarzanie pliku {idx} z {total}...")
+                outputs = self.run_file(file_path, options)
+                results.append({"file": file_path, "ok": True, "error": None, "outputs": outputs})
+            except TranscriptionCancelled as e:
+                logger.info(f"Anulowano przetwarzanie {file_path} – punkt kontrolny pozwala wznowić pracę.")
+                results.append({"file": file_path, "ok": False, "error": str(e), "outputs": {}, "cancelled": True})
+            except Exception as e:
+                logger.error(f"Błąd przy przetwarzaniu {file_path}: {str(e)}")
+                results.append({"file": file_path, "ok": False, "error": str(e), "outputs": {}})
+                if error_callback is not None:
+                    error_callback(file_path, e)
+            if progress_callback is not None:
+                progress_callback(idx, total, file_path)
+        return results
+
+    # Podsumowanie metryk partii – zapis do "logs/metryki_partii_<data>.json" i do logu.
+    def _write_batch_summary(self, file_paths, options, results):
+        self.last_batch_summary = None
+        metrics_paths = [r["outputs"]["metrics"] for r in results if "metrics" in r["outputs"]]
+        if not metrics_paths:
+            return
+        summary = summarize_batch(metrics_paths)
+        summary["failed"] = sum(1 for r in results if not r["ok"])
+        log_dir = get_log_dir(options.output_dir or os.path.dirname(os.path.abspath(file_paths[0])))
+        summary_path = os.path.join(log_dir, f"metryki_partii_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        logger.info(format_batch_summary(summary))
+        logger.info(f"Podsumowanie metryk partii zapisane: {summary_path}")
+        self.last_batch_summary = summary
+
+    # Wstępne ładowanie w tle (np. gdy użytkownik wybiera pliki): model Whisper trafia do puli, a przy
+    # diaryzacji także enkoder głosu. Transkrypcja rozpoczęta w trakcie czeka na blokadzie puli i dostaje
+    # gotowy model. Przy równoległych procesach CPU modele ładują procesy robocze, więc nic się nie dzieje.
+    # Zwraca uruchomiony wątek lub None.
+    def warm_up(self, options):
+        if options.hardware_mode == "cpu" and options.workers > 1:
+            return None
+        def load():
+            start = time.perf_counter()
+            try:
+                self._load_model(options)
+                if options.enable_speaker_diarization:
+                    from diarization import get_encoder
+                    get_encoder(resolve_device(options.hardware_mode))
+                logger.info(f"Wstępne ładowanie zakończone w {time.perf_counter() - start:.1f} s.")
+            except Exception as e:
+                logger.warning(f"Wstępne ładowanie modelu nie powiodło się: {str(e)}")
+        thread = threading.Thread(target=load, name="wstepne-ladowanie", daemon=True)
+        thread.start()
+        return thread
+
+    def log_cache_stats(self):
+        for cache in self._caches.values():
+            stats = cache.stats()
+            logger.info(f"Pamięć podręczna ({cache.cache_dir}): trafienia {stats['hits']}, chybienia {stats['misses']}, "
+                        f"{stats['entries']} wpisów, {stats['size_mb']:.1f} z {stats['max_mb']:.0f} MB.")
+
+    # Zwraca słownik {format: ścieżka}; przy options.metrics także "metrics" – plik z pomiarami etapów.
+    def run_file(self, file_path, options):
+        output_base = self._output_base(file_path, options)
+        metrics = FileMetrics(file_path, profile_stage=options.profile_stage, profiler=self.profiler,
+                              profile_path=output_base)
+        metrics.info.update({"model_size": options.model_size, "hardware_mode": options.hardware_mode})
+        try:
+            outputs = self._run_file(file_path, options, metrics)
+        finally:
+            metrics.close()
+        if options.metrics:
+            outputs["metrics"] = metrics.write(f"{output_base}_metrics.json")
+            logger.info(f"Metryki etapów zapisane: {outputs['metrics']}")
+        return outputs
+
+    def _run_file(self, file_path, options, metrics):
+        file_ext = os.path.splitext(file_path)[1].lower()
+        base_filename = os.path.splitext(os.path.basename(file_path))[0]
+        # Folder tymczasowy: "Tymczasowy_<nazwa_pliku>" w katalogu źródłowym – tworzony tylko wtedy,
+        # gdy rzeczywiście coś do niego zapisujemy (ścieżka moviepy lub keep_intermediate_audio).
+        temp_dir = os.path.join(os.path.dirname(file_path), f"Tymczasowy_{base_filename}")
+
+        checkpoint = Checkpoint(temp_dir, file_path, options) if options.checkpoints else None
+        state = checkpoint.load() if checkpoint is not None and options.resume else None
+
+        if options.streaming:
+            return self._run_streaming(file_path, options, temp_dir, checkpoint, state, metrics)
+
+        # Niezmieniony plik (ta sama ścieżka, rozmiar i czas modyfikacji) – wynik z pamięci podręcznej bez dekodowania.
+        cache = self._get_cache(options)
+        if cache is not None:
+            with metrics.span("cache_lookup"):
+                known_hash = cache.known_audio_hash(file_path)
+                entry = cache.get(cache.make_key(known_hash, options)) if known_hash is not None else None
+            if entry is not None:
+                logger.info(f"Pamięć podręczna: trafienie dla {file_path} – odtwarzam tylko wybrane formaty eksportu.")
+                metrics.info["cache_hit"] = True
+                return self._export_results(file_path, options, entry["result"], entry["segments"], metrics)
+
+        if file_ext in VIDEO_EXTENSIONS:
+            self._status("Wyodrębnianie audio z wideo...")
+            logger.info("Wyodrębnianie audio z wideo...")
+            audio = None
+            with metrics.span("conversion"):
+                if options.video_extraction == "ffmpeg":
+                    try:
+                        audio, stats = decode_ffmpeg(file_path)
+                    except Exception as e:
+                        logger.warning(f"Wyodrębnianie ffmpeg nie powiodło się, próbuję moviepy: {str(e)}")
+                if audio is None:
+                    try:
+                        audio, stats = extract_audio_moviepy(file_path, temp_dir)
+                    except Exception as e:
+                        logger.error(f"Błąd podczas wyodrębniania audio: {str(e)}")
+                        raise Exception(f"Nie można wyodrębnić audio: {str(e)}")
+            logger.info(f"Wyodrębnianie audio z wideo – {format_extraction_stats(stats)}")
+        else:
+            self._status("Wczytywanie audio...")
+            audio = None
+
+        # Jedno dekodowanie do bufora mono float32 16 kHz – używanego przez Whisper i diaryzację.
+        try:
+            with metrics.span("decode"):
+                if audio is None:
+                    audio = load_audio(file_path)
+                validate_audio(audio)
+        except Exception as e:
+            logger.error(f"Błąd weryfikacji audio: {str(e)}")
+            raise Exception(f"Plik audio jest nieprawidłowy: {str(e)}")
+        audio_seconds = len(audio) / SAMPLE_RATE
+        metrics.info["audio_seconds"] = round(audio_seconds, 3)
+        self._progress(0.0, audio_seconds)
+        cache_key = None
+        if cache is not None:
+            with metrics.span("cache_lookup"):
+                audio_hash = hash_audio(audio)
+                cache.remember_file(file_path, audio_hash)
+                cache_key = cache.make_key(audio_hash, options)
+                # Ten sam skrót sprawdzony już przed dekodowaniem – bez drugiego wyszukania (i drugiego chybienia).
+                entry = cache.get(cache_key) if audio_hash != known_hash else None
+            if entry is not None:
+                logger.info(f"Pamięć podręczna: trafienie dla {file_path} (to samo audio) – odtwarzam tylko wybrane formaty eksportu.")
+                metrics.info["cache_hit"] = True
+                return self._export_results(file_path, options, entry["result"], entry["segments"], metrics)
+            logger.info(f"Pamięć podręczna: brak wyniku dla {file_path}.")
+        metrics.info["cache_hit"] = False
+        if options.keep_intermediate_audio:
+            with metrics.span("save_intermediate_audio"):
+                os.makedirs(temp_dir, exist_ok=True)
+                processed_path = os.path.join(temp_dir, "processed_audio.wav")
+                save_wav(processed_path, audio)
+            logger.info(f"Pliki tymczasowe zapisane są w: {temp_dir}. Usuń je samodzielnie lub wykorzystaj do innych celów.")
+
+        with metrics.span("model_load"):
+            model = self._load_model(options)
+
+        # Osadzenia głosu i klastrowanie zależą tylko od audio – liczone są w osobnym wątku
+        # równolegle z Whisperem; dopiero przypisanie mówców do segmentów czeka na oba wyniki.
+        file_start = time.time()
+        diarization_executor = None
+        diarization_future = None
+        if options.enable_speaker_diarization:
+            logger.info("Rozpoczynanie diaryzacji (równolegle z transkrypcją)...")
+            diarization_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diaryzacja")
+            diarization_future = diarization_executor.submit(self._diarize, audio, options, checkpoint, metrics)
+
+        self._status("Transkrypcja w toku...")
+        transcribe_options = self._transcribe_options(options)
+        repetition = RepetitionFilter(model, transcribe_options) if options.remove_duplicates else None
+        try:
+            decode_start = time.time()
+            with metrics.span("transcribe"), cancellable(model, self.cancel_event):
+                if checkpoint is not None and (audio_seconds > options.checkpoint_seconds or state is not None):
+                    result = self._transcribe_with_checkpoints(model, audio, options, transcribe_options, checkpoint, state,
+                                                               repetition=repetition)
+                else:
+                    if options.vad:
+                        result, _ = transcribe_with_vad(model, audio, aggressiveness=options.vad_aggressiveness, **transcribe_options)
+                    else:
+                        result = model.transcribe(audio, **transcribe_options)
+                    if repetition is not None:
+                        segments = repetition.repair(audio, result.get("segments", []), language=result.get("language"))
+                        segments = repetition.drop_duplicates(segments)
+                        result = dict(result, segments=segments, text="".join(seg["text"] for seg in segments))
+            if repetition is not None:
+                logger.info(repetition.format_stats())
+                metrics.info["repetitions"] = repetition.stats()
+            decode_seconds = time.time() - decode_start
+            logger.info(f"Dekodowanie Whisper: {decode_seconds:.1f} s dla {audio_seconds:.1f} s nagrania "
+                        f"(współczynnik czasu rzeczywistego {decode_seconds / audio_seconds:.2f}).")
+        except TranscriptionCancelled:
+            if diarization_executor is not None:
+                diarization_executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        except Exception as e:
+            if diarization_executor is not None:
+                diarization_executor.shutdown(wait=False, cancel_futures=True)
+            logger.error(f"Błąd transkrypcji: {str(e)}")
+            raise Exception(f"Błąd transkrypcji: {str(e)}")
+
+        self._progress(audio_seconds, audio_seconds)
+        segments = result.get("segments", [])
+        if diarization_future is not None:
+            self._status("Rozpoznawanie mówców...")
+            try:
+                with metrics.span("diarization.wait"):
+                    diarization = diarization_future.result()
+                check_cancelled(self.cancel_event)
+                if diarization is not None:
+                    from diarization import assign_speakers
+                    with metrics.span("diarization.assignment"):
+                        segments = assign_speakers(segments, diarization)
+                    diarization_seconds = diarization.embed_seconds + diarization.cluster_seconds
+                    logger.info(f"Czasy etapów: ASR {decode_seconds:.1f} s, diaryzacja {diarization_seconds:.1f} s "
+                                f"(osadzenia {diarization.embed_seconds:.1f} s, klastrowanie {diarization.cluster_seconds:.1f} s), "
+                                f"łącznie {time.time() - file_start:.1f} s zamiast {decode_seconds + diarization_seconds:.1f} s sekwencyjnie.")
+            except TranscriptionCancelled:
+                raise
+            except Exception as e:
+                logger.error(f"Błąd podczas diaryzacji: {str(e)}")
+            finally:
+                diarization_executor.shutdown(wait=False)
+
+        metrics.info["segments"] = len(segments)
+        if cache is not None:
+            with metrics.span("cache_store"):
+                cache.put(cache_key, result, segments, source=os.path.abspath(file_path))
+        outputs = self._export_results(file_path, options, result, segments, metrics)
+        if checkpoint is not None:
+            checkpoint.remove()
+        return outputs
+
+    # Transkrypcja w oknach checkpoint_seconds z zapisem punktu kontrolnego po każdym oknie.
+    # Przy wznowieniu (state) zaczyna od zapisanego przesunięcia z zachowanymi segmentami i kontekstem.
+    def _transcribe_with_checkpoints(self, model, audio, options, transcribe_options, checkpoint, state, repetition=None):
+        from streaming import transcribe_windows
+        state = state or {}
+        segments = list(state.get("segments", []))
+        offset = state.get("offset", 0.0)
+        language = state.get("language") or transcribe_options.get("language")
+        if language is not None:
+            transcribe_options = dict(transcribe_options, language=language)
+        windows = iter_buffer_windows(audio, options.checkpoint_seconds, start_seconds=offset)
+        vad_aggressiveness = options.vad_aggressiveness if options.vad else None
+        for committed, offset, prompt, language in transcribe_windows(
+                model, windows, transcribe_options, offset=offset, prompt=state.get("prompt"),
+                first_id=len(segments), vad_aggressiveness=vad_aggressiveness, repetition=repetition):
+            segments.extend(committed)
+            checkpoint.save({"offset": offset, "prompt": prompt, "language": language, "segments": segments})
+            self._status(f"Transkrypcja w toku – {int(offset)} s z {int(len(audio) / SAMPLE_RATE)} s nagrania...")
+            self._progress(offset, len(audio) / SAMPLE_RATE)
+            check_cancelled(self.cancel_event)
+        return {"text": "".join(seg["text"] for seg in segments), "segments": segments, "language": language}
+
+    # Zapis wybranych formatów eksportu (również przy trafieniu w pamięci podręcznej).
+    def _export_results(self, file_path, options, result, segments, metrics):
+        base_filename = os.path.splitext(os.path.basename(file_path))[0]
+        output_base = self._output_base(file_path, options)
+        self._status("Zapisywanie wyników...")
+        logger.info("Zapisywanie wyników...")
+        try:
+            export_start = time.time()
+            timings = {}
+            with metrics.span("export"):
+                outputs = export_results(output_base, options.export_formats, result, segments,
+                                         json_compact=options.json_compact, json_tokens=options.json_tokens,
+                                         timings=timings)
+            for fmt, seconds in timings.items():
+                metrics.record(f"export.{fmt}", seconds)
+            for fmt, path in outputs.items():
+                logger.info(f"{fmt.upper()} zapisany: {path}")
+            # Zapis logów w folderze "logs" w katalogu źródłowym – podsumowanie zamiast ponownego zrzutu segmentów,
+            # które są już w plikach wynikowych.
+            log_dir = get_log_dir(os.path.dirname(file_path))
+            log_out = os.path.join(log_dir, f"{base_filename}.log")
+            duration = segments[-1]["end"] if segments else 0.0
+            with open(log_out, 'w', encoding='utf-8') as f:
+                f.write(f"LOGI dla: {file_path}\n")
+                f.write(f"Segmenty: {len(segments)}, czas nagrania z transkrypcją: {duration:.1f} s, "
+                        f"język: {result.get('language')}\n")
+                for fmt, path in outputs.items():
+                    f.write(f"{fmt}: {path}\n")
+            logger.info(f"Log zapisany: {log_out}")
+            logger.info(f"Eksport {len(segments)} segmentów do {len(outputs)} plików: {time.time() - export_start:.2f} s.")
+        except Exception as e:
+            logger.error(f"Błąd zapisu wyników: {str(e)}")
+            raise Exception(f"Błąd zapisu wyników: {str(e)}")
+        index = self._get_index(options)
+        if index is not None:
+            with metrics.span("index"):
+                self._index_segments(index, output_base, file_path, segments, replace=True)
+        return outputs
+
+    # Dopisanie segmentów do indeksu wyszukiwania – błąd indeksu nie przerywa transkrypcji (wyniki są już zapisane).
+    def _index_segments(self, index, output_base, file_path, segments, replace=False):
+        try:
+            count = index.add_segments(output_base, segments, source=file_path, replace=replace)
+            if replace:
+                logger.info(f"Indeks wyszukiwania: {count} segmentów ({index.path}).")
+        except Exception as e:
+            logger.warning(f"Nie można zaktualizować indeksu wyszukiwania {index.path}: {str(e)}")
+
+    # Etap diaryzacji zależny tylko od audio. Gdy Whisper działa na GPU, enkoder głosu liczy na CPU,
+    # żeby oba etapy nie konkurowały o kartę; w trybie "tylko GPU" enkoder również używa CUDA.
+    # Gotowy wynik diaryzacji z punktu kontrolnego jest używany ponownie, a nowy – zapisywany (razem z nazwami
+    # mówców z galerii, aby wznowienie nie dopasowywało pliku do galerii drugi raz).
+    def _diarize(self, audio, options, checkpoint=None, metrics=None):
+        from diarization import embed_and_cluster, get_encoder, DiarizationResult
+        if checkpoint is not None:
+            saved = checkpoint.load_diarization()
+            if saved is not None:
+                logger.info("Diaryzacja wczytana z punktu kontrolnego.")
+                return DiarizationResult(saved["window_starts"], saved["window_ends"], None, saved["labels"], 0.0, 0.0,
+                                         speaker_names=saved["speaker_names"])
+        device = "cuda" if options.hardware_mode == "gpu" else "cpu"
+        diarization = embed_and_cluster(audio, get_encoder(device), method=options.diarization_method,
+                                        cancel_event=self.cancel_event, metrics=metrics)
+        gallery = self._get_gallery(options)
+        if gallery is not None and diarization is not None and len(diarization.labels):
+            try:
+                diarization.speaker_names = gallery.match(diarization.embeddings, diarization.labels)
+            except Exception as e:
+                logger.warning(f"Nie można dopasować mówców do galerii {gallery.path}: {str(e)}")
+        if checkpoint is not None and diarization is not None:
+            checkpoint.save_diarization(diarization)
+        return diarization
+
+    # Plik PCM 16 kHz dla trybu strumieniowego z diaryzacją. Przy wznowieniu (reuse) używany jest plik
+    # z poprzedniego uruchomienia – decode_ffmpeg_to_pcm zapisuje go atomowo, więc jest kompletny.
+    def _open_pcm(self, file_path, temp_dir, reuse=False, metrics=None):
+        pcm_path = os.path.join(temp_dir, PCM_FILE)
+        if reuse and os.path.exists(pcm_path):
+            logger.info(f"Wznawianie: używam zdekodowanego pliku PCM {pcm_path}.")
+            return PcmFile(pcm_path)
+        self._status("Dekodowanie audio do pliku PCM...")
+        os.makedirs(temp_dir, exist_ok=True)
+        try:
+            with metrics.span("decode"):
+                pcm, stats = decode_ffmpeg_to_pcm(file_path, pcm_path)
+        except Exception as e:
+            logger.error(f"Błąd dekodowania audio: {str(e)}")
+            raise Exception(f"Nie można zdekodować audio: {str(e)}")
+        logger.info(f"Dekodowanie do pliku – {format_extraction_stats(stats)}")
+        return pcm
+
+    # Zamyka plik PCM i usuwa go, chyba że włączono zachowanie plików pośrednich albo przerwana transkrypcja
+    # z punktem kontrolnym wznowi się z tego pliku (po wznowieniu i tak zostanie usunięty).
+    def _close_pcm(self, pcm, options, keep_for_resume=False):
+        pcm.close()
+        if options.keep_intermediate_audio:
+            logger.info(f"Plik PCM 16 kHz zachowany: {pcm.path}")
+        elif not keep_for_resume:
+            try:
+                os.remove(pcm.path)
+            except OSError as e:
+                logger.warning(f"Nie można usunąć pliku PCM {pcm.path}: {str(e)}")
+
+    # Indeks wyszukiwania dla pliku z ustawień (None, gdy wyłączony). Jedna instancja na plik.
+    def _get_index(self, options):
+        if not options.search_index:
+            return None
+        index_path = options.index_path or DEFAULT_INDEX_PATH
+        if index_path not in self._indexes:
+            try:
+                self._indexes[index_path] = SearchIndex(index_path)
+            except Exception as e:
+                logger.warning(f"Indeks wyszukiwania {index_path} jest niedostępny: {str(e)}")
+                return None
+        return self._indexes[index_path]
+
+    # Galeria mówców z ustawień (None, gdy wyłączona). Jedna instancja na plik – indeks wektorowy galerii
+    # zostaje w pamięci dla kolejnych plików partii.
+    def _get_gallery(self, options):
+        if not (options.speaker_gallery and options.enable_speaker_diarization):
+            return None
+        gallery_path = options.gallery_path or DEFAULT_GALLERY_PATH
+        if gallery_path not in self._galleries:
+            try:
+                self._galleries[gallery_path] = SpeakerGallery(gallery_path)
+            except Exception as e:
+                logger.warning(f"Galeria mówców {gallery_path} jest niedostępna: {str(e)}")
+                return None
+        gallery = self._galleries[gallery_path]
+        gallery.threshold = options.speaker_threshold
+        return gallery
+
+    # Pamięć podręczna wyników dla katalogu z ustawień (None, gdy wyłączona). Jedna instancja na katalog.
+    # Z galerią mówców pamięć podręczna jest pomijana: etykiety zależą od stanu galerii, który zmienia
+    # każdy kolejny plik, więc zapamiętany wynik miałby nieaktualne nazwy mówców.
+    def _get_cache(self, options):
+        if not options.use_cache or (options.speaker_gallery and options.enable_speaker_diarization):
+            return None
+        cache_dir = options.cache_dir or DEFAULT_CACHE_DIR
+        if cache_dir not in self._caches:
+            self._caches[cache_dir] = ResultCache(cache_dir, max_mb=options.cache_max_mb)
+        return self._caches[cache_dir]
+
+    def _load_model(self, options):
+        model_size = options.model_size
+        device = resolve_device(options.hardware_mode)
+        quantized = options.quantize and device == "cpu"
+        if options.quantize and not quantized:
+            logger.warning("Model int8 jest dostępny tylko w trybie CPU – używam modelu fp32.")
+        # W procesach roboczych (parallel.py) liczbę wątków ustala już initializer. Model fp32 bez jawnego
+        # cpu_threads zostaje przy domyślnych ustawieniach wątków torch.
+        if device == "cpu" and options.workers <= 1 and (quantized or options.cpu_threads):
+            configure_cpu_threads(options.cpu_threads)
+        variant = f"{model_size}, {device}{', int8' if quantized else ''}"
+        self._status(f"Ładowanie modelu Whisper ({variant})...")
+        try:
+            load_start = time.time()
+            model, hit = self.model_pool.get(model_size, device, quantized=quantized,
+                                             quantized_dir=options.quantized_dir or DEFAULT_QUANTIZED_DIR)
+            if hit:
+                logger.info(f"Model Whisper ({variant}) pobrany z puli (trafienie).")
+            else:
+                logger.info(f"Model Whisper ({variant}) załadowany w {time.time() - load_start:.1f} s (brak w puli).")
+        except Exception as e:
+            logger.error(f"Błąd ładowania modelu: {str(e)}")
+            raise Exception(f"Nie można załadować modelu Whisper: {str(e)}")
+        return model
+
+    def _transcribe_options(self, options):
+        transcribe_options = {}
+        if options.force_polish:
+            transcribe_options["language"] = "pl"
+        return transcribe_options
+
+    def _output_base(self, file_path, options):
+        # Folder wynikowy: "wyniki_<nazwa_pliku>" w katalogu wyjściowym (domyślnie katalog źródłowy)
+        base_filename = os.path.splitext(os.path.basename(file_path))[0]
+        output_root = options.output_dir or os.path.dirname(file_path)
+        output_subdir = os.path.join(output_root, f"wyniki_{base_filename}")
+        os.makedirs(output_subdir, exist_ok=True)
+        return os.path.join(output_subdir, base_filename)
+
+    # Tryb strumieniowy: audio czytane w oknach, wyniki dopisywane na bieżąco (streaming.py).
+    def _run_streaming(self, file_path, options, temp_dir, checkpoint, state, metrics):
+        from streaming import transcribe_streaming
+        with metrics.span("model_load"):
+            model = self._load_model(options)
+        # Diaryzacja potrzebuje całego nagrania, ale nie w pamięci: dekodowanie raz do pliku PCM w folderze
+        # tymczasowym, z którego Whisper czyta okna, a enkoder mówców (w osobnym wątku) – fragmenty.
+        pcm = None
+        diarization_executor = None
+        diarization_future = None
+        completed = False
+        # Plik PCM jest zamykany (i usuwany, jeśli nie będzie potrzebny) również po błędzie lub anulowaniu.
+        try:
+            if options.enable_speaker_diarization:
+                pcm = self._open_pcm(file_path, temp_dir, reuse=state is not None, metrics=metrics)
+                metrics.info["audio_seconds"] = round(pcm.duration, 3)
+                logger.info("Rozpoczynanie diaryzacji (równolegle z transkrypcją)...")
+                diarization_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diaryzacja")
+                diarization_future = diarization_executor.submit(self._diarize, pcm, options, checkpoint, metrics)
+            output_base = self._output_base(file_path, options)
+            transcribe_options = self._transcribe_options(options)
+            repetition = RepetitionFilter(model, transcribe_options) if options.remove_duplicates else None
+            # Indeks wyszukiwania uzupełniany po każdym zapisie segmentów. Przy wznowieniu usuwane są segmenty
+            # zaindeksowane po ostatnim punkcie kontrolnym (wyniki są do niego przycinane i dopisywane ponownie).
+            index = self._get_index(options)
+            if index is not None:
+                pending = (state or {}).get("pending_segments") or []
+                resume_seconds = pending[0]["start"] if pending else (state or {}).get("offset", 0.0)
+                try:
+                    index.remove_segments(output_base, from_ms=int(round(resume_seconds * 1000)))
+                except Exception as e:
+                    logger.warning(f"Nie można zaktualizować indeksu wyszukiwania {index.path}: {str(e)}")
+                def on_segments(segments):
+                    self._index_segments(index, output_base, file_path, segments)
+            else:
+                on_segments = None
+            self._status("Transkrypcja strumieniowa w toku...")
+            def on_window(seconds):
+                self._status(f"Transkrypcja strumieniowa – przetworzono {int(seconds)} s nagrania...")
+                self._progress(seconds, None)
+            try:
+                with metrics.span("transcribe_streaming"):
+                    outputs, count = transcribe_streaming(model, file_path, output_base, options.export_formats,
+                                                          transcribe_options,
+                                                          window_seconds=options.stream_window_seconds, on_window=on_window,
+                                                          vad_aggressiveness=options.vad_aggressiveness if options.vad else None,
+                                                          checkpoint=checkpoint, state=state, cancel_event=self.cancel_event,
+                                                          json_compact=options.json_compact, json_tokens=options.json_tokens,
+                                                          audio_source=pcm, diarization_future=diarization_future,
+                                                          repetition=repetition, on_segments=on_segments)
+            except TranscriptionCancelled:
+                if diarization_executor is not None:
+                    diarization_executor.shutdown(wait=True, cancel_futures=True)
+                raise
+            except Exception as e:
+                if diarization_executor is not None:
+                    diarization_executor.shutdown(wait=False, cancel_futures=True)
+                logger.error(f"Błąd transkrypcji: {str(e)}")
+                raise Exception(f"Błąd transkrypcji: {str(e)}")
+            if diarization_executor is not None:
+                diarization_executor.shutdown(wait=True)
+            completed = True
+        finally:
+            if pcm is not None:
+                self._close_pcm(pcm, options, keep_for_resume=not completed and checkpoint is not None)
+        logger.info(f"Transkrypcja strumieniowa zakończona: {count} segmentów zapisanych do {output_base}.*")
+        metrics.info["segments"] = count
+        if repetition is not None:
+            logger.info(repetition.format_stats())
+            metrics.info["repetitions"] = repetition.stats()
+        if checkpoint is not None:
+            checkpoint.remove()
+        return outputs
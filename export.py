@@ -0,0 +1,211 @@
+# Eksport wyników – wszystkie wybrane formaty zapisywane w jednym przejściu po segmentach.
+#
+# Znaczniki czasu i oczyszczony tekst segmentu liczone są raz i trafiają do TXT/SRT/VTT/CSV/autorskiego TXT.
+# JSON domyślnie ma wcięcia i pełne segmenty Whispera; tryb zwarty (json_compact, json_tokens=False) pomija
+# wcięcia i identyfikatory tokenów, a format binarny
+# "msgpack" zapisuje pełny wynik tak, by można go było szybko wczytać do ponownego przetwarzania (load_result).
+# Ten sam eksporter dopisuje segmenty na bieżąco w trybie strumieniowym (streaming.py).
+#
+# Plik .msgpack to ciąg obiektów: nagłówek, kolejne segmenty i zamknięcie z językiem (oraz surowym
+# wynikiem Whispera, gdy jest dostępny) – przerwana transkrypcja strumieniowa nadal daje się wczytać.
+
+import os
+import csv
+import json
+import time
+import logging
+from collections import defaultdict
+
+import msgpack
+
+logger = logging.getLogger("TranscriptionApp")
+
+BINARY_FORMAT_VERSION = 1
+
+# Znaczniki czasu napisów: SRT "00:01:02,345", VTT "00:01:02.345".
+def format_srt_time(seconds):
+    h = int(seconds // 3600)
+    m = int((seconds % 3600) // 60)
+    s = int(seconds % 60)
+    ms = int((seconds - int(seconds)) * 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+def format_vtt_time(seconds):
+    return format_srt_time(seconds).replace(",", ".")
+
+# Segment bez identyfikatorów tokenów (include_tokens=False) – tokeny to większość objętości JSON.
+def compact_segment(seg, include_tokens=False):
+    if include_tokens or "tokens" not in seg:
+        return seg
+    return {key: value for key, value in seg.items() if key != "tokens"}
+
+def compact_result(result, include_tokens=False):
+    if include_tokens:
+        return result
+    return dict(result, segments=[compact_segment(seg) for seg in result.get("segments", [])])
+
+# Wartości numpy (np. float32 z diaryzacji) zamieniane na typy msgpack.
+def _msgpack_default(obj):
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Nie można zapisać obiektu {type(obj).__name__} w formacie msgpack.")
+
+# Pliki wynikowe otwarte na czas eksportu – append() zapisuje porcję segmentów do wszystkich formatów naraz.
+# result (surowy wynik Whispera) zapisywany jest w JSON przy zamknięciu; bez niego JSON powstaje z segmentów
+# na bieżąco (tryb strumieniowy). resume_sizes (z punktu kontrolnego) przycina pliki do stanu z ostatniego
+# zapisu i dopisuje dalej. timings sumuje czas zapisu każdego formatu (do metryk, metrics.py).
+class SegmentExporter:
+    def __init__(self, output_base, export_formats, result=None, json_compact=False, json_tokens=True,
+                 resume_sizes=None, segment_count=0):
+        self.outputs = {}
+        self.timings = defaultdict(float)
+        self._files = {}
+        self._result = result
+        self._json_indent = None if json_compact else 4
+        self._json_separators = (",", ":") if json_compact else None
+        self._json_tokens = json_tokens
+        self._resume_sizes = resume_sizes
+        self._srt_index = segment_count
+        self._first_json = segment_count == 0
+        if "txt" in export_formats:
+            self._open("txt", f"{output_base}.txt")
+        if "srt" in export_formats:
+            self._open("srt", f"{output_base}.srt")
+        if "vtt" in export_formats:
+            self._open("vtt", f"{output_base}.vtt", header="WEBVTT\n\n")
+        if "json" in export_formats:
+            self._open("json", f"{output_base}.json", header=None if result is not None else '{"segments": [')
+        if "csv" in export_formats:
+            self._open("csv", f"{output_base}.csv", newline='')
+            self._csv_writer = csv.writer(self._files["csv"])
+            if resume_sizes is None:
+                self._csv_writer.writerow(["start", "end", "text"])
+        if "msgpack" in export_formats:
+            self._open("msgpack", f"{output_base}.msgpack", binary=True,
+                       header=msgpack.packb({"format": "transkrypcja", "version": BINARY_FORMAT_VERSION}))
+            self._packer = msgpack.Packer(default=_msgpack_default, use_bin_type=True)
+        # Autorski format – tekst bez sygnatur czasowych i numerków
+        self._open("autorski", f"{output_base}_autorski.txt")
+
+    def _open(self, fmt, path, newline=None, header=None, binary=False):
+        resume = self._resume_sizes is not None and fmt in self._resume_sizes and os.path.exists(path)
+        if resume:
+            os.truncate(path, self._resume_sizes[fmt])
+        mode = ('a' if resume else 'w') + ('b' if binary else '')
+        f = open(path, mode) if binary else open(path, mode, encoding='utf-8', newline=newline)
+        if header and not resume:
+            f.write(header)
+        self._files[fmt] = f
+        self.outputs[fmt] = path
+        return f
+
+    # Rozmiary plików po ostatnim zapisie – do punktu kontrolnego.
+    def sizes(self):
+        return {fmt: os.path.getsize(path) for fmt, path in self.outputs.items()}
+
+    def append(self, segments):
+        files = self._files
+        srt = files.get("srt")
+        vtt = files.get("vtt")
+        txt = files.get("txt")
+        csv_file = files.get("csv")
+        json_file = files.get("json") if self._result is None else None
+        binary = files.get("msgpack")
+        autorski = files["autorski"]
+        for seg in segments:
+            now = time.perf_counter()
+            text = seg["text"].strip()
+            if srt is not None or vtt is not None:
+                start = format_srt_time(seg["start"])
+                end = format_srt_time(seg["end"])
+            if txt is not None:
+                txt.write(f"{seg['text']}\n")
+                now = self._tick("txt", now)
+            if srt is not None:
+                self._srt_index += 1
+                srt.write(f"{self._srt_index}\n{start} --> {end}\n{text}\n\n")
+                now = self._tick("srt", now)
+            if vtt is not None:
+                vtt.write(f"{start.replace(',', '.')} --> {end.replace(',', '.')}\n{text}\n\n")
+                now = self._tick("vtt", now)
+            if json_file is not None:
+                json_file.write(("" if self._first_json else ",") +
+                                json.dumps(compact_segment(seg, self._json_tokens), ensure_ascii=False,
+                                           separators=self._json_separators))
+                self._first_json = False
+                now = self._tick("json", now)
+            if csv_file is not None:
+                self._csv_writer.writerow([seg["start"], seg["end"], text])
+                now = self._tick("csv", now)
+            if binary is not None:
+                binary.write(self._packer.pack(seg))
+                now = self._tick("msgpack", now)
+            autorski.write(f"{text}\n")
+            self._tick("autorski", now)
+        now = time.perf_counter()
+        for f in files.values():
+            f.flush()
+        self._tick("flush", now)
+
+    def _tick(self, fmt, since):
+        now = time.perf_counter()
+        self.timings[fmt] += now - since
+        return now
+
+    # complete=False (błąd lub anulowanie) zamyka pliki bez domknięcia JSON – wznowienie dopisze resztę.
+    def close(self, language=None, complete=True):
+        try:
+            if complete and "json" in self._files:
+                start = time.perf_counter()
+                if self._result is not None:
+                    json.dump(compact_result(self._result, self._json_tokens), self._files["json"], ensure_ascii=False,
+                              indent=self._json_indent, separators=self._json_separators)
+                else:
+                    self._files["json"].write(f'], "language": {json.dumps(language)}}}')
+                self.timings["json"] += time.perf_counter() - start
+            if complete and "msgpack" in self._files:
+                start = time.perf_counter()
+                self._files["msgpack"].write(self._packer.pack({"complete": True, "language": language, "result": self._result}))
+                self.timings["msgpack"] += time.perf_counter() - start
+        finally:
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
+# Zapisuje wszystkie wybrane formaty w jednym przejściu. Zwraca słownik {format: ścieżka}.
+# timings (słownik) – jeśli podany, otrzymuje czas zapisu każdego formatu w sekundach.
+def export_results(output_base, export_formats, result, segments, json_compact=False, json_tokens=True, timings=None):
+    exporter = SegmentExporter(output_base, export_formats, result=result, json_compact=json_compact,
+                               json_tokens=json_tokens)
+    complete = False
+    try:
+        exporter.append(segments)
+        complete = True
+    finally:
+        exporter.close(result.get("language"), complete=complete)
+        if timings is not None:
+            timings.update(exporter.timings)
+    return exporter.outputs
+
+# Wczytuje plik .msgpack. Zwraca (wynik, segmenty) – gdy zapis był przerwany (tryb strumieniowy),
+# wynik składany jest z zapisanych segmentów.
+def load_result(path):
+    segments = []
+    footer = {}
+    with open(path, 'rb') as f:
+        unpacker = msgpack.Unpacker(f, raw=False)
+        header = next(unpacker, None)
+        if not isinstance(header, dict) or header.get("format") != "transkrypcja":
+            raise Exception(f"Plik {path} nie jest wynikiem transkrypcji w formacie msgpack.")
+        if header.get("version") != BINARY_FORMAT_VERSION:
+            raise Exception(f"Nieobsługiwana wersja formatu msgpack: {header.get('version')}.")
+        for obj in unpacker:
+            if obj.get("complete"):
+                footer = obj
+                break
+            segments.append(obj)
+    result = footer.get("result")
+    if result is None:
+        result = {"text": "".join(seg["text"] for seg in segments), "segments": segments,
+                  "language": footer.get("language")}
+    return result, segments
@@ -0,0 +1,113 @@
+# Kanał aktualizacji interfejsu – wątki robocze (transkrypcja, kolejka, logowanie) nie dotykają Tk.
+#
+# Wątek roboczy tylko odkłada aktualizacje (GuiUpdates), a okno odbiera je partiami co GUI_TICK_MS
+# w wątku interfejsu. Linie logu trzymane są w buforze cyklicznym, a status i postęp zastępują
+# poprzednią wartość – pamięć nie rośnie, nawet gdy interfejs nie nadąża za nocną partią setek plików.
+# BatchProgress liczy postęp partii w sekundach zdekodowanego audio, a nie w liczbie plików.
+
+import threading
+from collections import deque
+
+from audio import estimate_duration
+
+# Co ile milisekund okno odbiera zebrane aktualizacje.
+GUI_TICK_MS = 200
+# Domyślny limit linii widocznych w panelu logu (pełny log jest w pliku w folderze "logs").
+DEFAULT_LOG_MAX_LINES = 2000
+# Ile komunikatów o błędach plików może czekać na wyświetlenie.
+MAX_PENDING_ERRORS = 20
+
+class GuiUpdates:
+    def __init__(self, max_lines=DEFAULT_LOG_MAX_LINES):
+        self._lock = threading.Lock()
+        self._lines = deque(maxlen=max_lines)
+        self._dropped_lines = 0
+        self._status = None
+        self._progress = None
+        self._errors = deque(maxlen=MAX_PENDING_ERRORS)
+
+    def log(self, line):
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped_lines += 1
+            self._lines.append(line)
+
+    def status(self, text):
+        with self._lock:
+            self._status = text
+
+    # Postęp w procentach (0–100).
+    def progress(self, percent):
+        with self._lock:
+            self._progress = percent
+
+    def error(self, title, message):
+        with self._lock:
+            self._errors.append((title, message))
+
+    def set_max_lines(self, max_lines):
+        with self._lock:
+            if max_lines != self._lines.maxlen:
+                self._lines = deque(self._lines, maxlen=max_lines)
+
+    # Zabiera wszystko, co zebrało się od ostatniego odbioru. Zwraca słownik z kluczami "lines",
+    # "dropped_lines" (linie wypchnięte z bufora przed odbiorem), "status" i "progress" (None – bez zmian)
+    # oraz "errors" [(tytuł, treść), ...].
+    def drain(self):
+        with self._lock:
+            updates = {"lines": list(self._lines), "dropped_lines": self._dropped_lines, "status": self._status,
+                       "progress": self._progress, "errors": list(self._errors)}
+            self._lines.clear()
+            self._dropped_lines = 0
+            self._status = None
+            self._progress = None
+            self._errors.clear()
+        return updates
+
+# Postęp partii w sekundach nagrania. Długości plików są najpierw szacowane z nagłówków (estimate_duration),
+# a długość bieżącego pliku zastępowana jest rzeczywistą po zdekodowaniu. Pliki w trybie równoległym
+# kończą się w dowolnej kolejności, więc zakończone pliki rozpoznawane są po ścieżce.
+class BatchProgress:
+    def __init__(self, file_paths, estimate=estimate_duration):
+        self.estimates = {path: max(0.0, estimate(path)) for path in file_paths}
+        self.pending = list(file_paths)
+        self.done_seconds = 0.0
+        self.remaining_seconds = sum(self.estimates.values())
+        self.current_seconds = 0.0
+        self.current_total = None
+
+    # engine.progress_callback – postęp bieżącego pliku (pierwszego nieukończonego) w sekundach nagrania.
+    def file_progress(self, seconds, total_seconds):
+        self.current_seconds = seconds
+        if total_seconds:
+            self.current_total = total_seconds
+
+    # run_batch progress_callback – plik zakończony (także z błędem).
+    def file_done(self, file_path):
+        if file_path not in self.estimates or file_path not in self.pending:
+            return
+        estimate = self.estimates[file_path]
+        actual = self.current_total if self.pending[0] == file_path and self.current_total else estimate
+        self.pending.remove(file_path)
+        self.remaining_seconds -= estimate
+        self.done_seconds += actual
+        self.current_seconds = 0.0
+        self.current_total = None
+
+    @property
+    def total_seconds(self):
+        if self.current_total and self.pending:
+            return self.done_seconds + self.remaining_seconds - self.estimates[self.pending[0]] + self.current_total
+        return self.done_seconds + self.remaining_seconds
+
+    @property
+    def processed_seconds(self):
+        current = self.current_seconds
+        if self.pending:
+            current = min(current, self.current_total or self.estimates[self.pending[0]])
+        return self.done_seconds + current
+
+    @property
+    def percent(self):
+        total = self.total_seconds
+        return min(100.0, 100.0 * self.processed_seconds / total) if total > 0 else 0.0
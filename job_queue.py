@@ -0,0 +1,329 @@
+# Trwała kolejka zadań transkrypcji (SQLite) z obserwacją folderów.
+#
+# Zadanie to plik z ustawieniami (TranscriptionOptions zapisane jako JSON), priorytetem, stanem i liczbą prób:
+#   pending → running → done
+#                     → pending (błąd, ponowna próba po RETRY_DELAY_SECONDS × numer próby)
+#                     → failed  (po max_attempts nieudanych próbach)
+#                     → pending (anulowanie – próba nie jest liczona)
+# Kolejka przetrwa zamknięcie programu; zadania "running" po awarii wracają do "pending" (recover).
+# Pobieranie zadania (claim) jest atomowe, więc kolejkę może obsługiwać kilka procesów naraz.
+#
+# FolderWatcher dodaje do kolejki nowe pliki audio/wideo z obserwowanego folderu, gdy przestaną rosnąć
+# (rozmiar i czas modyfikacji niezmienione przez settle_seconds) – kopiowany plik nie trafi do Whispera w połowie.
+# QueueRunner obsługuje kolejkę w pętli: model pozostaje w pamięci (pula silnika), a każde zadanie
+# przetwarza TranscriptionEngine.run_file – ta sama logika co w partiach z GUI i CLI.
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, fields
+
+from engine import TranscriptionOptions, SUPPORTED_EXTENSIONS
+from checkpoint import TranscriptionCancelled
+
+logger = logging.getLogger("TranscriptionApp")
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.expanduser("~"), "Documents", "TranscriptionApp", "kolejka.sqlite")
+JOB_STATES = ["pending", "running", "done", "failed"]
+DEFAULT_MAX_ATTEMPTS = 3
+# Odstęp przed ponowną próbą rośnie z numerem próby (60 s, 120 s, ...).
+RETRY_DELAY_SECONDS = 60
+# Plik jest uznawany za kompletny, gdy nie zmienia się przez tyle sekund.
+DEFAULT_SETTLE_SECONDS = 10
+# Foldery tworzone przez program obok nagrań – nie są przeszukiwane przy obserwacji rekurencyjnej.
+IGNORED_DIR_PREFIXES = ("Tymczasowy_", "wyniki_", "logs")
+
+def options_to_json(options):
+    return json.dumps(asdict(options), ensure_ascii=False)
+
+# Ustawienia z zapisanego zadania – pola nieznane w bieżącej wersji są pomijane, brakujące mają wartości domyślne.
+def options_from_json(text):
+    data = json.loads(text) if text else {}
+    known = {f.name for f in fields(TranscriptionOptions)}
+    return TranscriptionOptions(**{key: value for key, value in data.items() if key in known})
+
+class JobQueue:
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, "
+                       "options TEXT, priority INTEGER DEFAULT 0, state TEXT DEFAULT 'pending', attempts INTEGER DEFAULT 0, "
+                       "max_attempts INTEGER, not_before REAL DEFAULT 0, error TEXT, outputs TEXT, "
+                       "created REAL, updated REAL, resumable INTEGER DEFAULT 0)")
+            # resumable – zadanie przerwane (anulowanie, błąd, awaria procesu) kontynuuje od punktu kontrolnego.
+            # Kolumna dopisywana do kolejek utworzonych przez wcześniejsze wersje.
+            if "resumable" not in {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}:
+                db.execute("ALTER TABLE jobs ADD COLUMN resumable INTEGER DEFAULT 0")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (state, priority, id)")
+            # Pliki już dodane przez obserwację folderu (ścieżka, rozmiar, czas modyfikacji).
+            db.execute("CREATE TABLE IF NOT EXISTS watched (path TEXT PRIMARY KEY, size INTEGER, mtime REAL)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        finally:
+            db.close()
+
+    # Dodaje plik do kolejki. Jeśli ten sam plik czeka już na przetworzenie lub jest przetwarzany,
+    # zwracany jest identyfikator istniejącego zadania (wyższy priorytet zostaje zachowany).
+    def enqueue(self, file_path, options=None, priority=0):
+        path = os.path.abspath(file_path)
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT id, priority FROM jobs WHERE path = ? AND state IN ('pending', 'running')",
+                             (path,)).fetchone()
+            if row is not None:
+                if priority > row["priority"]:
+                    db.execute("UPDATE jobs SET priority = ?, updated = ? WHERE id = ?", (priority, now, row["id"]))
+                return row["id"]
+            cursor = db.execute("INSERT INTO jobs (path, options, priority, max_attempts, created, updated) "
+                                "VALUES (?, ?, ?, ?, ?, ?)",
+                                (path, options_to_json(options or TranscriptionOptions()), priority,
+                                 self.max_attempts, now, now))
+            job_id = cursor.lastrowid
+        logger.info(f"Dodano do kolejki zadanie {job_id}: {path} (priorytet {priority}).")
+        return job_id
+
+    # Pobiera zadanie o najwyższym priorytecie (przy równym – najstarsze) i oznacza je jako "running".
+    def claim(self):
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE state = 'pending' AND not_before <= ? "
+                             "ORDER BY priority DESC, id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET state = 'running', attempts = attempts + 1, updated = ? WHERE id = ?",
+                       (now, row["id"]))
+        job = self._job(row)
+        job["state"] = "running"
+        job["attempts"] += 1
+        return job
+
+    def complete(self, job_id, outputs=None):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET state = 'done', error = NULL, outputs = ?, updated = ? WHERE id = ?",
+                       (json.dumps(outputs or {}, ensure_ascii=False), time.time(), job_id))
+
+    # Błąd zadania: ponowna próba z opóźnieniem albo – po wyczerpaniu prób – stan "failed". Zwraca nowy stan.
+    def fail(self, job_id, error):
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["attempts"] < (row["max_attempts"] or self.max_attempts):
+                state = "pending"
+                not_before = now + RETRY_DELAY_SECONDS * row["attempts"]
+            else:
+                state, not_before = "failed", 0
+            db.execute("UPDATE jobs SET state = ?, error = ?, not_before = ?, resumable = 1, updated = ? WHERE id = ?",
+                       (state, str(error), not_before, now, job_id))
+        return state
+
+    # Zadanie przerwane anulowaniem wraca do kolejki bez liczenia próby (wznowi się od punktu kontrolnego).
+    def release(self, job_id):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET state = 'pending', attempts = MAX(attempts - 1, 0), resumable = 1, updated = ? "
+                       "WHERE id = ?", (time.time(), job_id))
+
+    # Zadania "running" pozostawione przez zamknięty lub przerwany proces wracają do kolejki.
+    # Wywoływane przy starcie obsługi kolejki – przy kilku procesach tylko wtedy, gdy żaden inny nie działa.
+    def recover(self):
+        with self._connect() as db:
+            count = db.execute("UPDATE jobs SET state = 'pending', resumable = 1, updated = ? WHERE state = 'running'",
+                               (time.time(),)).rowcount
+        if count:
+            logger.info(f"Przywrócono do kolejki {count} przerwanych zadań.")
+        return count
+
+    # Ponowne uruchomienie zadania (np. "failed") od zera.
+    def retry(self, job_id):
+        with self._connect() as db:
+            return db.execute("UPDATE jobs SET state = 'pending', attempts = 0, not_before = 0, error = NULL, "
+                              "resumable = 0, updated = ? WHERE id = ? AND state != 'running'", (time.time(), job_id)).rowcount > 0
+
+    def remove(self, job_id):
+        with self._connect() as db:
+            return db.execute("DELETE FROM jobs WHERE id = ? AND state != 'running'", (job_id,)).rowcount > 0
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    # Zadania w podanych stanach (wszystkie, gdy states=None) – w kolejności obsługi.
+    def jobs(self, states=None, limit=None):
+        query = "SELECT * FROM jobs"
+        params = []
+        if states:
+            query += f" WHERE state IN ({', '.join('?' for _ in states)})"
+            params.extend(states)
+        query += " ORDER BY CASE state WHEN 'running' THEN 0 WHEN 'pending' THEN 1 ELSE 2 END, priority DESC, id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as db:
+            rows = db.execute(query, params).fetchall()
+        return [self._job(row) for row in rows]
+
+    def counts(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update({row[0]: row[1] for row in rows})
+        return counts
+
+    # Obserwacja folderów: czy plik o tym rozmiarze i czasie modyfikacji został już dodany.
+    def seen(self, path, size, mtime):
+        with self._connect() as db:
+            row = db.execute("SELECT size, mtime FROM watched WHERE path = ?", (path,)).fetchone()
+        return row is not None and row["size"] == size and row["mtime"] == mtime
+
+    def mark_seen(self, path, size, mtime):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO watched (path, size, mtime) VALUES (?, ?, ?)", (path, size, mtime))
+
+    def _job(self, row):
+        job = dict(row)
+        job["outputs"] = json.loads(job["outputs"]) if job["outputs"] else {}
+        return job
+
+# Obserwacja folderu (odpytywanie co wywołanie poll). Plik trafia do kolejki, gdy jego rozmiar i czas
+# modyfikacji nie zmieniły się przez settle_seconds; zmieniony później plik (nowa wersja) trafia ponownie.
+class FolderWatcher:
+    def __init__(self, folder, queue, options=None, priority=0, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 recursive=False, extensions=SUPPORTED_EXTENSIONS):
+        self.folder = os.path.abspath(folder)
+        self.queue = queue
+        self.options = options or TranscriptionOptions()
+        self.priority = priority
+        self.settle_seconds = settle_seconds
+        self.recursive = recursive
+        self.extensions = {ext.lower() for ext in extensions}
+        # Kandydaci: ścieżka → (rozmiar, czas modyfikacji, od kiedy bez zmian).
+        self._pending = {}
+
+    def _scan(self):
+        for root, dirs, files in os.walk(self.folder):
+            dirs[:] = [d for d in dirs if not d.startswith(IGNORED_DIR_PREFIXES)] if self.recursive else []
+            for name in files:
+                if os.path.splitext(name)[1].lower() in self.extensions:
+                    yield os.path.join(root, name)
+
+    # Jedno przejście po folderze. Zwraca identyfikatory dodanych zadań.
+    def poll(self):
+        now = time.time()
+        added = []
+        present = set()
+        for path in self._scan():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            present.add(path)
+            signature = (st.st_size, st.st_mtime)
+            previous = self._pending.get(path)
+            if previous is None or previous[:2] != signature:
+                if st.st_size > 0 and not self.queue.seen(path, *signature):
+                    self._pending[path] = (*signature, now)
+                else:
+                    self._pending.pop(path, None)
+                continue
+            if now - previous[2] >= self.settle_seconds:
+                added.append(self.queue.enqueue(path, self.options, self.priority))
+                self.queue.mark_seen(path, *signature)
+                del self._pending[path]
+        for path in list(self._pending):
+            if path not in present:
+                del self._pending[path]
+        return added
+
+# Obsługa kolejki w pętli (run) – do zatrzymania przez stop(). Bieżące zadanie jest anulowane kooperacyjnie
+# i wraca do kolejki z punktem kontrolnym. job_callback(job, state) wywoływany jest po każdym zadaniu.
+class QueueRunner:
+    def __init__(self, engine, queue, watchers=(), poll_seconds=2.0, job_callback=None):
+        self.engine = engine
+        self.queue = queue
+        self.watchers = list(watchers)
+        self.poll_seconds = poll_seconds
+        self.job_callback = job_callback
+        # Zadanie obsługiwane w tej chwili (słownik z claim) lub None.
+        self.current_job = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+        self.engine.cancel()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    # recover=False, gdy kilka obsługujących dzieli kolejkę w jednym procesie (przywrócenie wykonuje się raz, przed startem).
+    def run(self, recover=True):
+        self._stop.clear()
+        self.engine.cancel_event.clear()
+        if recover:
+            self.queue.recover()
+        logger.info(f"Obsługa kolejki {self.queue.path} uruchomiona ({len(self.watchers)} obserwowanych folderów).")
+        while not self._stop.is_set():
+            if not self.run_once():
+                self._stop.wait(self.poll_seconds)
+        self.engine.log_cache_stats()
+        logger.info("Obsługa kolejki zatrzymana.")
+
+    # Przegląd folderów i obsługa co najwyżej jednego zadania. Zwraca True, gdy zadanie zostało obsłużone.
+    def run_once(self):
+        for watcher in self.watchers:
+            try:
+                watcher.poll()
+            except OSError as e:
+                logger.warning(f"Nie można przejrzeć folderu {watcher.folder}: {str(e)}")
+        job = self.queue.claim()
+        if job is None:
+            return False
+        self.handle(job)
+        return True
+
+    def handle(self, job):
+        options = options_from_json(job["options"])
+        # Zadanie przerwane lub ponawiane po błędzie kontynuuje od punktu kontrolnego poprzedniej próby
+        # (anulowanie nie liczy próby, więc nie można tego wnioskować z attempts). Wznowienie działa tylko
+        # z punktami kontrolnymi, więc włącza je tak jak --resume w CLI.
+        if job["resumable"]:
+            options.checkpoints = True
+            options.resume = True
+        logger.info(f"Zadanie {job['id']} (próba {job['attempts']}): {job['path']}")
+        self.current_job = job
+        try:
+            outputs = self.engine.run_file(job["path"], options)
+            self.queue.complete(job["id"], outputs)
+            state = "done"
+        except TranscriptionCancelled:
+            self.queue.release(job["id"])
+            state = "pending"
+            logger.info(f"Zadanie {job['id']} przerwane – wróciło do kolejki.")
+        except Exception as e:
+            state = self.queue.fail(job["id"], e)
+            logger.error(f"Błąd zadania {job['id']} ({job['path']}): {str(e)}" +
+                         (" – zostanie ponowione." if state == "pending" else " – brak kolejnych prób."))
+        finally:
+            self.current_job = None
+        if self.job_callback is not None:
+            self.job_callback(job, state)
+        return state
@@ -1,7 +1,8 @@
 # Program Zapisywacz Tekstu 2025 Paweł‑w (Python 3.13.x)
 #
 # Obsługiwane formaty: mp3, mp4, wav, m4a, flac, opus, aiff, mov, avi, mkv.
-# Pliki są tymczasowo konwertowane do WAV: PCM 16-bit, mono, 16000 Hz.
+# Pliki są dekodowane raz do pamięci: mono, 16000 Hz (bez plików pośrednich na dysku,
+# chyba że zaznaczono "Zachowaj pliki tymczasowe audio").
 #
 # SRT – format napisów (np. używany w YouTube i filmach).
 # CSV – format eksportu danych, przydatny np. do importu do arkuszy kalkulacyjnych.
@@ -16,7 +17,8 @@
 # Tylko jedna z tych opcji może być aktywna.
 #
 # Logi są zapisywane w folderze "logs" znajdującym się w katalogu źródłowym.
-# Dla każdego pliku źródłowego tworzony jest folder "Tymczasowy_<nazwa_pliku>" w tym samym katalogu.
+# Audio z wideo wyodrębniane jest strumieniowo przez ffmpeg (tylko ścieżka audio, od razu 16 kHz mono).
+# Folder "Tymczasowy_<nazwa_pliku>" w tym samym katalogu tworzony jest tylko na życzenie użytkownika.
 #
 # Po zakończeniu transkrypcji odtwarzany jest domyślny dźwięk systemowy.
 #
@@ -25,37 +27,22 @@
 
 import os
 import sys
-import glob
 import time
-import json
-import csv
+# Początek pomiaru czasu uruchomienia (do komunikatu "Okno gotowe po ... s" i --measure-startup).
+_startup_start = time.perf_counter()
 import logging
 import threading
 import random
-import subprocess
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-from pathlib import Path
-import re
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import winsound  # Do dźwięku powiadomienia
 
-import torch
-import whisper
-import moviepy.editor as mp
-from pydub import AudioSegment
-
-# Importy dla diaryzacji
-from resemblyzer import VoiceEncoder, preprocess_wav
-from spectralcluster import SpectralClusterer
-import numpy as np
-import soundfile as sf
-import librosa
-
-# Funkcja zwracająca ścieżkę folderu logów – w katalogu źródłowym.
-def get_log_dir(base_dir):
-    log_dir = os.path.join(base_dir, "logs")
-    os.makedirs(log_dir, exist_ok=True)
-    return log_dir
+from result_cache import ResultCache
+from engine import TranscriptionEngine, TranscriptionOptions, ModelPool, EXPORT_FORMATS, SUPPORTED_EXTENSIONS, get_log_dir
+from job_queue import JobQueue, FolderWatcher, QueueRunner
+from search_index import SearchIndex, backfill_folder, format_ms
+from speaker_gallery import SpeakerGallery
+from gui_updates import GuiUpdates, BatchProgress, GUI_TICK_MS, DEFAULT_LOG_MAX_LINES
 
 # Domyślny folder logów (tymczasowy, dopóki nie użytkownik wybierze plików)
 DEFAULT_LOG_DIR = os.path.join(os.path.expanduser("~"), "Documents", "TranscriptionApp", "logs")
@@ -114,24 +101,126 @@ class TranscriptionApp:
         self.main_frame.pack(fill=tk.BOTH, expand=True)
         
         self.setup_variables()
+        # Aktualizacje z wątków roboczych (log, status, postęp, błędy) – odbierane partiami w drain_updates.
+        self.updates = GuiUpdates(max_lines=DEFAULT_LOG_MAX_LINES)
+        self.batch_progress = None
         self.create_ui()
         self.start_time = None
         self.transcription_running = False
+        # Modele Whisper pozostają w pamięci między plikami i partiami.
+        self.engine = TranscriptionEngine(model_pool=ModelPool(max_models=1), status_callback=self.updates.status,
+                                          progress_callback=self.on_audio_progress)
+        # Trwała kolejka zadań – przetrwa zamknięcie okna; obsługuje ją QueueRunner z tym samym silnikiem.
+        self.job_queue = JobQueue()
+        self.queue_runner = None
+        self.watchers = []
+        waiting = self.job_queue.counts()["pending"]
+        if waiting:
+            logger.info(f"W kolejce czeka {waiting} zadań – menu „Kolejka zadań” → „Uruchom obsługę kolejki”.")
 
         # Ustawienie trybu sprzętowego:
         # Jeśli GPU jest dostępne, domyślnie wybieramy "gpu_cpu",
         # w przeciwnym razie "cpu". Dodatkowo logujemy informację o wymaganiach.
-        if torch.cuda.is_available():
-            try:
-                self.gpu_name = torch.cuda.get_device_name(0)
-            except Exception as e:
-                self.gpu_name = "Błąd przy pobieraniu nazwy GPU"
-            self.hardware_info_text.set(f"Wykryto GPU: {self.gpu_name} (CUDA {torch.version.cuda})")
-            self.hardware_mode.set("gpu_cpu")
+        # Import torch i sprawdzenie CUDA trwają kilka sekund, więc działają w tle – okno pojawia się od razu
+        # z tymczasowym trybem "cpu", a wynik ustawia tryb tylko wtedy, gdy użytkownik go jeszcze nie zmienił.
+        self.hardware_mode.set("cpu")
+        self.hardware_mode_chosen = False
+        self.warm_up_thread = None
+        self._gpu_probe = None
+        threading.Thread(target=self.probe_gpu, name="sprawdzanie-gpu", daemon=True).start()
+        self.root.after(100, self.apply_gpu_probe)
+        self.root.after_idle(self.log_startup_time)
+        self.root.after(GUI_TICK_MS, self.drain_updates)
+
+    # Odbiór zebranych aktualizacji w wątku interfejsu – jedna operacja na panelu logu na takt.
+    def drain_updates(self):
+        updates = self.updates.drain()
+        max_lines = self.get_log_max_lines()
+        self.updates.set_max_lines(max_lines)
+        if updates["lines"]:
+            self.append_log_lines(updates["lines"], updates["dropped_lines"], max_lines)
+        if updates["status"] is not None:
+            self.status_var.set(updates["status"])
+        if updates["progress"] is not None:
+            self.progress_var.set(updates["progress"])
+        for title, message in updates["errors"]:
+            messagebox.showerror(title, message)
+        self.root.after(GUI_TICK_MS, self.drain_updates)
+
+    # Panel logu jako bufor cykliczny: po dopisaniu partii najstarsze linie ponad limit są usuwane.
+    def append_log_lines(self, lines, dropped_lines, max_lines):
+        if dropped_lines:
+            lines = [f"... pominięto {dropped_lines} linii logu (pełny log w folderze logs)"] + lines
+        self.log_text.configure(state='normal')
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - max_lines
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+        self.log_text.see(tk.END)
+        self.log_text.configure(state='disabled')
+
+    def get_log_max_lines(self):
+        try:
+            return max(100, int(self.log_max_lines.get()))
+        except (tk.TclError, ValueError):
+            return DEFAULT_LOG_MAX_LINES
+
+    # engine.progress_callback (wątek roboczy): postęp w sekundach zdekodowanego audio – dla partii
+    # z okna względem szacowanej długości wszystkich plików, dla zadań kolejki względem bieżącego pliku.
+    def on_audio_progress(self, seconds, total_seconds):
+        if self.batch_progress is not None:
+            self.batch_progress.file_progress(seconds, total_seconds)
+            self.updates.progress(self.batch_progress.percent)
+        elif total_seconds:
+            self.updates.progress(min(100.0, 100.0 * seconds / total_seconds))
+
+    # Wątek w tle: import torch i sprawdzenie CUDA. Wynik odbiera apply_gpu_probe w wątku interfejsu.
+    def probe_gpu(self):
+        try:
+            import torch
+            if torch.cuda.is_available():
+                try:
+                    gpu_name = torch.cuda.get_device_name(0)
+                except Exception as e:
+                    logger.warning(f"Nie można pobrać nazwy GPU: {str(e)}")
+                    gpu_name = "Błąd przy pobieraniu nazwy GPU"
+                self._gpu_probe = (True, gpu_name, torch.version.cuda)
+            else:
+                self._gpu_probe = (False, None, None)
+        except Exception as e:
+            logger.error(f"Błąd przy sprawdzaniu GPU: {str(e)}")
+            self._gpu_probe = (False, None, None)
+
+    def apply_gpu_probe(self):
+        if self._gpu_probe is None:
+            self.root.after(100, self.apply_gpu_probe)
+            return
+        available, self.gpu_name, cuda_version = self._gpu_probe
+        if available:
+            self.hardware_info_text.set(f"Wykryto GPU: {self.gpu_name} (CUDA {cuda_version})")
+            if not self.hardware_mode_chosen:
+                self.hardware_mode.set("gpu_cpu")
         else:
             self.hardware_info_text.set("ALERT: GPU nie wykryte lub nieobsługiwane przez CUDA!")
-            self.hardware_mode.set("cpu")
             logger.info("Brak karty graficznej spełniającej wymagania. Wymagania: NVIDIA GPU wspierająca CUDA 11.8 lub nowszą oraz minimum 3GB VRAM. Program będzie działał wolniej na CPU.")
+        logger.info(f"Sprawdzenie GPU zakończone po {time.perf_counter() - _startup_start:.1f} s od uruchomienia.")
+        self.start_warm_up()
+
+    def log_startup_time(self):
+        logger.info(f"Okno gotowe po {time.perf_counter() - _startup_start:.2f} s od uruchomienia.")
+
+    def on_hardware_mode_changed(self):
+        self.hardware_mode_chosen = True
+        self.start_warm_up()
+
+    # Opcjonalne wstępne ładowanie modelu w tle (engine.warm_up) – po sprawdzeniu GPU oraz po zmianie
+    # modelu lub trybu sprzętowego, o ile transkrypcja nie trwa i poprzednie ładowanie się zakończyło.
+    def start_warm_up(self):
+        if not self.preload_model.get() or self._gpu_probe is None or self.transcription_running:
+            return
+        if self.warm_up_thread is not None and self.warm_up_thread.is_alive():
+            return
+        self.warm_up_thread = self.engine.warm_up(self.build_options())
         
     def create_menu(self):
         menu_bar = tk.Menu(self.root)
@@ -139,8 +228,138 @@ class TranscriptionApp:
         for res in RESOLUTIONS:
             view_menu.add_radiobutton(label=res, command=lambda r=res: self.change_resolution(r))
         menu_bar.add_cascade(label="Widok", menu=view_menu)
+        cache_menu = tk.Menu(menu_bar, tearoff=0)
+        cache_menu.add_command(label="Statystyki pamięci podręcznej", command=self.show_cache_stats)
+        cache_menu.add_command(label="Wyczyść pamięć podręczną", command=self.clear_cache)
+        menu_bar.add_cascade(label="Pamięć podręczna", menu=cache_menu)
+        queue_menu = tk.Menu(menu_bar, tearoff=0)
+        queue_menu.add_command(label="Dodaj wybrane pliki do kolejki", command=self.enqueue_files)
+        queue_menu.add_command(label="Obserwuj folder...", command=self.watch_folder)
+        queue_menu.add_command(label="Uruchom obsługę kolejki", command=self.start_queue_runner)
+        queue_menu.add_command(label="Zatrzymaj obsługę kolejki", command=self.stop_queue_runner)
+        queue_menu.add_command(label="Stan kolejki", command=self.show_queue_status)
+        menu_bar.add_cascade(label="Kolejka zadań", menu=queue_menu)
+        search_menu = tk.Menu(menu_bar, tearoff=0)
+        search_menu.add_command(label="Szukaj w archiwum transkrypcji...", command=self.search_archive)
+        search_menu.add_command(label="Dołącz istniejące wyniki do indeksu...", command=self.backfill_index)
+        menu_bar.add_cascade(label="Wyszukiwanie", menu=search_menu)
+        speakers_menu = tk.Menu(menu_bar, tearoff=0)
+        speakers_menu.add_command(label="Galeria mówców", command=self.show_speakers)
+        speakers_menu.add_command(label="Nadaj nazwę mówcy...", command=self.rename_speaker)
+        menu_bar.add_cascade(label="Mówcy", menu=speakers_menu)
         self.root.config(menu=menu_bar)
         
+    def show_cache_stats(self):
+        stats = ResultCache().stats()
+        messagebox.showinfo("Pamięć podręczna", f"Wpisy: {stats['entries']}\nRozmiar: {stats['size_mb']:.1f} z {stats['max_mb']:.0f} MB")
+
+    def clear_cache(self):
+        if messagebox.askyesno("Pamięć podręczna", "Usunąć wszystkie zapisane wyniki z pamięci podręcznej?"):
+            removed = ResultCache().invalidate()
+            logger.info(f"Usunięto {removed} wpisów pamięci podręcznej.")
+
+    def enqueue_files(self):
+        if not self.file_paths:
+            messagebox.showwarning("Ostrzeżenie", "Proszę wybrać pliki do dodania do kolejki.")
+            return
+        options = self.build_options()
+        for path in self.file_paths:
+            self.job_queue.enqueue(path, options)
+
+    # Nowe nagrania w folderze trafiają do kolejki z bieżącymi ustawieniami, gdy przestaną rosnąć.
+    def watch_folder(self):
+        folder = filedialog.askdirectory(title="Wybierz folder do obserwowania")
+        if not folder:
+            return
+        watcher = FolderWatcher(folder, self.job_queue, self.build_options())
+        self.watchers.append(watcher)
+        if self.queue_running():
+            self.queue_runner.watchers.append(watcher)
+        logger.info(f"Obserwowany folder: {folder}" + ("" if self.queue_running() else
+                                                       " (pliki będą dodawane po uruchomieniu obsługi kolejki)."))
+
+    # Wątek obsługi kolejki działa także chwilę po zatrzymaniu – do zapisu punktu kontrolnego bieżącego zadania.
+    def queue_running(self):
+        return self.queue_runner is not None and self.queue_thread.is_alive()
+
+    def start_queue_runner(self):
+        if self.transcription_running:
+            messagebox.showwarning("Ostrzeżenie", "Trwa transkrypcja – obsługę kolejki można uruchomić po jej zakończeniu.")
+            return
+        if self.queue_running():
+            return
+        def on_job(job, state):
+            counts = self.job_queue.counts()
+            self.updates.status(f"Kolejka: zadanie {job['id']} – {state}; czeka {counts['pending']}, "
+                                f"wykonane {counts['done']}, nieudane {counts['failed']}.")
+        self.queue_runner = QueueRunner(self.engine, self.job_queue, self.watchers, job_callback=on_job)
+        self.queue_thread = threading.Thread(target=self.queue_runner.run, daemon=True)
+        self.queue_thread.start()
+        self.status_var.set("Obsługa kolejki uruchomiona.")
+
+    def stop_queue_runner(self):
+        if not self.queue_running() or self.queue_runner.stopped:
+            logger.info("Obsługa kolejki nie jest uruchomiona.")
+            return
+        self.queue_runner.stop()
+        self.status_var.set("Zatrzymywanie obsługi kolejki...")
+
+    def show_queue_status(self):
+        counts = self.job_queue.counts()
+        lines = [f"Oczekujące: {counts['pending']}", f"W toku: {counts['running']}",
+                 f"Wykonane: {counts['done']}", f"Nieudane: {counts['failed']}"]
+        for job in self.job_queue.jobs(states=["running", "pending", "failed"], limit=10):
+            lines.append(f"{job['id']} [{job['state']}] {os.path.basename(job['path'])}")
+        messagebox.showinfo("Kolejka zadań", "\n".join(lines))
+
+    # Wyszukiwanie w indeksie (search_index.py) – najlepsze dopasowania z czasem nagrania.
+    def search_archive(self):
+        query = simpledialog.askstring("Szukaj w archiwum", "Szukane słowa lub fraza w cudzysłowie:", parent=self.root)
+        if not query:
+            return
+        try:
+            matches = SearchIndex().search(query, limit=20)
+        except Exception as e:
+            messagebox.showerror("Błąd", str(e))
+            return
+        if not matches:
+            messagebox.showinfo("Szukaj w archiwum", "Brak wyników.")
+            return
+        lines = [f"{os.path.basename(m['file'])} [{format_ms(m['start_ms'])}] "
+                 f"{m['speaker'] + ': ' if m['speaker'] else ''}{m['snippet']}" for m in matches]
+        logger.info(f"Wyszukiwanie „{query}”:\n" + "\n".join(f"{m['file']}\t{m['start_ms']}\t{m['end_ms']}\t{m['text']}" for m in matches))
+        messagebox.showinfo("Szukaj w archiwum", "\n".join(lines))
+
+    def backfill_index(self):
+        folder = filedialog.askdirectory(title="Folder z wynikami transkrypcji (wyniki_*)")
+        if not folder:
+            return
+        def run():
+            files, segments = backfill_folder(SearchIndex(), folder, extensions=SUPPORTED_EXTENSIONS)
+            self.updates.status(f"Indeks wyszukiwania: dołączono {files} plików ({segments} segmentów).")
+        threading.Thread(target=run, daemon=True).start()
+
+    # Galeria mówców (speaker_gallery.py) – etykiety "Mówca<ID>" można zastąpić nazwą osoby.
+    def show_speakers(self):
+        speakers = SpeakerGallery().speakers()
+        if not speakers:
+            messagebox.showinfo("Galeria mówców", "Galeria jest pusta – włącz opcję galerii mówców przy transkrypcji.")
+            return
+        lines = [f"{s['id']}: {s['name'] or 'Mówca' + str(s['id'])} (plików: {s['files']})" for s in speakers[-40:]]
+        messagebox.showinfo("Galeria mówców", "\n".join(lines))
+
+    def rename_speaker(self):
+        speaker_id = simpledialog.askinteger("Nadaj nazwę mówcy", "Numer mówcy z galerii (Mówca<numer>):", parent=self.root)
+        if speaker_id is None:
+            return
+        name = simpledialog.askstring("Nadaj nazwę mówcy", "Nazwa (pusta – przywraca etykietę Mówca<numer>):", parent=self.root)
+        if name is None:
+            return
+        if SpeakerGallery().rename(speaker_id, name.strip()):
+            logger.info(f"Mówca {speaker_id}: {name.strip() or f'Mówca{speaker_id}'} – nazwa obowiązuje dla kolejnych transkrypcji.")
+        else:
+            messagebox.showerror("Błąd", f"Brak mówcy {speaker_id} w galerii.")
+
     def change_resolution(self, res):
         self.root.geometry(res)
         logger.info(f"Zmieniono rozdzielczość na: {res}")
@@ -154,13 +373,24 @@ class TranscriptionApp:
         self.model_choice = tk.StringVar(value="large")
         self.status_var = tk.StringVar(value="Gotowy")
         self.progress_var = tk.DoubleVar(value=0.0)
+        self.log_max_lines = tk.IntVar(value=DEFAULT_LOG_MAX_LINES)
         self.update_interval = tk.IntVar(value=4)
+        # Liczba procesów roboczych w trybie "Tylko CPU" (1 = przetwarzanie po kolei)
+        self.cpu_workers = tk.IntVar(value=1)
+        self.quantize_cpu = tk.BooleanVar(value=False)
         
         self.force_polish = tk.BooleanVar(value=True)
         self.enable_speaker_diarization = tk.BooleanVar(value=True)
         self.diarization_method = tk.StringVar(value="advanced")
         self.enable_logging = tk.BooleanVar(value=True)
-        self.remove_duplicates = False
+        self.keep_intermediate_audio = tk.BooleanVar(value=False)
+        self.streaming_mode = tk.BooleanVar(value=False)
+        self.enable_vad = tk.BooleanVar(value=False)
+        self.use_cache = tk.BooleanVar(value=True)
+        self.resume_from_checkpoint = tk.BooleanVar(value=False)
+        self.preload_model = tk.BooleanVar(value=False)
+        self.remove_duplicates = tk.BooleanVar(value=False)
+        self.speaker_gallery = tk.BooleanVar(value=False)
         
         # Tryb przetwarzania – teraz jako radiobuttony; wartości: "cpu", "gpu_cpu", "gpu"
         self.hardware_mode = tk.StringVar()
@@ -171,6 +401,10 @@ class TranscriptionApp:
         self.export_vtt = tk.BooleanVar(value=True)
         self.export_json = tk.BooleanVar(value=True)
         self.export_csv = tk.BooleanVar(value=True)
+        self.export_msgpack = tk.BooleanVar(value=False)
+        self.json_compact = tk.BooleanVar(value=False)
+        self.search_index = tk.BooleanVar(value=False)
+        self.metrics = tk.BooleanVar(value=False)
         
         self.hardware_info_text = tk.StringVar(value="Sprawdzam dostępność GPU...")
         
@@ -196,7 +430,7 @@ class TranscriptionApp:
         ttk.Button(file_frame, text="Przeglądaj...", command=self.browse_files).grid(row=0, column=1, padx=5, pady=5)
         desc_text = (
             "Obsługiwane formaty: mp3, mp4, wav, m4a, flac, opus, aiff, mov, avi, mkv.\n"
-            "Pliki są tymczasowo konwertowane do WAV (PCM 16-bit, mono, 16000 Hz).\n\n"
+            "Pliki są dekodowane do pamięci (mono, 16000 Hz) bez plików pośrednich.\n\n"
             "SRT – format napisów (np. używany w YouTube i filmach).\n"
             "CSV – format eksportu danych, przydatny np. do importu do arkuszy kalkulacyjnych.\n"
         )
@@ -228,23 +462,37 @@ class TranscriptionApp:
         # Pozostałe opcje: język i rozpoznawanie mówców
         ttk.Checkbutton(options_frame, text="Wymuś język polski", variable=self.force_polish).grid(row=3, column=0, sticky="w", padx=5, pady=5)
         ttk.Checkbutton(options_frame, text="Rozpoznawanie mówców", variable=self.enable_speaker_diarization).grid(row=4, column=0, sticky="w", padx=5, pady=5)
+        ttk.Checkbutton(options_frame, text="Pomijaj ciszę i muzykę (VAD)", variable=self.enable_vad).grid(row=3, column=1, columnspan=4, sticky="w", padx=5, pady=5)
+        ttk.Checkbutton(options_frame, text="Nie przetwarzaj ponownie niezmienionych plików (pamięć podręczna)", variable=self.use_cache).grid(row=4, column=1, columnspan=4, sticky="w", padx=5, pady=5)
+        ttk.Checkbutton(options_frame, text="Punkty kontrolne – wznawiaj przerwane transkrypcje (długie pliki w oknach)", variable=self.resume_from_checkpoint).grid(row=5, column=1, columnspan=4, sticky="w", padx=5, pady=2)
         ttk.Radiobutton(options_frame, text="Podstawowy (resemblyzer + spectralcluster)", variable=self.diarization_method, value="basic").grid(row=5, column=0, sticky="w", padx=30, pady=2)
         ttk.Radiobutton(options_frame, text="Zaawansowany (dokładniejszy, wolniejszy)", variable=self.diarization_method, value="advanced").grid(row=6, column=0, sticky="w", padx=30, pady=2)
+        ttk.Radiobutton(options_frame, text="Długie nagrania (skalowalne klastrowanie, wiele godzin)", variable=self.diarization_method, value="long").grid(row=7, column=0, sticky="w", padx=30, pady=2)
+        ttk.Checkbutton(options_frame, text="Tryb strumieniowy dla bardzo długich nagrań", variable=self.streaming_mode).grid(row=6, column=1, columnspan=4, sticky="w", padx=5, pady=2)
+        ttk.Checkbutton(options_frame, text="Usuwaj powtórzenia i halucynacje (ponowne dekodowanie fragmentu)", variable=self.remove_duplicates).grid(row=7, column=1, columnspan=4, sticky="w", padx=5, pady=2)
+        ttk.Checkbutton(options_frame, text="Te same etykiety mówców we wszystkich plikach (galeria mówców)", variable=self.speaker_gallery).grid(row=8, column=0, columnspan=5, sticky="w", padx=30, pady=2)
         
         # Tryb przetwarzania – radiobuttony (mutually exclusive)
         hardware_frame = ttk.LabelFrame(options_frame, text="Tryb przetwarzania", padding="10")
-        hardware_frame.grid(row=7, column=0, columnspan=5, sticky="w", padx=5, pady=5)
+        hardware_frame.grid(row=9, column=0, columnspan=5, sticky="w", padx=5, pady=5)
         # Możliwe wartości: "cpu", "gpu_cpu", "gpu"
-        rb_cpu = ttk.Radiobutton(hardware_frame, text="Wykonaj działania tylko na CPU", variable=self.hardware_mode, value="cpu")
-        rb_gpu_cpu = ttk.Radiobutton(hardware_frame, text="Korzystaj z GPU i CPU (Ctrl+Shift+Esc – monitoruj wydajność)", variable=self.hardware_mode, value="gpu_cpu")
-        rb_gpu = ttk.Radiobutton(hardware_frame, text="Korzystaj tylko z GPU – opcja eksperymentalna", variable=self.hardware_mode, value="gpu")
+        rb_cpu = ttk.Radiobutton(hardware_frame, text="Wykonaj działania tylko na CPU", variable=self.hardware_mode, value="cpu", command=self.on_hardware_mode_changed)
+        rb_gpu_cpu = ttk.Radiobutton(hardware_frame, text="Korzystaj z GPU i CPU (Ctrl+Shift+Esc – monitoruj wydajność)", variable=self.hardware_mode, value="gpu_cpu", command=self.on_hardware_mode_changed)
+        rb_gpu = ttk.Radiobutton(hardware_frame, text="Korzystaj tylko z GPU – opcja eksperymentalna", variable=self.hardware_mode, value="gpu", command=self.on_hardware_mode_changed)
         rb_cpu.grid(row=0, column=0, sticky="w", padx=5, pady=2)
         rb_gpu_cpu.grid(row=1, column=0, sticky="w", padx=5, pady=2)
         rb_gpu.grid(row=2, column=0, sticky="w", padx=5, pady=2)
+        workers_frame = ttk.Frame(hardware_frame)
+        workers_frame.grid(row=3, column=0, sticky="w", padx=5, pady=2)
+        ttk.Label(workers_frame, text="Liczba równoległych procesów (tylko CPU):").pack(side=tk.LEFT)
+        ttk.Spinbox(workers_frame, from_=1, to=max(1, os.cpu_count() or 1), width=5, textvariable=self.cpu_workers).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(hardware_frame, text="Szybki model int8 (tylko CPU)", variable=self.quantize_cpu).grid(row=4, column=0, sticky="w", padx=5, pady=2)
+        ttk.Checkbutton(hardware_frame, text="Wstępnie ładuj model w tle (szybszy start transkrypcji)", variable=self.preload_model,
+                        command=self.start_warm_up).grid(row=5, column=0, sticky="w", padx=5, pady=2)
         
         # Suwak częstotliwości aktualizacji
         scale_frame = ttk.Frame(options_frame)
-        scale_frame.grid(row=8, column=0, columnspan=5, sticky="w", padx=5, pady=5)
+        scale_frame.grid(row=10, column=0, columnspan=5, sticky="w", padx=5, pady=5)
         ttk.Label(scale_frame, text="Częstotliwość aktualizacji (0-120 sek, 0 = brak):").pack(side=tk.LEFT)
         self.update_scale = ttk.Scale(scale_frame, from_=0, to=120, orient=tk.HORIZONTAL, variable=self.update_interval, command=self.update_scale_label)
         self.update_scale.pack(side=tk.LEFT, padx=5)
@@ -259,6 +507,11 @@ class TranscriptionApp:
         ttk.Checkbutton(export_frame, text="VTT", variable=self.export_vtt).grid(row=0, column=2, padx=5, pady=5, sticky="w")
         ttk.Checkbutton(export_frame, text="JSON", variable=self.export_json).grid(row=0, column=3, padx=5, pady=5, sticky="w")
         ttk.Checkbutton(export_frame, text="CSV", variable=self.export_csv).grid(row=0, column=4, padx=5, pady=5, sticky="w")
+        ttk.Checkbutton(export_frame, text="Binarny (msgpack)", variable=self.export_msgpack).grid(row=0, column=5, padx=5, pady=5, sticky="w")
+        ttk.Checkbutton(export_frame, text="Zwarty JSON (bez wcięć i identyfikatorów tokenów)", variable=self.json_compact).grid(row=2, column=0, columnspan=5, padx=5, pady=5, sticky="w")
+        ttk.Checkbutton(export_frame, text="Zachowaj pliki tymczasowe audio (WAV 16 kHz)", variable=self.keep_intermediate_audio).grid(row=1, column=0, columnspan=5, padx=5, pady=5, sticky="w")
+        ttk.Checkbutton(export_frame, text="Dodawaj wyniki do indeksu wyszukiwania (menu „Wyszukiwanie”)", variable=self.search_index).grid(row=3, column=0, columnspan=5, padx=5, pady=5, sticky="w")
+        ttk.Checkbutton(export_frame, text="Zapisuj metryki etapów (<nazwa>_metrics.json, podsumowanie partii w logs)", variable=self.metrics).grid(row=4, column=0, columnspan=5, padx=5, pady=5, sticky="w")
         
         # Pasek postępu i status
         progress_frame = ttk.Frame(self.main_frame.scrollable_frame, padding="10")
@@ -279,7 +532,7 @@ class TranscriptionApp:
         log_h_scroll = ttk.Scrollbar(log_frame, orient="horizontal", command=self.log_text.xview)
         log_h_scroll.pack(fill=tk.X, side=tk.BOTTOM)
         self.log_text.config(yscrollcommand=log_v_scroll.set, xscrollcommand=log_h_scroll.set)
-        self.log_handler = LogTextHandler(self.log_text)
+        self.log_handler = LogTextHandler(self.updates)
         logger.addHandler(self.log_handler)
         
         # Panel przycisków akcji – na samym dole
@@ -287,6 +540,9 @@ class TranscriptionApp:
         action_frame.pack(fill=tk.X, padx=10, pady=5)
         ttk.Button(action_frame, text="Rozpocznij transkrypcję", command=self.start_transcription).pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text="Anuluj", command=self.cancel_transcription).pack(side=tk.LEFT, padx=5)
+        ttk.Spinbox(action_frame, from_=100, to=100000, increment=500, width=8,
+                    textvariable=self.log_max_lines).pack(side=tk.RIGHT, padx=5)
+        ttk.Label(action_frame, text="Limit linii logu:").pack(side=tk.RIGHT)
         
     def update_model_info(self):
         choice = self.model_choice.get()
@@ -298,6 +554,7 @@ class TranscriptionApp:
             "large": "Large – najwolniejszy, ale zapewniający najwyższą dokładność transkrypcji."
         }
         self.model_description.set(descriptions.get(choice, ""))
+        self.start_warm_up()
     
     def update_scale_label(self, value):
         self.scale_value_label.config(text=f"{int(float(value))} sek")
@@ -324,11 +581,14 @@ class TranscriptionApp:
         if not self.file_paths:
             messagebox.showwarning("Ostrzeżenie", "Proszę wybrać pliki do transkrypcji.")
             return
-        self.cancel_flag = False
+        if self.queue_running():
+            messagebox.showwarning("Ostrzeżenie", "Działa obsługa kolejki – dodaj pliki do kolejki lub zatrzymaj jej obsługę.")
+            return
         self.transcription_running = True
         self.start_time = time.time()
         self.status_var.set("Rozpoczynanie transkrypcji...")
         self.progress_var.set(0)
+        self.batch_progress = None
         self.transcription_thread = threading.Thread(target=self.transcribe_all_files)
         self.transcription_thread.daemon = True
         self.transcription_thread.start()
@@ -342,231 +602,71 @@ class TranscriptionApp:
             if self.update_interval.get() > 0:
                 self.root.after(self.update_interval.get() * 1000, self.update_progress)
     
+    # Odczytuje ustawienia z interfejsu do zwykłego obiektu przekazywanego silnikowi.
+    def build_options(self):
+        export_vars = {
+            "txt": self.export_txt,
+            "srt": self.export_srt,
+            "vtt": self.export_vtt,
+            "json": self.export_json,
+            "csv": self.export_csv,
+            "msgpack": self.export_msgpack,
+        }
+        return TranscriptionOptions(
+            model_size=self.model_choice.get(),
+            hardware_mode=self.hardware_mode.get(),
+            force_polish=self.force_polish.get(),
+            enable_speaker_diarization=self.enable_speaker_diarization.get(),
+            diarization_method=self.diarization_method.get(),
+            export_formats=[fmt for fmt in EXPORT_FORMATS if export_vars[fmt].get()],
+            output_dir=self.output_dir.get() or None,
+            workers=self.cpu_workers.get(),
+            quantize=self.quantize_cpu.get(),
+            keep_intermediate_audio=self.keep_intermediate_audio.get(),
+            streaming=self.streaming_mode.get(),
+            vad=self.enable_vad.get(),
+            remove_duplicates=self.remove_duplicates.get(),
+            speaker_gallery=self.speaker_gallery.get(),
+            use_cache=self.use_cache.get(),
+            checkpoints=self.resume_from_checkpoint.get(),
+            resume=self.resume_from_checkpoint.get(),
+            json_compact=self.json_compact.get(),
+            search_index=self.search_index.get(),
+            metrics=self.metrics.get(),
+            json_tokens=not self.json_compact.get(),
+        )
+
+    # Wątek roboczy – interfejs aktualizowany jest wyłącznie przez self.updates.
     def transcribe_all_files(self):
-        total = len(self.file_paths)
-        for idx, file_path in enumerate(self.file_paths, start=1):
-            try:
-                self.status_var.set(f"Przetwarzanie pliku {idx} z {total}...")
-                self.run_transcription(file_path)
-                self.progress_var.set((idx / total) * 100)
-            except Exception as e:
-                logger.error(f"Błąd przy przetwarzaniu {file_path}: {str(e)}")
-                messagebox.showerror("Błąd", f"Błąd przy przetwarzaniu {file_path}:\n{str(e)}")
-        self.transcription_running = False
-        self.status_var.set("Transkrypcja zakończona.")
-        winsound.PlaySound("SystemExclamation", winsound.SND_ALIAS)
-    
-    def run_transcription(self, file_path):
-        model_size = self.model_choice.get()
-        file_ext = os.path.splitext(file_path)[1].lower()
-        base_filename = os.path.splitext(os.path.basename(file_path))[0]
-        # Folder tymczasowy: "Tymczasowy_<nazwa_pliku>" w katalogu źródłowym
-        temp_dir = os.path.join(os.path.dirname(file_path), f"Tymczasowy_{base_filename}")
-        os.makedirs(temp_dir, exist_ok=True)
-        logger.info(f"Pliki tymczasowe zapisane są w: {temp_dir}. Usuń je samodzielnie lub wykorzystaj do innych celów.")
-        
-        audio_path = file_path
-        if file_ext == ".wav":
-            try:
-                with sf.SoundFile(file_path) as _:
-                    pass
-            except Exception as e:
-                logger.warning(f"Plik audio może być uszkodzony: {str(e)}")
-                audio_path = self.fix_audio_file(file_path, temp_dir)
-        
-        if file_ext in ['.mp4', '.mov', '.avi', '.mkv']:
-            self.status_var.set("Wyodrębnianie audio z wideo...")
-            logger.info("Wyodrębnianie audio z wideo...")
-            audio_path = os.path.join(temp_dir, os.path.basename(file_path).replace(file_ext, '.wav'))
-            try:
-                video = mp.VideoFileClip(file_path)
-                video.audio.write_audiofile(audio_path, logger=None)
-                logger.info(f"Audio zapisane do: {audio_path}")
-            except Exception as e:
-                logger.error(f"Błąd podczas wyodrębniania audio: {str(e)}")
-                raise Exception(f"Nie można wyodrębnić audio: {str(e)}")
-        elif file_ext not in ['.mp3', '.wav']:
-            self.status_var.set("Konwertowanie pliku audio do WAV...")
-            logger.info(f"Konwertowanie {file_ext} do WAV...")
-            audio_path = os.path.join(temp_dir, os.path.basename(file_path).replace(file_ext, '.wav'))
-            try:
-                audio = AudioSegment.from_file(file_path)
-                audio.export(audio_path, format="wav")
-                logger.info(f"Audio skonwertowane do: {audio_path}")
-            except Exception as e:
-                logger.error(f"Błąd konwersji audio: {str(e)}")
-                audio_path = self.fix_audio_file(file_path, temp_dir)
-        
+        options = self.build_options()
+        self.batch_progress = BatchProgress(self.file_paths)
+        logger.info(f"Szacowana długość nagrań w partii: {self.batch_progress.total_seconds / 60:.1f} min.")
+        def on_progress(idx, total, file_path):
+            self.batch_progress.file_done(file_path)
+            self.updates.progress(self.batch_progress.percent)
+        def on_error(file_path, e):
+            self.updates.error("Błąd", f"Błąd przy przetwarzaniu {file_path}:\n{str(e)}")
         try:
-            y, sr = librosa.load(audio_path, sr=None, duration=5)
-            if len(y)==0:
-                raise Exception("Plik audio jest pusty.")
+            results = self.engine.run_batch(self.file_paths, options, progress_callback=on_progress, error_callback=on_error)
         except Exception as e:
-            logger.error(f"Błąd weryfikacji audio: {str(e)}")
-            raise Exception(f"Plik audio jest nieprawidłowy: {str(e)}")
-        
-        hw_mode = self.hardware_mode.get()
-        if hw_mode == "cpu":
-            device = "cpu"
-            logger.info("Tryb sprzętowy: Tylko CPU.")
-        elif hw_mode == "gpu":
-            device = "cuda"
-            logger.info("Tryb sprzętowy: Tylko GPU (eksperymentalny).")
+            logger.error(f"Błąd partii transkrypcji: {str(e)}")
+            self.updates.status("Transkrypcja przerwana z powodu błędu.")
+            self.updates.error("Błąd", str(e))
+            return
+        finally:
+            self.transcription_running = False
+            self.batch_progress = None
+        if any(r.get("cancelled") for r in results):
+            self.updates.status("Transkrypcja anulowana – można ją wznowić od punktu kontrolnego.")
+            return
+        summary = self.engine.last_batch_summary
+        if summary is not None and summary["rtf"]:
+            self.updates.status(f"Transkrypcja zakończona – {summary['files']} plików, "
+                                f"{summary['total_seconds']:.0f} s (RTF {summary['rtf']:.2f}).")
         else:
-            device = "cuda"
-            logger.info("Tryb sprzętowy: GPU i CPU.")
-        
-        self.status_var.set(f"Ładowanie modelu Whisper ({model_size}) na {device}...")
-        try:
-            model = whisper.load_model(model_size, device=device)
-        except Exception as e:
-            logger.error(f"Błąd ładowania modelu: {str(e)}")
-            raise Exception(f"Nie można załadować modelu Whisper: {str(e)}")
-        
-        self.status_var.set("Transkrypcja w toku...")
-        transcribe_options = {}
-        if self.force_polish.get():
-            transcribe_options["language"] = "pl"
-        try:
-            result = model.transcribe(audio_path, **transcribe_options)
-        except Exception as e:
-            logger.error(f"Błąd transkrypcji: {str(e)}")
-            raise Exception(f"Błąd transkrypcji: {str(e)}")
-        
-        segments = result.get("segments", [])
-        diarization_label = ""
-        if self.enable_speaker_diarization.get():
-            self.status_var.set("Rozpoznawanie mówców...")
-            logger.info("Rozpoczynanie diaryzacji...")
-            try:
-                y, sr = librosa.load(audio_path, sr=None)
-                if sr != 16000:
-                    y = librosa.resample(y, orig_sr=sr, target_sr=16000)
-                    sr = 16000
-                temp_audio = os.path.join(temp_dir, "processed_audio.wav")
-                sf.write(temp_audio, y, sr)
-                wav = preprocess_wav(temp_audio)
-                encoder = VoiceEncoder()
-                max_duration = 60
-                if wav.duration > max_duration:
-                    all_emb = []
-                    all_ts = []
-                    for start in range(0, int(wav.duration), max_duration):
-                        end = min(start + max_duration, wav.duration)
-                        seg_samples = wav[int(start*sr):int(end*sr)]
-                        if len(seg_samples) > sr:
-                            seg_emb, seg_ts = encoder.embed_utterance(seg_samples, return_partials=True, rate=16)
-                            seg_ts = [t+start for t in seg_ts]
-                            all_emb.extend(seg_emb)
-                            all_ts.extend(seg_ts)
-                    embeddings = np.array(all_emb)
-                    timestamps = np.array(all_ts)
-                else:
-                    embeddings, timestamps = encoder.embed_utterance(wav, return_partials=True, rate=16)
-                if len(embeddings) > 1:
-                    clusterer = SpectralClusterer(min_clusters=2, max_clusters=10)
-                    labels = clusterer.predict(embeddings)
-                    diarized_segments = []
-                    for i, seg in enumerate(segments):
-                        start = seg["start"]
-                        end = seg["end"]
-                        idx = int(np.argmin(np.abs(timestamps - start)))
-                        speaker = f"Osoba{labels[idx]+1}" if idx < len(labels) else "NieznanyMówca"
-                        diarized_segments.append({"start": start, "end": end, "text": f"{speaker}: {seg['text'].strip()}"})
-                    segments = diarized_segments
-                    diarization_label = f"({self.diarization_method.get().capitalize()})"
-                else:
-                    logger.warning("Za mało danych do diaryzacji, pomijam...")
-            except Exception as e:
-                logger.error(f"Błąd podczas diaryzacji: {str(e)}")
-        
-        # Folder wynikowy: "wyniki_<nazwa_pliku>" w katalogu źródłowym
-        output_subdir = os.path.join(os.path.dirname(file_path), f"wyniki_{base_filename}")
-        os.makedirs(output_subdir, exist_ok=True)
-        output_base = os.path.join(output_subdir, base_filename)
-        self.status_var.set("Zapisywanie wyników...")
-        logger.info("Zapisywanie wyników...")
-        try:
-            if self.export_txt.get():
-                with open(f"{output_base}.txt", 'w', encoding='utf-8') as f:
-                    for s in segments:
-                        f.write(f"{s['text']}\n")
-                logger.info(f"TXT zapisany: {output_base}.txt")
-            if self.export_srt.get():
-                self._write_srt(segments, f"{output_base}.srt")
-                logger.info(f"SRT zapisany: {output_base}.srt")
-            if self.export_vtt.get():
-                self._write_vtt(segments, f"{output_base}.vtt")
-                logger.info(f"VTT zapisany: {output_base}.vtt")
-            if self.export_json.get():
-                with open(f"{output_base}.json", 'w', encoding='utf-8') as f:
-                    json.dump(result, f, ensure_ascii=False, indent=4)
-                logger.info(f"JSON zapisany: {output_base}.json")
-            if self.export_csv.get():
-                self._write_csv(segments, f"{output_base}.csv")
-                logger.info(f"CSV zapisany: {output_base}.csv")
-            # Autorski format – tekst bez sygnatur czasowych i numerków
-            with open(f"{output_base}_autorski.txt", 'w', encoding='utf-8') as f:
-                for s in segments:
-                    f.write(f"{s['text'].strip()}\n")
-            logger.info(f"Autorski TXT zapisany: {output_base}_autorski.txt")
-            # Zapis logów w folderze "logs" w katalogu źródłowym
-            log_dir = get_log_dir(os.path.dirname(file_path))
-            log_out = os.path.join(log_dir, f"{base_filename}.log")
-            with open(log_out, 'w', encoding='utf-8') as f:
-                f.write(f"LOGI dla: {file_path}\n")
-                f.write(json.dumps({"segments": segments}, ensure_ascii=False, indent=2))
-            logger.info(f"Log zapisany: {log_out}")
-        except Exception as e:
-            logger.error(f"Błąd zapisu wyników: {str(e)}")
-            raise Exception(f"Błąd zapisu wyników: {str(e)}")
-    
-    def fix_audio_file(self, audio_path, temp_dir):
-        try:
-            logger.info(f"Próba naprawy pliku audio: {audio_path}")
-            fixed_path = os.path.join(temp_dir, "fixed_" + os.path.basename(audio_path))
-            y, sr = librosa.load(audio_path, sr=None)
-            sf.write(fixed_path, y, sr)
-            return fixed_path
-        except Exception as e:
-            logger.error(f"Błąd naprawy audio: {str(e)}")
-            raise Exception(f"Błąd naprawy audio: {str(e)}")
-    
-    def _write_srt(self, segments, output_path):
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for i, seg in enumerate(segments):
-                start = self._format_srt_time(seg["start"])
-                end = self._format_srt_time(seg["end"])
-                f.write(f"{i+1}\n{start} --> {end}\n{seg['text'].strip()}\n\n")
-    
-    def _format_srt_time(self, seconds):
-        h = int(seconds // 3600)
-        m = int((seconds % 3600) // 60)
-        s = int(seconds % 60)
-        ms = int((seconds - int(seconds)) * 1000)
-        return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
-    
-    def _write_vtt(self, segments, output_path):
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write("WEBVTT\n\n")
-            for seg in segments:
-                start = self._format_vtt_time(seg["start"])
-                end = self._format_vtt_time(seg["end"])
-                f.write(f"{start} --> {end}\n{seg['text'].strip()}\n\n")
-    
-    def _format_vtt_time(self, seconds):
-        h = int(seconds // 3600)
-        m = int((seconds % 3600) // 60)
-        s = int(seconds % 60)
-        ms = int((seconds - int(seconds)) * 1000)
-        return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
-    
-    def _write_csv(self, segments, output_path):
-        with open(output_path, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(["start", "end", "text"])
-            for seg in segments:
-                writer.writerow([seg["start"], seg["end"], seg["text"].strip()])
+            self.updates.status("Transkrypcja zakończona.")
+        self.updates.progress(100.0)
+        winsound.PlaySound("SystemExclamation", winsound.SND_ALIAS)
     
     def start_blinking(self, widget, base_text, blink_type):
         colors = ["green", "red", "yellow", "orange", self.random_color()]
@@ -583,27 +683,29 @@ class TranscriptionApp:
         if hasattr(self, 'transcription_thread') and self.transcription_thread.is_alive():
             logger.info("Anulowanie transkrypcji...")
             self.status_var.set("Anulowanie...")
-            self.cancel_flag = True
+            self.engine.cancel()
         else:
             logger.info("Brak aktywnej transkrypcji do anulowania.")
 
+# Handler logu dla panelu w oknie – z dowolnego wątku; linie odbiera drain_updates w wątku interfejsu.
 class LogTextHandler(logging.Handler):
-    def __init__(self, text_widget):
+    def __init__(self, updates):
         super().__init__()
-        self.text_widget = text_widget
+        self.updates = updates
     def emit(self, record):
-        msg = self.format(record)
-        def append():
-            self.text_widget.configure(state='normal')
-            self.text_widget.insert(tk.END, msg+"\n")
-            self.text_widget.see(tk.END)
-            self.text_widget.configure(state='disabled')
-        self.text_widget.after(0, append)
+        self.updates.log(self.format(record))
 
 if __name__ == "__main__":
     try:
         root = tk.Tk()
         app = TranscriptionApp(root)
+        # --measure-startup: czas do pierwszego wyświetlenia okna (bez czekania na GPU) i zamknięcie aplikacji.
+        if "--measure-startup" in sys.argv:
+            def measure():
+                root.update()
+                print(f"startup_seconds={time.perf_counter() - _startup_start:.3f}")
+                root.destroy()
+            root.after_idle(measure)
         root.mainloop()
     except Exception as e:
         logger.error(f"Krytyczny błąd: {str(e)}")
@@ -0,0 +1,219 @@
+# Pomiary etapów przetwarzania – czas, CPU, pamięć i pamięć GPU dla każdego etapu pliku.
+#
+# FileMetrics zbiera przedziały (span) wokół etapów silnika: konwersja, ładowanie modelu, transkrypcja,
+# podetapy diaryzacji, każdy format eksportu. Dla przedziału zapisywane są:
+#   seconds            – czas rzeczywisty,
+#   cpu_seconds        – czas CPU całego procesu (z wątkami torch i etapami działającymi równolegle),
+#   thread_cpu_seconds – czas CPU wątku, który wykonywał etap,
+#   peak_rss_mb        – największe zużycie pamięci procesu w trakcie etapu (próbkowanie co SAMPLE_SECONDS),
+#   gpu_peak_mb        – szczyt pamięci CUDA w trakcie etapu (tylko gdy CUDA jest w użyciu; przy etapach
+#                        równoległych – od startu najstarszego z nich), gpu_start_mb i gpu_allocated_mb –
+#                        pamięć CUDA na początku i na końcu etapu.
+# Wynik trafia do "<nazwa>_metrics.json" obok plików wynikowych, a summarize_batch łączy pliki partii.
+#
+# Profiler można podłączyć do jednego etapu (profile_stage) – domyślnie cProfile z zapisem do pliku .prof.
+
+import os
+import sys
+import json
+import time
+import cProfile
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger("TranscriptionApp")
+
+METRICS_FORMAT_VERSION = 1
+# Co ile sekund próbkowane jest zużycie pamięci w trakcie trwających etapów.
+SAMPLE_SECONDS = 0.1
+
+# Bieżące zużycie pamięci procesu (MB) – psutil, gdy jest zainstalowany, w przeciwnym razie /proc (Linux).
+def current_rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+# Szczytowe zużycie pamięci procesu od startu (MB) – resource na Linuksie/macOS, psutil (jeśli jest) na Windows.
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+# torch importowany jest tylko wtedy, gdy jest już załadowany – pomiar nie inicjalizuje CUDA.
+def _cuda():
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+        return torch.cuda
+    return None
+
+# Domyślny profiler etapu: cProfile zapisywany do "<nazwa>_<etap>.prof" (podgląd np. przez snakeviz).
+@contextmanager
+def cprofile_stage(path):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        logger.info(f"Profil etapu zapisany: {path}")
+
+class FileMetrics:
+    # profile_stage – nazwa etapu do profilowania; profiler(ścieżka) zwraca menedżer kontekstu
+    # (domyślnie cprofile_stage), a profile_path to ścieżka bez rozszerzenia dla pliku profilu.
+    def __init__(self, file_path, profile_stage=None, profiler=None, profile_path=None):
+        self.file_path = file_path
+        self.spans = []
+        self.info = {}
+        self.profile_stage = profile_stage
+        self.profiler = profiler or cprofile_stage
+        self.profile_path = profile_path
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._active = {}
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_SECONDS):
+            rss = current_rss_mb()
+            if rss is None:
+                continue
+            with self._lock:
+                for span in self._active.values():
+                    span["peak_rss_mb"] = max(span["peak_rss_mb"] or 0.0, rss)
+
+    def _ensure_sampler(self):
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample, name="metryki", daemon=True)
+            self._sampler.start()
+
+    @contextmanager
+    def span(self, name):
+        cuda = _cuda()
+        rss = current_rss_mb()
+        span = {"name": name, "thread": threading.current_thread().name,
+                "start": round(time.perf_counter() - self._start, 4), "peak_rss_mb": rss}
+        with self._lock:
+            # Szczyt pamięci GPU jest wspólny dla procesu – zerowany tylko, gdy nie trwa żaden inny etap
+            # (np. diaryzacja w osobnym wątku), aby nie zafałszować szczytu etapu równoległego. Szczyt etapu
+            # zagnieżdżonego lub równoległego obejmuje więc cały czas od startu najstarszego trwającego etapu.
+            if cuda is not None:
+                if not self._active:
+                    cuda.reset_peak_memory_stats()
+                span["gpu_start_mb"] = round(cuda.memory_allocated() / (1024 * 1024), 1)
+            self._active[id(span)] = span
+            self._ensure_sampler()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        thread_cpu_start = time.thread_time()
+        profile = self.profiler(f"{self.profile_path}_{name}.prof") if name == self.profile_stage and self.profile_path else None
+        try:
+            if profile is not None:
+                with profile:
+                    yield span
+            else:
+                yield span
+        finally:
+            span["seconds"] = round(time.perf_counter() - wall_start, 4)
+            span["cpu_seconds"] = round(time.process_time() - cpu_start, 4)
+            span["thread_cpu_seconds"] = round(time.thread_time() - thread_cpu_start, 4)
+            rss = current_rss_mb()
+            if cuda is not None:
+                span["gpu_peak_mb"] = round(cuda.max_memory_allocated() / (1024 * 1024), 1)
+                span["gpu_allocated_mb"] = round(cuda.memory_allocated() / (1024 * 1024), 1)
+            with self._lock:
+                self._active.pop(id(span), None)
+                if rss is not None:
+                    span["peak_rss_mb"] = max(span["peak_rss_mb"] or 0.0, rss)
+                if span["peak_rss_mb"] is not None:
+                    span["peak_rss_mb"] = round(span["peak_rss_mb"], 1)
+                self.spans.append(span)
+
+    # Przedział zmierzony poza FileMetrics (np. czasy formatów z jednego przejścia eksportu).
+    def record(self, name, seconds):
+        with self._lock:
+            self.spans.append({"name": name, "thread": threading.current_thread().name, "seconds": round(seconds, 4)})
+
+    # Zatrzymuje próbkowanie pamięci (wywoływane także przy błędzie lub anulowaniu).
+    def close(self):
+        self._stop.set()
+
+    def to_dict(self):
+        self.close()
+        audio_seconds = self.info.get("audio_seconds")
+        total = time.perf_counter() - self._start
+        peak = peak_rss_mb()
+        return {
+            "format_version": METRICS_FORMAT_VERSION,
+            "file": self.file_path,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_seconds": round(total, 4),
+            "rtf": round(total / audio_seconds, 5) if audio_seconds else None,
+            "peak_rss_mb": round(peak, 1) if peak is not None else None,
+            **self.info,
+            "stages": sorted(self.spans, key=lambda span: span.get("start", float("inf"))),
+        }
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+# Podsumowanie partii z plików metryk – suma czasów i szczyt pamięci dla każdego etapu oraz najwolniejsze pliki.
+def summarize_batch(metrics_paths):
+    files = []
+    stages = {}
+    for path in metrics_paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Nie można wczytać metryk {path}: {str(e)}")
+            continue
+        files.append({"file": data["file"], "total_seconds": data["total_seconds"],
+                      "audio_seconds": data.get("audio_seconds"), "rtf": data.get("rtf")})
+        for span in data["stages"]:
+            stage = stages.setdefault(span["name"], {"count": 0, "seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_mb": None})
+            stage["count"] += 1
+            stage["seconds"] = round(stage["seconds"] + span["seconds"], 4)
+            stage["cpu_seconds"] = round(stage["cpu_seconds"] + span.get("cpu_seconds", 0.0), 4)
+            if span.get("peak_rss_mb") is not None:
+                stage["peak_rss_mb"] = max(stage["peak_rss_mb"] or 0.0, span["peak_rss_mb"])
+    audio_seconds = sum(f["audio_seconds"] or 0.0 for f in files)
+    total_seconds = sum(f["total_seconds"] for f in files)
+    return {
+        "format_version": METRICS_FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": len(files),
+        "audio_seconds": round(audio_seconds, 3),
+        "total_seconds": round(total_seconds, 4),
+        "rtf": round(total_seconds / audio_seconds, 5) if audio_seconds else None,
+        "stages": dict(sorted(stages.items(), key=lambda item: -item[1]["seconds"])),
+        "slowest_files": sorted(files, key=lambda f: -f["total_seconds"])[:5],
+    }
+
+def format_batch_summary(summary):
+    lines = [f"Podsumowanie partii: {summary['files']} plików, {summary['audio_seconds']:.0f} s nagrań "
+             f"w {summary['total_seconds']:.1f} s" + (f" (RTF {summary['rtf']:.2f})." if summary["rtf"] else ".")]
+    for name, stage in list(summary["stages"].items())[:8]:
+        rss = f", szczyt {stage['peak_rss_mb']:.0f} MB" if stage["peak_rss_mb"] is not None else ""
+        lines.append(f"  {name}: {stage['seconds']:.1f} s (CPU {stage['cpu_seconds']:.1f} s{rss})")
+    return "\n".join(lines)
@@ -0,0 +1,104 @@
+# Równoległa transkrypcja partii plików w wielu procesach – dla trybu "Tylko CPU".
+#
+# Jeden dekoder Whisper nie wykorzystuje dobrze maszyn z dziesiątkami rdzeni, dlatego pliki
+# rozdzielane są między procesy robocze. Każdy proces trzyma własny, załadowany raz model
+# (pula ModelPool w procesie) i ma ograniczoną liczbę wątków torch, aby procesy nie walczyły o rdzenie.
+# Pliki wysyłane są od najdłuższego, żeby partia nie kończyła się czekaniem na jeden długi plik.
+
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, CancelledError, wait, FIRST_COMPLETED
+
+from audio import estimate_duration
+from engine import TranscriptionEngine, ModelPool
+from checkpoint import TranscriptionCancelled
+
+logger = logging.getLogger("TranscriptionApp")
+
+# Silnik procesu roboczego – tworzony raz w initializerze, model pozostaje w nim między plikami.
+_worker_engine = None
+# Co ile sekund proces główny sprawdza prośbę o anulowanie.
+CANCEL_POLL_SECONDS = 0.5
+
+# Domyślny podział rdzeni: threads_per_worker wątków na proces, liczba procesów tak, by nie przekroczyć liczby rdzeni.
+def default_worker_layout(workers=None, threads_per_worker=None):
+    cpu_count = os.cpu_count() or 1
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cpu_count // workers) if workers else 4
+    if workers is None:
+        workers = max(1, cpu_count // threads_per_worker)
+    return workers, threads_per_worker
+
+# shared_cancel_event (zdarzenie menedżera multiprocessing) zastępuje lokalne cancel_event silnika,
+# więc anulowanie w procesie głównym przerywa też pliki przetwarzane w procesach roboczych.
+def _init_worker(threads_per_worker, shared_cancel_event):
+    global _worker_engine
+    import torch
+    torch.set_num_threads(threads_per_worker)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+    _worker_engine = TranscriptionEngine(model_pool=ModelPool(max_models=1))
+    _worker_engine.cancel_event = shared_cancel_event
+
+def _worker_run(file_path, options):
+    return _worker_engine.run_file(file_path, options)
+
+# Przetwarza partię w puli procesów. Interfejs i format wyników jak w TranscriptionEngine.run_batch:
+# wyniki zwracane są w kolejności wejściowej, progress_callback wołany jest po każdym ukończonym pliku.
+# cancel_event (threading.Event) przerywa bieżące pliki po najbliższym fragmencie i odwołuje oczekujące.
+# Powtórzone ścieżki są przetwarzane raz – dwa procesy nie zapisują naraz tych samych plików wynikowych.
+def run_batch_parallel(file_paths, options, workers=None, threads_per_worker=None,
+                       progress_callback=None, error_callback=None, status_callback=None, cancel_event=None):
+    unique_paths = list(dict.fromkeys(file_paths))
+    if len(unique_paths) < len(file_paths):
+        logger.warning(f"Pominięto {len(file_paths) - len(unique_paths)} powtórzonych plików w partii.")
+    file_paths = unique_paths
+    total = len(file_paths)
+    workers, threads_per_worker = default_worker_layout(workers, threads_per_worker)
+    workers = max(1, min(workers, total))
+    order = sorted(file_paths, key=estimate_duration, reverse=True)
+    logger.info(f"Transkrypcja równoległa: {workers} procesów po {threads_per_worker} wątków torch, {total} plików.")
+    if status_callback is not None:
+        status_callback(f"Przetwarzanie {total} plików w {workers} procesach...")
+
+    results = {}
+    done = 0
+    # "spawn" – bezpieczne z torch i zgodne z Windows; każdy proces ładuje własny model.
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        shared_cancel_event = manager.Event()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(threads_per_worker, shared_cancel_event)) as executor:
+            futures = {executor.submit(_worker_run, path, options): path for path in order}
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set() and not shared_cancel_event.is_set():
+                    logger.info("Anulowanie transkrypcji równoległej – odwołuję oczekujące pliki.")
+                    shared_cancel_event.set()
+                    for future in pending:
+                        future.cancel()
+                for future in finished:
+                    file_path = futures[future]
+                    done += 1
+                    try:
+                        outputs = future.result()
+                        results[file_path] = {"file": file_path, "ok": True, "error": None, "outputs": outputs}
+                        logger.info(f"Ukończono plik {done} z {total}: {file_path}")
+                    except (TranscriptionCancelled, CancelledError) as e:
+                        results[file_path] = {"file": file_path, "ok": False, "error": str(e) or "Anulowano.",
+                                              "outputs": {}, "cancelled": True}
+                    except Exception as e:
+                        logger.error(f"Błąd przy przetwarzaniu {file_path}: {str(e)}")
+                        results[file_path] = {"file": file_path, "ok": False, "error": str(e), "outputs": {}}
+                        if error_callback is not None:
+                            error_callback(file_path, e)
+                    if status_callback is not None:
+                        status_callback(f"Ukończono {done} z {total} plików...")
+                    if progress_callback is not None:
+                        progress_callback(done, total, file_path)
+    return [results[path] for path in file_paths]
@@ -0,0 +1,205 @@
+# Tryb CPU z modelem int8 – dynamiczna kwantyzacja warstw liniowych Whispera.
+#
+# torch i whisper importowane są w funkcjach, aby sam import modułu (np. przez engine.py) był szybki.
+#
+# Na komputerach bez GPU pełny model fp32 (domyślnie "large") jest bardzo wolny. Warstwy liniowe
+# (większość obliczeń Whispera) są kwantyzowane do int8 przy ładowaniu, a wagi gotowego modelu (state_dict,
+# bez pikli modułów) zapisywane są na dysku – kolejne uruchomienia budują pusty model o tych samych wymiarach
+# i wczytują do niego wagi int8 (torch.load z weights_only=True) zamiast wczytywać i kwantyzować wagi fp32.
+#
+# Porównanie z fp32 na tym samym pliku (przyspieszenie i różnice na poziomie słów) pozwala zdecydować,
+# dla których rozmiarów modelu jakość jest wystarczająca:
+#   python -m quantization nagranie.mp3 --models base small large --output raport_int8.json
+
+import os
+import re
+import sys
+import json
+import time
+import difflib
+import logging
+import argparse
+from importlib import metadata
+
+logger = logging.getLogger("TranscriptionApp")
+
+DEFAULT_QUANTIZED_DIR = os.path.join(os.path.expanduser("~"), "Documents", "TranscriptionApp", "models_int8")
+
+# Liczba wątków obliczeniowych torch: rdzenie fizyczne (psutil), a bez psutil połowa rdzeni logicznych
+# (zwykle Hyper-Threading) – więcej wątków niż rdzeni fizycznych spowalnia mnożenie macierzy int8.
+def default_cpu_threads():
+    try:
+        import psutil
+        physical = psutil.cpu_count(logical=False)
+        if physical:
+            return physical
+    except ImportError:
+        pass
+    return max(1, (os.cpu_count() or 2) // 2)
+
+def configure_cpu_threads(threads=None):
+    import torch
+    threads = threads or default_cpu_threads()
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+        logger.info(f"Wątki obliczeniowe torch: {threads}.")
+    try:
+        # Whisper liczy operacje kolejno – jeden wątek międzyoperacyjny wystarcza.
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    return threads
+
+# Plik z modelem int8 zależy od wag źródłowych (skrót z adresu modelu) i wersji torch/whisper.
+def quantized_model_path(model_size, cache_dir=DEFAULT_QUANTIZED_DIR):
+    import torch
+    import whisper
+    url = whisper._MODELS.get(model_size, model_size)
+    source_sha = url.split("/")[-2][:12] if "/" in url else model_size
+    versions = f"torch{torch.__version__.split('+')[0]}_whisper{metadata.version('openai-whisper')}"
+    return os.path.join(cache_dir, f"whisper_{model_size}_{source_sha}_{versions}_int8_state.pt")
+
+# Kwantyzacja dynamiczna int8 warstw liniowych. Whisper używa własnej podklasy nn.Linear (rzutowanie
+# wag na typ wejścia przy fp16); na CPU działa w fp32, więc warstwy zastępowane są zwykłymi nn.Linear
+# z tymi samymi wagami, które torch potrafi skwantyzować.
+def quantize_model(model):
+    import torch
+    model = model.cpu().eval()
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                linear = torch.nn.utils.skip_init(torch.nn.Linear, child.in_features, child.out_features,
+                                                  bias=child.bias is not None)
+                linear.weight = child.weight
+                linear.bias = child.bias
+                setattr(parent, name, linear)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+# Model int8 odbudowany z zapisanych wag: pusty model o zapisanych wymiarach, ta sama kwantyzacja
+# (struktura modułów int8) i wczytanie wag. Głowice wyrównania jak w whisper.load_model.
+def _rebuild_quantized_model(model_size, saved):
+    import whisper
+    from whisper.model import Whisper, ModelDimensions
+    model = quantize_model(Whisper(ModelDimensions(**saved["dims"])))
+    model.load_state_dict(saved["state_dict"])
+    alignment_heads = whisper._ALIGNMENT_HEADS.get(model_size)
+    if alignment_heads is not None:
+        model.set_alignment_heads(alignment_heads)
+    return model
+
+# Model int8 z pamięci dyskowej lub – przy pierwszym użyciu – z kwantyzacji modelu fp32 (zapis atomowy).
+def load_quantized_model(model_size, cache_dir=DEFAULT_QUANTIZED_DIR):
+    import torch
+    import whisper
+    from dataclasses import asdict
+    path = quantized_model_path(model_size, cache_dir)
+    if os.path.exists(path):
+        start = time.time()
+        try:
+            model = _rebuild_quantized_model(model_size, torch.load(path, map_location="cpu", weights_only=True))
+            logger.info(f"Model int8 ({model_size}) wczytany z {path} w {time.time() - start:.1f} s.")
+            return model
+        except Exception as e:
+            logger.warning(f"Nie można wczytać modelu int8 z {path}, kwantyzuję ponownie: {str(e)}")
+    start = time.time()
+    model = quantize_model(whisper.load_model(model_size, device="cpu"))
+    logger.info(f"Model {model_size} skwantyzowany do int8 w {time.time() - start:.1f} s.")
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.save({"dims": asdict(model.dims), "state_dict": model.state_dict()}, tmp_path)
+    os.replace(tmp_path, path)
+    logger.info(f"Model int8 zapisany: {path} ({os.path.getsize(path) / (1024 * 1024):.0f} MB).")
+    return model
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+# Różnice na poziomie słów między transkrypcją fp32 (odniesienie) a int8: podstawienia, usunięcia,
+# wstawienia, współczynnik różnic (jak WER) i przykładowe rozbieżne fragmenty.
+def word_differences(reference, hypothesis, max_examples=20):
+    ref = _words(reference)
+    hyp = _words(hypothesis)
+    substitutions = deletions = insertions = 0
+    examples = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, ref, hyp, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        if tag == "replace":
+            common = min(i2 - i1, j2 - j1)
+            substitutions += common
+            deletions += (i2 - i1) - common
+            insertions += (j2 - j1) - common
+        elif tag == "delete":
+            deletions += i2 - i1
+        elif tag == "insert":
+            insertions += j2 - j1
+        if len(examples) < max_examples:
+            examples.append({"fp32": " ".join(ref[i1:i2]), "int8": " ".join(hyp[j1:j2])})
+    errors = substitutions + deletions + insertions
+    return {
+        "reference_words": len(ref),
+        "hypothesis_words": len(hyp),
+        "substitutions": substitutions,
+        "deletions": deletions,
+        "insertions": insertions,
+        "word_difference_rate": round(errors / len(ref), 4) if ref else None,
+        "examples": examples,
+    }
+
+# Transkrypcja tego samego pliku modelem fp32 i int8 na CPU. Zwraca raport z czasami i różnicami słów.
+def compare_with_fp32(audio, model_size, transcribe_options=None, cache_dir=DEFAULT_QUANTIZED_DIR):
+    import torch
+    import whisper
+    transcribe_options = dict(transcribe_options or {}, fp16=False)
+    audio_seconds = len(audio) / whisper.audio.SAMPLE_RATE
+    report = {"model_size": model_size, "audio_seconds": round(audio_seconds, 3), "threads": torch.get_num_threads()}
+    texts = {}
+    for variant in ("fp32", "int8"):
+        start = time.time()
+        model = whisper.load_model(model_size, device="cpu") if variant == "fp32" else load_quantized_model(model_size, cache_dir)
+        load_seconds = time.time() - start
+        start = time.time()
+        result = model.transcribe(audio, **transcribe_options)
+        decode_seconds = time.time() - start
+        texts[variant] = result["text"]
+        report[variant] = {"load_seconds": round(load_seconds, 3), "decode_seconds": round(decode_seconds, 3),
+                           "rtf": round(decode_seconds / audio_seconds, 4)}
+        logger.info(f"{model_size} {variant}: dekodowanie {decode_seconds:.1f} s (RTF {decode_seconds / audio_seconds:.2f}).")
+        del model
+    report["speedup"] = round(report["fp32"]["decode_seconds"] / max(report["int8"]["decode_seconds"], 1e-9), 3)
+    report["words"] = word_differences(texts["fp32"], texts["int8"])
+    return report
+
+def format_report(report):
+    words = report["words"]
+    rate = f"{words['word_difference_rate']:.1%}" if words["word_difference_rate"] is not None else "?"
+    return (f"{report['model_size']:>8}: fp32 {report['fp32']['decode_seconds']:.1f} s, int8 {report['int8']['decode_seconds']:.1f} s "
+            f"(przyspieszenie {report['speedup']:.2f}x), różnice słów {rate} "
+            f"(podst. {words['substitutions']}, usun. {words['deletions']}, wstaw. {words['insertions']} "
+            f"na {words['reference_words']} słów)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="quantization", description="Porównanie modelu int8 z fp32 na CPU.")
+    parser.add_argument("file", help="Plik audio/wideo do porównania.")
+    parser.add_argument("--models", nargs="+", default=["base", "small"], help="Rozmiary modelu Whisper.")
+    parser.add_argument("--threads", type=int, default=None, help="Wątki torch (domyślnie liczba rdzeni fizycznych).")
+    parser.add_argument("--no-polish", action="store_true", help="Nie wymuszaj języka polskiego.")
+    parser.add_argument("--cache-dir", default=DEFAULT_QUANTIZED_DIR, help="Katalog modeli int8.")
+    parser.add_argument("--output", default=None, help="Plik JSON z raportem.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from audio import load_audio
+    configure_cpu_threads(args.threads)
+    audio = load_audio(args.file)
+    transcribe_options = {} if args.no_polish else {"language": "pl"}
+    reports = [compare_with_fp32(audio, size, transcribe_options, args.cache_dir) for size in args.models]
+    print("\n".join(format_report(report) for report in reports))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"file": os.path.abspath(args.file), "reports": reports}, f, ensure_ascii=False, indent=2)
+        logger.info(f"Raport zapisany: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# Wykrywanie pętli powtórzeń i halucynacji Whispera (muzyka, szum, cisza).
+#
+# Whisper potrafi przez wiele minut nagrania powtarzać tę samą linijkę. Segmenty są sprawdzane zaraz po
+# dekodowaniu (w trybie z punktami kontrolnymi i strumieniowym – po każdym oknie, nie na końcu pliku):
+#   • pętla – co najmniej MIN_REPEATS kolejnych segmentów o prawie tym samym tekście (difflib),
+#   • powtórzenia w obrębie segmentu – współczynnik kompresji tekstu powyżej progu,
+#   • halucynacja na ciszy – wysokie prawdopodobieństwo braku mowy przy niskiej pewności tekstu.
+# Tylko audio podejrzanego fragmentu jest dekodowane ponownie – bez kontekstu poprzedniego tekstu i z wyższą
+# temperaturą. Segmenty, które nadal wyglądają na pętlę, są pomijane, a dokładne duplikaty usuwane przed
+# eksportem. RepetitionFilter sumuje sekundy dekodowane ponownie i pominięte (raport pliku w metrykach).
+
+import re
+import difflib
+import logging
+
+from audio import SAMPLE_RATE
+
+logger = logging.getLogger("TranscriptionApp")
+
+# Podobieństwo tekstu (0–1), od którego sąsiednie segmenty uznawane są za powtórzenie.
+SIMILARITY_THRESHOLD = 0.9
+# Minimalna liczba kolejnych podobnych segmentów tworzących pętlę (dwa to zwykły duplikat).
+MIN_REPEATS = 3
+# Progi jak w whisper.transcribe (compression_ratio_threshold, no_speech_threshold, logprob_threshold).
+COMPRESSION_RATIO_THRESHOLD = 2.4
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+# Ustawienia ponownego dekodowania fragmentu: bez initial_prompt i kontekstu (pętla często się z niego
+# bierze), od razu z próbkowaniem i z ostrzejszym progiem kompresji dla kolejnych prób temperatury.
+REDECODE_OPTIONS = {
+    "condition_on_previous_text": False,
+    "temperature": (0.2, 0.4, 0.6, 0.8, 1.0),
+    "compression_ratio_threshold": 2.0,
+}
+
+def normalize_text(text):
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+def text_similarity(a, b):
+    a, b = normalize_text(a), normalize_text(b)
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+# Segment podejrzany sam w sobie (bez porównania z sąsiadami): powtórzenia w tekście lub halucynacja na ciszy.
+def is_hallucination(seg):
+    if seg.get("compression_ratio", 0.0) > COMPRESSION_RATIO_THRESHOLD:
+        return True
+    return (seg.get("no_speech_prob", 0.0) > NO_SPEECH_THRESHOLD
+            and seg.get("avg_logprob", 0.0) < LOGPROB_THRESHOLD)
+
+# Serie kolejnych podobnych segmentów – lista par indeksów [pierwszy, ostatni] (włącznie), od dwóch segmentów.
+def similar_runs(segments, threshold=SIMILARITY_THRESHOLD):
+    runs = []
+    start = 0
+    for i in range(1, len(segments) + 1):
+        if i < len(segments) and text_similarity(segments[i - 1]["text"], segments[i]["text"]) >= threshold:
+            continue
+        if i - 1 > start:
+            runs.append((start, i - 1))
+        start = i
+    return runs
+
+# Podejrzane fragmenty czasu [(początek_s, koniec_s), ...] – pętle i halucynacje, połączone gdy nachodzą.
+def find_suspect_spans(segments):
+    spans = [(segments[first]["start"], segments[last]["end"])
+             for first, last in similar_runs(segments) if last - first + 1 >= MIN_REPEATS]
+    spans += [(seg["start"], seg["end"]) for seg in segments if is_hallucination(seg)]
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class RepetitionFilter:
+    def __init__(self, model, transcribe_options, sr=SAMPLE_RATE):
+        self.model = model
+        self.transcribe_options = {key: value for key, value in transcribe_options.items() if key != "initial_prompt"}
+        self.sr = sr
+        self.redecoded_seconds = 0.0
+        self.suppressed_seconds = 0.0
+        self.redecoded_spans = 0
+        self.suppressed_segments = 0
+        self.dropped_duplicates = 0
+        # Ostatni zachowany tekst – duplikat na granicy okien też jest usuwany.
+        self._last_text = None
+
+    # Dekoduje ponownie podejrzane fragmenty bufora audio (czasy segmentów względem jego początku).
+    # Zwraca nową listę segmentów. language – język wykryty przy pierwszym dekodowaniu.
+    def repair(self, audio, segments, language=None):
+        spans = find_suspect_spans(segments)
+        if not spans:
+            return segments
+        return self._redecode_spans(audio, segments, spans, language)
+
+    def _redecode_spans(self, audio, segments, spans, language):
+        options = dict(self.transcribe_options, **REDECODE_OPTIONS)
+        if language is not None:
+            options["language"] = language
+        repaired = []
+        position = 0
+        for start, end in spans:
+            while position < len(segments) and segments[position]["end"] <= start:
+                repaired.append(segments[position])
+                position += 1
+            replaced_end = position
+            while replaced_end < len(segments) and segments[replaced_end]["start"] < end:
+                replaced_end += 1
+            # Zastępowane segmenty mogą wystawać poza fragment – dekodowane jest całe ich audio.
+            if replaced_end > position:
+                start = min(start, segments[position]["start"])
+                end = max(end, segments[replaced_end - 1]["end"])
+            chunk = audio[int(start * self.sr):int(end * self.sr)]
+            result = self.model.transcribe(chunk, **options)
+            self.redecoded_seconds += end - start
+            self.redecoded_spans += 1
+            new_segments = []
+            for seg in result.get("segments", []):
+                seg = dict(seg)
+                seg["start"] = round(min(seg["start"] + start, end), 3)
+                seg["end"] = round(min(seg["end"] + start, end), 3)
+                new_segments.append(seg)
+            kept = self._suppress(new_segments)
+            logger.info(f"Powtórzenia/halucynacje {start:.1f}–{end:.1f} s: zdekodowano ponownie, "
+                        f"{replaced_end - position} segmentów zastąpiono {len(kept)}.")
+            repaired.extend(kept)
+            position = replaced_end
+        repaired.extend(segments[position:])
+        return repaired
+
+    # Po ponownym dekodowaniu: pętla zostaje skrócona do pierwszego wystąpienia, a halucynacje pomijane.
+    def _suppress(self, segments):
+        drop = {i for i, seg in enumerate(segments) if is_hallucination(seg)}
+        for first, last in similar_runs(segments):
+            if last - first + 1 >= MIN_REPEATS:
+                drop.update(range(first + 1, last + 1))
+        for i in drop:
+            self._count_suppressed(segments[i])
+        return [seg for i, seg in enumerate(segments) if i not in drop]
+
+    # Usuwa segmenty o tekście identycznym z poprzednim zachowanym – wywoływane dla segmentów zatwierdzonych
+    # (w oknach po odcięciu ostatniego segmentu, który przechodzi do następnego okna).
+    def drop_duplicates(self, segments):
+        kept = []
+        for seg in segments:
+            text = normalize_text(seg["text"])
+            if text and text == self._last_text:
+                self.dropped_duplicates += 1
+                self._count_suppressed(seg)
+                continue
+            kept.append(seg)
+            if text:
+                self._last_text = text
+        return kept
+
+    def _count_suppressed(self, seg):
+        self.suppressed_segments += 1
+        self.suppressed_seconds += max(0.0, seg["end"] - seg["start"])
+
+    def stats(self):
+        return {
+            "redecoded_seconds": round(self.redecoded_seconds, 3),
+            "redecoded_spans": self.redecoded_spans,
+            "suppressed_seconds": round(self.suppressed_seconds, 3),
+            "suppressed_segments": self.suppressed_segments,
+            "dropped_duplicates": self.dropped_duplicates,
+        }
+
+    def format_stats(self):
+        return (f"Powtórzenia: ponownie zdekodowano {self.redecoded_seconds:.1f} s ({self.redecoded_spans} fragmentów), "
+                f"pominięto {self.suppressed_seconds:.1f} s ({self.suppressed_segments} segmentów, "
+                f"w tym {self.dropped_duplicates} duplikatów).")
@@ -0,0 +1,188 @@
+# Pamięć podręczna wyników – ponowne uruchomienie partii nie transkrybuje niezmienionych plików.
+#
+# Klucz wpisu to skrót SHA-256 zdekodowanego audio (mono 16 kHz) połączony z ustawieniami, które
+# wpływają na wynik (rozmiar modelu, wymuszenie języka, diaryzacja, VAD, urządzenie) i wersjami bibliotek.
+# Przy trafieniu zapisywane są tylko wybrane formaty eksportu – bez dekodowania i bez Whispera.
+# Dodatkowo pamiętany jest skrót audio dla (ścieżka, rozmiar, czas modyfikacji), więc przy ponownym
+# przejściu przez to samo archiwum nie trzeba nawet dekodować plików.
+#
+# Indeks (SQLite) przechowuje rozmiary i czasy użycia wpisów – najdawniej używane są usuwane (LRU)
+# po przekroczeniu limitu rozmiaru. SQLite pozwala współdzielić pamięć między procesami (parallel.py).
+
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from importlib import metadata
+
+import numpy as np
+
+logger = logging.getLogger("TranscriptionApp")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), "Documents", "TranscriptionApp", "cache")
+DEFAULT_CACHE_MAX_MB = 2048
+# Zmiana formatu wpisów lub logiki przetwarzania wymaga podbicia tej wersji.
+CACHE_FORMAT_VERSION = 1
+
+# Wersje bibliotek, od których zależy wynik – zmiana którejkolwiek unieważnia wpisy.
+def software_versions():
+    versions = {"cache_format": CACHE_FORMAT_VERSION}
+    for package in ["openai-whisper", "torch", "Resemblyzer", "spectralcluster", "webrtcvad"]:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+def hash_audio(audio):
+    return hashlib.sha256(np.ascontiguousarray(audio, dtype=np.float32).view(np.uint8)).hexdigest()
+
+# Tylko ustawienia wpływające na treść wyniku – formaty eksportu czy katalog wyjściowy nie zmieniają klucza.
+def output_settings(options):
+    settings = {
+        "model_size": options.model_size,
+        "force_polish": options.force_polish,
+        "diarization": options.diarization_method if options.enable_speaker_diarization else None,
+        "vad": options.vad_aggressiveness if options.vad else None,
+        "int8": options.quantize and options.hardware_mode == "cpu",
+        # Whisper liczy na CUDA w fp16, a na CPU w fp32 – wyniki się różnią (jak engine.resolve_device).
+        "device": "cpu" if options.hardware_mode == "cpu" else "cuda",
+    }
+    # Dopisywane tylko, gdy włączone – klucze wcześniej zapisanych wyników pozostają ważne.
+    if options.remove_duplicates:
+        settings["remove_duplicates"] = True
+    # Z punktami kontrolnymi dłuższe pliki transkrybowane są w oknach – inny wynik niż jedno wywołanie Whispera.
+    if options.checkpoints and not options.streaming:
+        settings["checkpoint_seconds"] = options.checkpoint_seconds
+    if options.speaker_gallery and options.enable_speaker_diarization:
+        settings["speaker_gallery"] = options.speaker_threshold
+    # moviepy zapisuje WAV inną ścieżką dekodowania niż ffmpeg – audio (i wynik) może się nieznacznie różnić.
+    if options.video_extraction != "ffmpeg":
+        settings["video_extraction"] = options.video_extraction
+    return settings
+
+class ResultCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._versions = software_versions()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, source TEXT, size_bytes INTEGER, "
+                       "created REAL, last_access REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, audio_hash TEXT)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def make_key(self, audio_hash, options):
+        payload = json.dumps({"audio": audio_hash, "settings": output_settings(options), "versions": self._versions},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # Skrót audio zapamiętany dla niezmienionego pliku (ta sama ścieżka, rozmiar i czas modyfikacji) lub None.
+    def known_audio_hash(self, file_path):
+        st = os.stat(file_path)
+        with self._connect() as db:
+            row = db.execute("SELECT size, mtime, audio_hash FROM files WHERE path = ?",
+                             (os.path.abspath(file_path),)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime:
+            return row[2]
+        return None
+
+    def remember_file(self, file_path, audio_hash):
+        st = os.stat(file_path)
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO files (path, size, mtime, audio_hash) VALUES (?, ?, ?, ?)",
+                       (os.path.abspath(file_path), st.st_size, st.st_mtime, audio_hash))
+
+    # Zwraca zapisany wpis ({"result": ..., "segments": ...}) lub None.
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._connect() as db:
+            db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key, result, segments, source=None):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"result": result, "segments": segments, "source": source}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO entries (key, source, size_bytes, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                       (key, source, os.path.getsize(path), now, now))
+        self._evict()
+
+    # Usuwa najdawniej używane wpisy, dopóki łączny rozmiar przekracza limit.
+    def _evict(self):
+        with self._connect() as db:
+            total = db.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in db.execute("SELECT key, size_bytes FROM entries ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._remove(db, key)
+                total -= size
+                logger.info(f"Pamięć podręczna: usunięto najdawniej używany wpis {key[:12]}.")
+
+    def _remove(self, db, key):
+        db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    # Unieważnia wpisy: wszystkie (source=None) albo utworzone dla danego pliku źródłowego.
+    # Zwraca liczbę usuniętych wpisów.
+    def invalidate(self, source=None):
+        with self._connect() as db:
+            if source is None:
+                keys = [row[0] for row in db.execute("SELECT key FROM entries").fetchall()]
+                db.execute("DELETE FROM files")
+            else:
+                source = os.path.abspath(source)
+                keys = [row[0] for row in db.execute("SELECT key FROM entries WHERE source = ?", (source,)).fetchall()]
+                db.execute("DELETE FROM files WHERE path = ?", (source,))
+            for key in keys:
+                self._remove(db, key)
+        return len(keys)
+
+    def stats(self):
+        with self._connect() as db:
+            entries, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM entries").fetchone()
+        return {
+            "entries": entries,
+            "size_mb": total / (1024 * 1024),
+            "max_mb": self.max_bytes / (1024 * 1024),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,202 @@
+# Pełnotekstowy indeks archiwum transkrypcji (SQLite FTS5).
+#
+# Przy eksporcie każdy plik dopisuje swoje segmenty (plik, początek, koniec, mówca, tekst) do jednej lokalnej
+# bazy – w trybie strumieniowym na bieżąco, razem z zapisem wyników. Wyszukiwanie frazy w tysiącach nagrań
+# to jedno zapytanie zamiast przeglądania każdego folderu "wyniki_<nazwa>". Istniejące wyniki można
+# dołączyć do indeksu z plików JSON (backfill_folder).
+#
+# Plik w indeksie identyfikuje ścieżka bazowa wyników ("wyniki_<nazwa>/<nazwa>", bez rozszerzenia),
+# więc ponowna transkrypcja lub ponowne dołączenie zastępuje wcześniejsze segmenty zamiast je dublować.
+# Tekst indeksowany jest bez znaków diakrytycznych ("budzet" znajduje "budżet").
+#
+#   python -m cli --search "budżet gminy"                 (segmenty z czasem w milisekundach)
+#   python -m cli --index-backfill D:/nagrania            (dołączenie istniejących wyników_*)
+
+import os
+import re
+import csv
+import glob
+import json
+import time
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+logger = logging.getLogger("TranscriptionApp")
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), "Documents", "TranscriptionApp", "indeks.sqlite")
+DEFAULT_SEARCH_LIMIT = 50
+# Prefiks mówcy nadawany przy diaryzacji ("Osoba1: tekst").
+SPEAKER_PATTERN = re.compile(r"^\s*([^:\n]{1,40}):\s(.*)$", re.S)
+# Znaki składni FTS5 – zapytanie z nimi przekazywane jest bez zmian (frazy w cudzysłowie, prefiks*, NEAR, ...).
+FTS_SYNTAX = re.compile(r'["*():^]|\b(AND|OR|NOT|NEAR)\b')
+# Pliki w folderach wyników, które nie są transkrypcją.
+SKIPPED_JSON_SUFFIXES = ("_metrics.json",)
+
+# Rozdziela prefiks mówcy od tekstu – tylko gdy mają go wszystkie niepuste segmenty (wynik diaryzacji),
+# aby zwykły tekst z dwukropkiem ("Uwaga: ...") nie został uznany za mówcę. Zwraca [(mówca lub None, tekst), ...].
+def split_speakers(segments):
+    texts = [seg["text"].strip() for seg in segments]
+    matches = [SPEAKER_PATTERN.match(text) for text in texts]
+    if all(match is not None for text, match in zip(texts, matches) if text) and any(texts):
+        return [(match.group(1), match.group(2).strip()) if match else (None, text) for text, match in zip(texts, matches)]
+    return [(None, text) for text in texts]
+
+# Zapytanie użytkownika jako wyrażenie FTS5: zwykłe słowa muszą wystąpić wszystkie (w dowolnej kolejności),
+# a zapytanie ze składnią FTS5 przekazywane jest bez zmian.
+def fts_query(query):
+    if FTS_SYNTAX.search(query):
+        return query
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"' for word in words)
+
+class SearchIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY AUTOINCREMENT, output_base TEXT UNIQUE, "
+                       "source TEXT, indexed REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY, file_id INTEGER NOT NULL, "
+                       "start_ms INTEGER, end_ms INTEGER, speaker TEXT, text TEXT)")
+            db.execute("CREATE INDEX IF NOT EXISTS segments_file ON segments (file_id, start_ms)")
+            # Indeks FTS5 z zawartością w tabeli segments – utrzymywany wyzwalaczami.
+            db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(text, speaker, content='segments', "
+                       "content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+            db.execute("CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN "
+                       "INSERT INTO segments_fts (rowid, text, speaker) VALUES (new.id, new.text, new.speaker); END")
+            db.execute("CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN "
+                       "INSERT INTO segments_fts (segments_fts, rowid, text, speaker) "
+                       "VALUES ('delete', old.id, old.text, old.speaker); END")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        finally:
+            db.close()
+
+    def _file_id(self, db, output_base, source=None):
+        output_base = os.path.abspath(output_base)
+        row = db.execute("SELECT id FROM files WHERE output_base = ?", (output_base,)).fetchone()
+        if row is None:
+            return db.execute("INSERT INTO files (output_base, source, indexed) VALUES (?, ?, ?)",
+                              (output_base, source and os.path.abspath(source), time.time())).lastrowid
+        db.execute("UPDATE files SET indexed = ?, source = COALESCE(?, source) WHERE id = ?",
+                   (time.time(), source and os.path.abspath(source), row["id"]))
+        return row["id"]
+
+    # Dopisuje segmenty pliku (czasy w sekundach jak w wyniku Whispera). replace=True usuwa najpierw
+    # wcześniej zaindeksowane segmenty tego pliku. Zwraca liczbę dopisanych segmentów.
+    def add_segments(self, output_base, segments, source=None, replace=False):
+        rows = []
+        for seg, (speaker, text) in zip(segments, split_speakers(segments)):
+            if text:
+                rows.append((int(round(seg["start"] * 1000)), int(round(seg["end"] * 1000)), speaker, text))
+        with self._connect() as db:
+            file_id = self._file_id(db, output_base, source)
+            if replace:
+                db.execute("DELETE FROM segments WHERE file_id = ?", (file_id,))
+            db.executemany("INSERT INTO segments (file_id, start_ms, end_ms, speaker, text) VALUES (?, ?, ?, ?, ?)",
+                           [(file_id,) + row for row in rows])
+        return len(rows)
+
+    # Usuwa segmenty pliku zaczynające się od from_ms (wszystkie, gdy 0) – np. przed wznowieniem
+    # transkrypcji strumieniowej, aby segmenty zapisane po ostatnim punkcie kontrolnym nie zostały zdublowane.
+    def remove_segments(self, output_base, from_ms=0):
+        with self._connect() as db:
+            row = db.execute("SELECT id FROM files WHERE output_base = ?", (os.path.abspath(output_base),)).fetchone()
+            if row is None:
+                return 0
+            return db.execute("DELETE FROM segments WHERE file_id = ? AND start_ms >= ?", (row["id"], from_ms)).rowcount
+
+    # Segmenty pasujące do zapytania, od najlepiej dopasowanych. speaker zawęża wyniki do mówcy,
+    # path_filter – do plików, których ścieżka zawiera podany tekst.
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT, speaker=None, path_filter=None):
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = ("SELECT files.source, files.output_base, segments.start_ms, segments.end_ms, segments.speaker, "
+               "segments.text, snippet(segments_fts, 0, '[', ']', '…', 12) AS snippet "
+               "FROM segments_fts JOIN segments ON segments.id = segments_fts.rowid "
+               "JOIN files ON files.id = segments.file_id WHERE segments_fts MATCH ?")
+        params = [match]
+        if speaker:
+            sql += " AND segments.speaker = ?"
+            params.append(speaker)
+        if path_filter:
+            sql += " AND (files.output_base LIKE ? OR files.source LIKE ?)"
+            params += [f"%{path_filter}%"] * 2
+        sql += " ORDER BY bm25(segments_fts), files.output_base, segments.start_ms LIMIT ?"
+        params.append(limit)
+        try:
+            with self._connect() as db:
+                rows = db.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise Exception(f"Nieprawidłowe zapytanie wyszukiwania „{query}”: {str(e)}")
+        return [{"file": row["source"] or row["output_base"], "output_base": row["output_base"],
+                 "start_ms": row["start_ms"], "end_ms": row["end_ms"], "speaker": row["speaker"],
+                 "text": row["text"], "snippet": row["snippet"]} for row in rows]
+
+    def stats(self):
+        with self._connect() as db:
+            files = db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            segments = db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {"files": files, "segments": segments, "size_mb": os.path.getsize(self.path) / (1024 * 1024)}
+
+# Segmenty z pliku JSON wyników (pełny wynik Whispera albo zapis strumieniowy {"segments": [...]}).
+# JSON z pełnego wyniku nie zawiera mówców – gdy obok jest CSV z tą samą liczbą segmentów, tekst
+# (z prefiksem mówcy po diaryzacji) brany jest z CSV.
+def read_output_segments(json_path):
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    segments = [{"start": seg["start"], "end": seg["end"], "text": seg["text"]} for seg in data.get("segments", [])]
+    csv_path = f"{json_path[:-len('.json')]}.csv"
+    if os.path.exists(csv_path):
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f))[1:]
+        if len(rows) == len(segments):
+            for seg, row in zip(segments, rows):
+                seg["text"] = row[2]
+    return segments
+
+# Plik źródłowy dla "<katalog>/wyniki_<nazwa>/<nazwa>.json" – nagranie "<nazwa>.*" obok folderu wyników.
+def guess_source(json_path, extensions):
+    base = os.path.splitext(os.path.basename(json_path))[0]
+    folder = os.path.dirname(os.path.dirname(os.path.abspath(json_path)))
+    for ext in extensions:
+        candidate = os.path.join(folder, base + ext)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+# Dołącza do indeksu wyniki JSON ze wszystkich folderów "wyniki_*" pod folder (rekurencyjnie).
+# Pliki już zaindeksowane są zastępowane. Zwraca (liczba plików, liczba segmentów).
+def backfill_folder(index, folder, extensions=()):
+    files = segments_total = 0
+    for json_path in sorted(glob.glob(os.path.join(glob.escape(folder), "**", "wyniki_*", "*.json"), recursive=True)):
+        if json_path.endswith(SKIPPED_JSON_SUFFIXES):
+            continue
+        try:
+            segments = read_output_segments(json_path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Pomijam {json_path}: {str(e)}")
+            continue
+        count = index.add_segments(json_path[:-len(".json")], segments, source=guess_source(json_path, extensions),
+                                   replace=True)
+        files += 1
+        segments_total += count
+        logger.info(f"Zaindeksowano {count} segmentów: {json_path}")
+    return files, segments_total
+
+def format_ms(ms):
+    seconds, ms = divmod(int(ms), 1000)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}.{ms:03d}"
@@ -0,0 +1,471 @@
+# Lokalna usługa HTTP – transkrypcja zlecana przez inne programy bez uruchamiania okna Tk.
+#
+# Przykład:
+#   python -m service --port 8765 --slots 1 --model medium --hardware cpu
+#   curl -X POST "http://127.0.0.1:8765/jobs?filename=wywiad.mp3" --data-binary @wywiad.mp3
+#   curl -X POST http://127.0.0.1:8765/jobs -H "Content-Type: application/json" \
+#        -d '{"path": "D:/nagrania/sesja.mp4", "options": {"model_size": "small"}, "priority": 5}'
+#   curl http://127.0.0.1:8765/jobs/1
+#   curl http://127.0.0.1:8765/jobs/1/result/srt
+#
+# Zlecenia trafiają do trwałej kolejki (job_queue.py, osobny plik usługi), więc przetrwają ponowne uruchomienie.
+# Każde stanowisko (--slots) to osobny wątek z własnym silnikiem i modelem trzymanym w pamięci między
+# zleceniami – liczba stanowisk ogranicza liczbę równoczesnych transkrypcji (na GPU zwykle 1).
+# Usługa nie korzysta z sieci poza lokalnym portem: modele muszą być już pobrane (ładowane są przy starcie),
+# a serwer domyślnie słucha tylko na 127.0.0.1. Wykorzystuje wyłącznie bibliotekę standardową (http.server).
+#
+# API (JSON):
+#   POST   /jobs                       – ścieżka pliku (JSON) lub przesłany plik (treść żądania, ?filename=...);
+#                                        ustawienia jako "options" (JSON) lub parametry zapytania, np. ?model_size=small
+#   GET    /jobs                       – ostatnie zlecenia
+#   GET    /jobs/<id>                  – stan, postęp (sekundy nagrania), błąd i dostępne wyniki
+#   GET    /jobs/<id>/result/<format>  – plik wynikowy (txt, srt, vtt, json, csv, msgpack, autorski, metrics)
+#   DELETE /jobs/<id>                  – usunięcie zlecenia, które nie jest właśnie przetwarzane
+#   GET    /health                     – stanowiska, kolejka i załadowane modele
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import fields, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from engine import (TranscriptionEngine, TranscriptionOptions, ModelPool, EXPORT_FORMATS, DEFAULT_EXPORT_FORMATS,
+                    MODEL_SIZES, HARDWARE_MODES, SUPPORTED_EXTENSIONS, resolve_device)
+from job_queue import JobQueue, QueueRunner, options_from_json, DEFAULT_MAX_ATTEMPTS
+
+logger = logging.getLogger("TranscriptionApp")
+
+SERVICE_DIR = os.path.join(os.path.expanduser("~"), "Documents", "TranscriptionApp", "serwis")
+DEFAULT_SERVICE_QUEUE = os.path.join(SERVICE_DIR, "kolejka.sqlite")
+DEFAULT_UPLOAD_DIR = os.path.join(SERVICE_DIR, "przeslane")
+DEFAULT_PORT = 8765
+DEFAULT_MAX_UPLOAD_MB = 4096
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+CONTENT_TYPES = {
+    "txt": "text/plain; charset=utf-8",
+    "autorski": "text/plain; charset=utf-8",
+    "srt": "application/x-subrip; charset=utf-8",
+    "vtt": "text/vtt; charset=utf-8",
+    "json": "application/json; charset=utf-8",
+    "metrics": "application/json; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "msgpack": "application/msgpack",
+}
+# Ustawienia, których zlecenie nie może zmienić – dotyczą procesu usługi, nie pojedynczego pliku.
+SERVICE_ONLY_OPTIONS = {"workers", "threads_per_worker", "cpu_threads", "hardware_mode", "quantized_dir",
+                        "cache_dir", "profile_stage", "index_path",
+                        "gallery_path"}
+
+# Błąd zlecenia z kodem odpowiedzi HTTP.
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _parse_value(name, field_type, value):
+    if not isinstance(value, str):
+        return value
+    if field_type is bool:
+        return value.strip().lower() in ("1", "true", "tak", "yes", "on")
+    if field_type is int:
+        try:
+            return int(value)
+        except ValueError:
+            raise ServiceError(400, f"Nieprawidłowa wartość {name}: {value}")
+    if field_type is float:
+        try:
+            return float(value)
+        except ValueError:
+            raise ServiceError(400, f"Nieprawidłowa wartość {name}: {value}")
+    if field_type is list:
+        return [item for item in value.split(",") if item]
+    return value
+
+# Ustawienia zlecenia: domyślne ustawienia usługi nadpisane polami z żądania (JSON lub parametry zapytania).
+def merge_options(defaults, overrides):
+    known = {f.name: f.type for f in fields(TranscriptionOptions)}
+    changes = {}
+    for name, value in (overrides or {}).items():
+        if name not in known:
+            raise ServiceError(400, f"Nieznane ustawienie: {name}")
+        if name in SERVICE_ONLY_OPTIONS:
+            raise ServiceError(400, f"Ustawienie {name} jest ustalane przy uruchomieniu usługi.")
+        changes[name] = _parse_value(name, known[name], value)
+    options = replace(defaults, **changes)
+    if options.model_size not in MODEL_SIZES:
+        raise ServiceError(400, f"Nieznany rozmiar modelu: {options.model_size}")
+    unknown_formats = [fmt for fmt in options.export_formats if fmt not in EXPORT_FORMATS]
+    if unknown_formats:
+        raise ServiceError(400, f"Nieznane formaty eksportu: {', '.join(unknown_formats)}")
+    # Podobieństwo kosinusowe – poza [-1, 1] próg nie ma sensu (a wartość nieliczbowa przerwałaby diaryzację).
+    if (not isinstance(options.speaker_threshold, (int, float)) or isinstance(options.speaker_threshold, bool)
+            or not -1.0 <= options.speaker_threshold <= 1.0):
+        raise ServiceError(400, f"Nieprawidłowy próg podobieństwa mówców: {options.speaker_threshold}")
+    return options
+
+def _safe_filename(name):
+    name = os.path.basename(name.replace("\\", "/")).strip()
+    name = re.sub(r"[^\w.\- ]", "_", name)
+    return name.lstrip(".") or "nagranie"
+
+class TranscriptionService:
+    # options – domyślne ustawienia zleceń; allowed_dirs – jeśli podane, ścieżki plików i katalogi wyjściowe
+    # muszą leżeć w jednym z tych katalogów (przesłane pliki zawsze trafiają do upload_dir).
+    def __init__(self, options=None, slots=1, queue_path=DEFAULT_SERVICE_QUEUE, upload_dir=DEFAULT_UPLOAD_DIR,
+                 allowed_dirs=None, max_upload_mb=DEFAULT_MAX_UPLOAD_MB, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.options = replace(options or TranscriptionOptions(), workers=1)
+        self.slots = max(1, slots)
+        self.queue = JobQueue(queue_path, max_attempts=max_attempts)
+        self.upload_dir = upload_dir
+        self.allowed_dirs = [os.path.abspath(d) for d in allowed_dirs or []]
+        self.max_upload_bytes = int(max_upload_mb * 1024 * 1024)
+        self.runners = []
+        self._threads = []
+        # Postęp zleceń w toku: id → etap, sekundy nagrania przetworzone i łącznie, stanowisko.
+        self._progress = {}
+        self._lock = threading.Lock()
+        self._started = None
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def _track(self, runner, **values):
+        job = runner.current_job
+        if job is None:
+            return
+        with self._lock:
+            self._progress.setdefault(job["id"], {}).update(values)
+
+    def _on_job(self, job, state):
+        with self._lock:
+            self._progress.pop(job["id"], None)
+
+    def start(self, preload=True):
+        self.queue.recover()
+        device = resolve_device(self.options.hardware_mode)
+        if device == "cuda" and self.slots > 1:
+            logger.warning(f"{self.slots} stanowiska na GPU – każde trzyma własny model w pamięci karty.")
+        for slot in range(self.slots):
+            engine = TranscriptionEngine(model_pool=ModelPool(max_models=1))
+            runner = QueueRunner(engine, self.queue, job_callback=self._on_job)
+            engine.status_callback = lambda message, runner=runner, slot=slot: self._track(runner, stage=message, slot=slot)
+            engine.progress_callback = lambda seconds, total, runner=runner: self._track(
+                runner, seconds=round(seconds, 1), total_seconds=round(total, 1) if total is not None else None)
+            self.runners.append(runner)
+            # Model ładowany przy starcie: zlecenia nie czekają na niego, a brak pobranego modelu widać od razu.
+            if preload:
+                engine.warm_up(self.options)
+            thread = threading.Thread(target=runner.run, kwargs={"recover": False}, name=f"stanowisko-{slot + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._started = time.time()
+        logger.info(f"Usługa transkrypcji: {self.slots} stanowisk, kolejka {self.queue.path}.")
+
+    # Zatrzymuje stanowiska; przerwane zlecenia wracają do kolejki z punktem kontrolnym.
+    def stop(self, timeout=None):
+        for runner in self.runners:
+            runner.stop()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _check_allowed(self, path):
+        if not self.allowed_dirs:
+            return
+        real = os.path.realpath(path)
+        if not any(os.path.commonpath([real, os.path.realpath(d)]) == os.path.realpath(d) for d in self.allowed_dirs):
+            raise ServiceError(403, f"Ścieżka spoza dozwolonych katalogów: {path}")
+
+    def _job_options(self, overrides):
+        options = merge_options(self.options, overrides)
+        if options.output_dir:
+            self._check_allowed(options.output_dir)
+        return options
+
+    def submit_path(self, path, overrides=None, priority=0):
+        if not path:
+            raise ServiceError(400, "Brak ścieżki pliku.")
+        self._check_allowed(path)
+        if not os.path.isfile(path):
+            raise ServiceError(404, f"Plik nie istnieje: {path}")
+        return self.queue.enqueue(path, self._job_options(overrides), priority=priority)
+
+    # Przesłany plik zapisywany jest porcjami do osobnego katalogu; wyniki powstają obok niego.
+    def submit_upload(self, stream, length, filename, overrides=None, priority=0):
+        filename = _safe_filename(filename or "")
+        if os.path.splitext(filename)[1].lower() not in SUPPORTED_EXTENSIONS:
+            raise ServiceError(415, f"Nieobsługiwany typ pliku: {filename} (dozwolone: {', '.join(SUPPORTED_EXTENSIONS)}).")
+        if length <= 0:
+            raise ServiceError(411, "Brak treści żądania (Content-Length).")
+        if length > self.max_upload_bytes:
+            raise ServiceError(413, f"Plik jest za duży ({length / (1024 * 1024):.0f} MB).")
+        options = self._job_options(overrides)
+        job_dir = os.path.join(self.upload_dir, uuid.uuid4().hex)
+        os.makedirs(job_dir)
+        path = os.path.join(job_dir, filename)
+        remaining = length
+        with open(path, 'wb') as f:
+            while remaining > 0:
+                chunk = stream.read(min(UPLOAD_CHUNK_BYTES, remaining))
+                if not chunk:
+                    raise ServiceError(400, "Przesyłanie pliku zostało przerwane.")
+                f.write(chunk)
+                remaining -= len(chunk)
+        logger.info(f"Przesłano plik {filename} ({length / (1024 * 1024):.1f} MB).")
+        return self.queue.enqueue(path, options, priority=priority)
+
+    def job_status(self, job_id):
+        job = self.queue.get(job_id)
+        if job is None:
+            raise ServiceError(404, f"Nie ma zlecenia {job_id}.")
+        with self._lock:
+            progress = dict(self._progress.get(job_id, {}))
+        if progress.get("total_seconds"):
+            progress["fraction"] = round(min(1.0, progress.get("seconds", 0.0) / progress["total_seconds"]), 4)
+        elif job["state"] == "done":
+            progress["fraction"] = 1.0
+        options = options_from_json(job["options"])
+        return {
+            "id": job["id"],
+            "file": job["path"],
+            "state": job["state"],
+            "priority": job["priority"],
+            "attempts": job["attempts"],
+            "error": job["error"],
+            "model_size": options.model_size,
+            "created": job["created"],
+            "updated": job["updated"],
+            "progress": progress,
+            "results": {fmt: f"/jobs/{job['id']}/result/{fmt}" for fmt in job["outputs"]},
+        }
+
+    def list_jobs(self, limit=100):
+        return [{"id": job["id"], "file": job["path"], "state": job["state"], "priority": job["priority"]}
+                for job in self.queue.jobs(limit=limit)]
+
+    def result_path(self, job_id, fmt):
+        job = self.queue.get(job_id)
+        if job is None:
+            raise ServiceError(404, f"Nie ma zlecenia {job_id}.")
+        if job["state"] != "done":
+            raise ServiceError(409, f"Zlecenie {job_id} nie jest zakończone (stan: {job['state']}).")
+        path = job["outputs"].get(fmt)
+        if path is None or not os.path.exists(path):
+            raise ServiceError(404, f"Brak wyniku {fmt} dla zlecenia {job_id}.")
+        return path
+
+    def remove_job(self, job_id):
+        job = self.queue.get(job_id)
+        if job is None:
+            raise ServiceError(404, f"Nie ma zlecenia {job_id}.")
+        if not self.queue.remove(job_id):
+            raise ServiceError(409, f"Zlecenie {job_id} jest właśnie przetwarzane.")
+        return {"id": job_id, "removed": True}
+
+    def health(self):
+        slots = []
+        for index, runner in enumerate(self.runners):
+            job = runner.current_job
+            slots.append({"slot": index + 1, "job": job["id"] if job else None,
+                          "models": [list(key) for key in runner.engine.model_pool._models]})
+        return {"status": "ok", "uptime_seconds": round(time.time() - self._started, 1) if self._started else None,
+                "queue": self.queue.counts(), "slots": slots}
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    server_version = "TranskrypcjaSerwis/1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.debug(f"HTTP {self.address_string()} {format % args}")
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, path, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{urllib.parse.quote(os.path.basename(path))}")
+        self.end_headers()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+    def _route(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        params = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            if method == "GET" and parts == ["health"]:
+                return self._send_json(200, self.service.health())
+            if parts[:1] != ["jobs"] or len(parts) > 4:
+                raise ServiceError(404, f"Nieznany adres: {url.path}")
+            if len(parts) == 1:
+                if method == "GET":
+                    return self._send_json(200, {"jobs": self.service.list_jobs(int(params.get("limit", 100)))})
+                if method == "POST":
+                    job_id = self._submit(params)
+                    return self._send_json(202, {"id": job_id, "status": f"/jobs/{job_id}"})
+                raise ServiceError(405, "Dozwolone metody: GET, POST.")
+            try:
+                job_id = int(parts[1])
+            except ValueError:
+                raise ServiceError(404, f"Nieprawidłowy identyfikator zlecenia: {parts[1]}")
+            if len(parts) == 2:
+                if method == "GET":
+                    return self._send_json(200, self.service.job_status(job_id))
+                if method == "DELETE":
+                    return self._send_json(200, self.service.remove_job(job_id))
+                raise ServiceError(405, "Dozwolone metody: GET, DELETE.")
+            if method == "GET" and len(parts) == 4 and parts[2] == "result":
+                fmt = parts[3]
+                return self._send_file(self.service.result_path(job_id, fmt),
+                                       CONTENT_TYPES.get(fmt, "application/octet-stream"))
+            raise ServiceError(404, f"Nieznany adres: {url.path}")
+        except ServiceError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            logger.error(f"Błąd obsługi żądania {method} {self.path}: {str(e)}")
+            self._send_json(500, {"error": str(e)})
+
+    # JSON {"path", "options", "priority"} – plik na dysku; każda inna treść – przesyłany plik (?filename=...).
+    def _submit(self, params):
+        length = int(self.headers.get("Content-Length") or 0)
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        priority = int(params.pop("priority", 0))
+        if content_type == "application/json":
+            try:
+                data = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                raise ServiceError(400, "Nieprawidłowy JSON.")
+            return self.service.submit_path(data.get("path"), data.get("options"), int(data.get("priority", priority)))
+        filename = params.pop("filename", None) or self.headers.get("X-Filename")
+        if not filename:
+            raise ServiceError(400, "Podaj nazwę przesyłanego pliku (?filename=... lub nagłówek X-Filename).")
+        return self.service.submit_upload(self.rfile, length, filename, params, priority)
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+# Prosty klient (tylko biblioteka standardowa) – dla innych narzędzi i testów z tego samego komputera.
+class ServiceClient:
+    def __init__(self, base_url=f"http://127.0.0.1:{DEFAULT_PORT}", timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, data=None, headers=None):
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                if response.headers.get_content_type() == "application/json":
+                    return json.loads(body)
+                return body
+        except urllib.error.HTTPError as e:
+            message = e.read().decode("utf-8", errors="replace")
+            try:
+                message = json.loads(message)["error"]
+            except (ValueError, KeyError):
+                pass
+            raise Exception(f"Usługa zwróciła błąd {e.code}: {message}")
+
+    def submit_path(self, path, options=None, priority=0):
+        data = json.dumps({"path": path, "options": options or {}, "priority": priority}).encode("utf-8")
+        return self._request("POST", "/jobs", data, {"Content-Type": "application/json"})["id"]
+
+    def upload(self, path, options=None, priority=0):
+        params = {key: ",".join(value) if isinstance(value, list) else str(value) for key, value in (options or {}).items()}
+        params.update(filename=os.path.basename(path), priority=priority)
+        # Plik jest wysyłany strumieniowo (http.client czyta obiekt pliku blokami) – nagranie nie trafia w całości do pamięci.
+        with open(path, 'rb') as f:
+            return self._request("POST", f"/jobs?{urllib.parse.urlencode(params)}", f,
+                                 {"Content-Type": "application/octet-stream",
+                                  "Content-Length": str(os.path.getsize(path))})["id"]
+
+    def status(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    # Czeka na zakończenie zlecenia (done lub failed) i zwraca jego stan.
+    def wait(self, job_id, poll_seconds=2.0, timeout=None):
+        start = time.time()
+        while True:
+            status = self.status(job_id)
+            if status["state"] in ("done", "failed"):
+                return status
+            if timeout is not None and time.time() - start > timeout:
+                raise Exception(f"Zlecenie {job_id} nie zakończyło się w {timeout} s.")
+            time.sleep(poll_seconds)
+
+    def result(self, job_id, fmt="txt"):
+        return self._request("GET", f"/jobs/{job_id}/result/{fmt}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m service", description="Lokalna usługa HTTP transkrypcji.")
+    parser.add_argument("--host", default="127.0.0.1", help="Adres nasłuchu (domyślnie tylko lokalnie).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--slots", type=int, default=1, help="Liczba równoczesnych transkrypcji (każda z własnym modelem).")
+    parser.add_argument("--model", choices=MODEL_SIZES, default="large", help="Domyślny rozmiar modelu zleceń.")
+    parser.add_argument("--hardware", choices=HARDWARE_MODES, default=None,
+                        help="Tryb przetwarzania (domyślnie gpu_cpu, gdy CUDA jest dostępna, w przeciwnym razie cpu).")
+    parser.add_argument("--quantize", action="store_true", help="W trybie cpu użyj modelu int8.")
+    parser.add_argument("--cpu-threads", type=int, default=None, help="Liczba wątków torch na stanowisko w trybie cpu.")
+    parser.add_argument("--formats", nargs="+", choices=EXPORT_FORMATS, default=list(DEFAULT_EXPORT_FORMATS))
+    parser.add_argument("--no-diarization", action="store_true", help="Domyślnie bez rozpoznawania mówców.")
+    parser.add_argument("--queue-db", default=DEFAULT_SERVICE_QUEUE, help="Plik kolejki zleceń usługi.")
+    parser.add_argument("--upload-dir", default=DEFAULT_UPLOAD_DIR, help="Katalog przesłanych plików i ich wyników.")
+    parser.add_argument("--allowed-dir", action="append", default=[], metavar="KATALOG",
+                        help="Zezwalaj tylko na pliki z tego katalogu (można podać wiele razy).")
+    parser.add_argument("--max-upload-mb", type=int, default=DEFAULT_MAX_UPLOAD_MB)
+    parser.add_argument("--no-preload", action="store_true", help="Nie ładuj modeli przy starcie usługi.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from engine import default_hardware_mode
+    options = TranscriptionOptions(model_size=args.model, hardware_mode=args.hardware or default_hardware_mode(),
+                                   quantize=args.quantize, cpu_threads=args.cpu_threads, export_formats=list(args.formats),
+                                   enable_speaker_diarization=not args.no_diarization)
+    service = TranscriptionService(options, slots=args.slots, queue_path=args.queue_db, upload_dir=args.upload_dir,
+                                   allowed_dirs=args.allowed_dir, max_upload_mb=args.max_upload_mb)
+    service.start(preload=not args.no_preload)
+    server = make_server(service, args.host, args.port)
+    logger.info(f"Usługa transkrypcji nasłuchuje na http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Zatrzymywanie usługi – bieżące zlecenia wrócą do kolejki z punktem kontrolnym...")
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+# Trwała galeria mówców – te same osoby mają te same etykiety w kolejnych plikach, partiach i tygodniach.
+#
+# Diaryzacja (diarization.py) klastruje każde nagranie osobno, więc etykiety "Osoba1, Osoba2, ..." zaczynają
+# się od nowa w każdym pliku. Galeria przechowuje centroid osadzeń głosu (resemblyzer VoiceEncoder) każdego
+# znanego mówcy. Centroid każdego klastra nowego pliku porównywany jest (podobieństwo kosinusowe) z galerią:
+#   • podobieństwo ≥ progu – klaster dostaje etykietę znanego mówcy, a jego centroid jest uaktualniany,
+#   • poniżej progu – klaster trafia do galerii jako nowy mówca ("Mówca<id>", nazwę można nadać później).
+# Indeks wektorowy (VectorIndex) trzyma znormalizowane centroidy w jednej macierzy w pamięci – wyszukanie
+# to jedno mnożenie macierzy, więc koszt rośnie liniowo i pozostaje mały nawet dla tysięcy mówców;
+# indeks jest wczytywany ponownie tylko wtedy, gdy galerię zmienił inny proces.
+#
+#   python -m cli --speakers                       (lista mówców w galerii)
+#   python -m cli --speaker-name 7 "Jan Kowalski"  (nadanie nazwy)
+
+import os
+import time
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger("TranscriptionApp")
+
+DEFAULT_GALLERY_PATH = os.path.join(os.path.expanduser("~"), "Documents", "TranscriptionApp", "mowcy.sqlite")
+# Minimalne podobieństwo kosinusowe centroidu klastra i mówcy z galerii (osadzenia resemblyzer:
+# ta sama osoba zwykle > 0,8, różne osoby zwykle < 0,75).
+DEFAULT_MATCH_THRESHOLD = 0.8
+# Liczba okien osadzeń na sekundę mowy (diarization.PARTIALS_RATE).
+WINDOWS_PER_SECOND = 16
+# Klastry z mniejszą liczbą okien (48 okien ≈ 3 s mowy) są dopasowywane, ale nie dodawane do galerii.
+MIN_NEW_SPEAKER_WINDOWS = 48
+# Górna waga dotychczasowego centroidu przy uaktualnianiu (w oknach) – głos z nowych nagrań nadal ma wpływ.
+MAX_CENTROID_WEIGHT = 20000
+
+# Znormalizowane wektory w jednej macierzy; search zwraca najbliższego sąsiada (iloczyn skalarny = kosinus).
+class VectorIndex:
+    def __init__(self, vectors=None, dim=256):
+        self.vectors = np.zeros((0, dim), dtype=np.float32) if vectors is None else _normalize(vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def add(self, vector):
+        self.vectors = np.vstack([self.vectors, _normalize(vector)[None, :]])
+        return len(self.vectors) - 1
+
+    def replace(self, position, vector):
+        self.vectors[position] = _normalize(vector)
+
+    # Dla każdego zapytania: (podobieństwo, pozycja) najbliższego wektora; pozycja -1 przy pustym indeksie.
+    def search(self, queries):
+        queries = _normalize(np.atleast_2d(queries))
+        if len(self.vectors) == 0:
+            return np.full(len(queries), -1.0, dtype=np.float32), np.full(len(queries), -1, dtype=np.int64)
+        similarities = queries @ self.vectors.T
+        best = similarities.argmax(axis=1)
+        return similarities[np.arange(len(queries)), best], best
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+# Suma osadzeń i liczba okien każdego klastra. Zwraca (etykiety klastrów, sumy, liczności).
+def cluster_sums(embeddings, labels):
+    labels = np.asarray(labels)
+    cluster_labels = np.unique(labels)
+    positions = np.searchsorted(cluster_labels, labels)
+    sums = np.zeros((len(cluster_labels), embeddings.shape[1]), dtype=np.float64)
+    np.add.at(sums, positions, embeddings)
+    counts = np.bincount(positions, minlength=len(cluster_labels))
+    return cluster_labels, sums, counts
+
+class SpeakerGallery:
+    def __init__(self, path=DEFAULT_GALLERY_PATH, threshold=DEFAULT_MATCH_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._version = None
+        self._ids = []
+        self._names = []
+        self._counts = []
+        self._index = VectorIndex()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS speakers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, "
+                       "centroid BLOB NOT NULL, windows INTEGER, files INTEGER DEFAULT 0, created REAL, updated REAL)")
+            # Numer wersji galerii – zmieniany przy każdym zapisie, aby inne procesy odświeżyły indeks.
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        finally:
+            db.close()
+
+    def _refresh(self, db):
+        version = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        if version == self._version:
+            return
+        rows = db.execute("SELECT id, name, centroid, windows FROM speakers ORDER BY id").fetchall()
+        self._ids = [row["id"] for row in rows]
+        self._names = [row["name"] for row in rows]
+        self._counts = [row["windows"] for row in rows]
+        self._index = VectorIndex(np.array([np.frombuffer(row["centroid"], dtype=np.float32) for row in rows])
+                                  if rows else None)
+        self._version = version
+
+    def _bump_version(self, db):
+        db.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        return db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    # Dopasowuje klastry jednego pliku do galerii i ją uaktualnia (w jednej transakcji, więc kilka procesów
+    # może korzystać z galerii naraz). embeddings – osadzenia okien, labels – etykiety klastrów okien.
+    # Zwraca słownik {etykieta klastra: nazwa mówcy}; klastry zbyt krótkie i nieznane nie mają wpisu.
+    def match(self, embeddings, labels):
+        cluster_labels, sums, counts = cluster_sums(embeddings, labels)
+        names = {}
+        now = time.time()
+        with self._connect() as db:
+            self._refresh(db)
+            similarities, positions = self._index.search(sums)
+            matched = set()
+            for label, total, count, similarity, position in zip(cluster_labels, sums, counts, similarities, positions):
+                if position >= 0 and similarity >= self.threshold:
+                    weight = min(self._counts[position], MAX_CENTROID_WEIGHT)
+                    centroid = self._index.vectors[position] * weight + _normalize(total) * count
+                    self._index.replace(position, centroid)
+                    self._counts[position] += int(count)
+                    db.execute("UPDATE speakers SET centroid = ?, windows = ?, files = files + ?, updated = ? WHERE id = ?",
+                               (self._index.vectors[position].tobytes(), self._counts[position],
+                                0 if position in matched else 1, now, self._ids[position]))
+                    matched.add(position)
+                    logger.info(f"Galeria mówców: klaster {label + 1} → {self._display_name(position)} "
+                                f"(podobieństwo {similarity:.2f}).")
+                elif count >= MIN_NEW_SPEAKER_WINDOWS:
+                    vector = _normalize(total)
+                    speaker_id = db.execute("INSERT INTO speakers (centroid, windows, files, created, updated) "
+                                            "VALUES (?, ?, 1, ?, ?)", (vector.tobytes(), int(count), now, now)).lastrowid
+                    position = self._index.add(vector)
+                    self._ids.append(speaker_id)
+                    self._names.append(None)
+                    self._counts.append(int(count))
+                    matched.add(position)
+                    logger.info(f"Galeria mówców: nowy mówca {self._display_name(position)} (klaster {label + 1}, "
+                                f"{count} okien, najbliższe podobieństwo {max(similarity, 0.0):.2f}).")
+                else:
+                    continue
+                names[int(label)] = self._display_name(position)
+            if matched:
+                self._version = self._bump_version(db)
+        return names
+
+    def _display_name(self, position):
+        return self._names[position] or f"Mówca{self._ids[position]}"
+
+    def speakers(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT id, name, windows, files, created, updated FROM speakers ORDER BY id").fetchall()
+        return [dict(row) for row in rows]
+
+    def rename(self, speaker_id, name):
+        with self._connect() as db:
+            changed = db.execute("UPDATE speakers SET name = ?, updated = ? WHERE id = ?",
+                                 (name or None, time.time(), speaker_id)).rowcount
+            if changed:
+                self._bump_version(db)
+        return bool(changed)
+
+    # Łączy mówcę source_id z target_id (np. ta sama osoba dodana dwukrotnie) – centroid ważony liczbą okien.
+    def merge(self, target_id, source_id):
+        with self._connect() as db:
+            rows = {row["id"]: row for row in db.execute("SELECT * FROM speakers WHERE id IN (?, ?)", (target_id, source_id))}
+            if target_id == source_id or len(rows) != 2:
+                return False
+            target, source = rows[target_id], rows[source_id]
+            centroid = (np.frombuffer(target["centroid"], dtype=np.float32) * target["windows"] +
+                        np.frombuffer(source["centroid"], dtype=np.float32) * source["windows"])
+            db.execute("UPDATE speakers SET centroid = ?, windows = ?, files = ?, name = COALESCE(name, ?), updated = ? "
+                       "WHERE id = ?", (_normalize(centroid).tobytes(), target["windows"] + source["windows"],
+                                        target["files"] + source["files"], source["name"], time.time(), target_id))
+            db.execute("DELETE FROM speakers WHERE id = ?", (source_id,))
+            self._bump_version(db)
+        return True
+
+    def remove(self, speaker_id):
+        with self._connect() as db:
+            removed = db.execute("DELETE FROM speakers WHERE id = ?", (speaker_id,)).rowcount
+            if removed:
+                self._bump_version(db)
+        return bool(removed)
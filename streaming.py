@@ -0,0 +1,154 @@
+# Transkrypcja strumieniowa – dla wielogodzinnych nagrań (sesje sądowe, rady gmin).
+#
+# Audio czytane jest z ffmpeg w oknach o stałej długości, a każde okno trafia osobno do Whispera.
+# Ostatni (potencjalnie ucięty) segment okna nie jest zatwierdzany – jego audio przechodzi do
+# następnego okna, a przesunięcie czasowe i końcówka tekstu (initial_prompt) są przenoszone dalej.
+# Segmenty dopisywane są do TXT/SRT/VTT/CSV/JSON na bieżąco, więc awaria w 7. godzinie
+# nie kasuje wcześniejszych wyników, a zużycie pamięci nie zależy od długości nagrania.
+# Z diaryzacją okna czytane są z pliku PCM (audio.PcmFile), z którego równolegle korzysta enkoder mówców;
+# segmenty czekają na wynik diaryzacji w punkcie kontrolnym i są zapisywane już z mówcami.
+
+import logging
+
+import numpy as np
+
+from audio import SAMPLE_RATE, stream_ffmpeg_windows
+from vad import transcribe_with_vad
+from checkpoint import TranscriptionCancelled, cancellable, check_cancelled
+from export import SegmentExporter
+
+logger = logging.getLogger("TranscriptionApp")
+
+# Ile znaków zatwierdzonego tekstu przekazywać jako initial_prompt do kolejnego okna.
+PROMPT_CHARS = 200
+
+# Transkrypcja kolejnych okien z przeniesieniem kontekstu. Generator zwraca po każdym oknie
+# (zatwierdzone segmenty, przesunięcie, prompt, język) – przesunięcie wskazuje początek audio,
+# które nie zostało jeszcze zatwierdzone (od niego wznawia się transkrypcję).
+# Ostatni segment okna może być ucięty w pół słowa – jego audio przechodzi do następnego okna.
+# repetition (repetition.RepetitionFilter) naprawia pętle powtórzeń zaraz po każdym oknie.
+def transcribe_windows(model, windows, transcribe_options, offset=0.0, prompt=None, first_id=0,
+                       vad_aggressiveness=None, sr=SAMPLE_RATE, repetition=None):
+    carry = np.zeros(0, dtype=np.float32)
+    language = transcribe_options.get("language")
+    segment_id = first_id
+    window = next(windows, None)
+    while window is not None:
+        next_window = next(windows, None)
+        is_last = next_window is None
+        buffer = np.concatenate([carry, window]) if len(carry) else window
+        options = dict(transcribe_options)
+        if language is not None:
+            options["language"] = language
+        if vad_aggressiveness is not None:
+            result, _ = transcribe_with_vad(model, buffer, sr=sr, aggressiveness=vad_aggressiveness,
+                                            initial_prompt=prompt, **options)
+        else:
+            result = model.transcribe(buffer, initial_prompt=prompt, **options)
+        language = language or result.get("language")
+        segments = result.get("segments", [])
+        if repetition is not None:
+            segments = repetition.repair(buffer, segments, language=language)
+        cut = len(buffer) / sr
+        if not is_last and len(segments) > 1 and segments[-1]["start"] > 0:
+            cut = segments[-1]["start"]
+            segments = segments[:-1]
+        if repetition is not None:
+            segments = repetition.drop_duplicates(segments)
+        committed = []
+        for seg in segments:
+            seg = dict(seg)
+            seg["id"] = segment_id
+            seg["seek"] = seg.get("seek", 0) + int(round(offset * 100))
+            seg["start"] = round(seg["start"] + offset, 3)
+            seg["end"] = round(seg["end"] + offset, 3)
+            committed.append(seg)
+            segment_id += 1
+        if committed:
+            prompt = " ".join(s["text"].strip() for s in committed)[-PROMPT_CHARS:]
+        carry = buffer[int(cut * sr):]
+        offset += cut
+        logger.info(f"Okno zakończone na {offset:.1f} s, zatwierdzono {len(committed)} segmentów.")
+        yield committed, offset, prompt, language
+        window = next_window
+
+# Wynik zakończonej diaryzacji; błąd jest logowany, a segmenty zapisywane są wtedy bez mówców.
+def _diarization_result(future):
+    try:
+        return future.result()
+    except TranscriptionCancelled:
+        raise
+    except Exception as e:
+        logger.error(f"Błąd podczas diaryzacji: {str(e)}")
+        return None
+
+# Transkrybuje plik okno po oknie i zapisuje segmenty na bieżąco. Zwraca (ścieżki wyników, liczba segmentów).
+# on_window(przetworzone_sekundy) wywoływany jest po każdym oknie (np. do raportowania postępu).
+# vad_aggressiveness (0–3) włącza pomijanie ciszy w każdym oknie (vad.py); None – bez VAD.
+# checkpoint (checkpoint.Checkpoint) zapisuje stan po każdym oknie; state to stan wczytany do wznowienia.
+# cancel_event przerywa pracę po bieżącym fragmencie – pliki zostają w stanie gotowym do wznowienia.
+# json_compact/json_tokens jak w export.SegmentExporter.
+# repetition (repetition.RepetitionFilter) – wykrywanie pętli powtórzeń jak w transcribe_windows.
+# on_segments(segmenty) wywoływany jest po każdym zapisie porcji segmentów (np. indeks wyszukiwania).
+# audio_source (audio.PcmFile) zastępuje dekodowanie ffmpeg; diarization_future (concurrent.futures.Future
+# z diarization.DiarizationResult) – segmenty są wstrzymywane do jego zakończenia i zapisywane z mówcami.
+def transcribe_streaming(model, file_path, output_base, export_formats, transcribe_options,
+                         window_seconds=600, on_window=None, vad_aggressiveness=None,
+                         checkpoint=None, state=None, cancel_event=None, json_compact=False, json_tokens=True,
+                         audio_source=None, diarization_future=None, repetition=None, on_segments=None):
+    sr = SAMPLE_RATE
+    state = state or {}
+    offset = state.get("offset", 0.0)
+    segment_count = state.get("segment_count", 0)
+    pending = list(state.get("pending_segments", []))
+    language = state.get("language") or transcribe_options.get("language")
+    exporter = SegmentExporter(output_base, export_formats, json_compact=json_compact, json_tokens=json_tokens,
+                               resume_sizes=state.get("output_sizes"), segment_count=segment_count - len(pending))
+    options = dict(transcribe_options)
+    if language is not None:
+        options["language"] = language
+
+    # Zapis wstrzymanych segmentów – z mówcami, gdy diaryzacja już się zakończyła (wait=True czeka na nią).
+    def flush(wait=False):
+        nonlocal pending
+        if not pending or (diarization_future is not None and not wait and not diarization_future.done()):
+            return
+        segments = pending
+        if diarization_future is not None:
+            if not diarization_future.done():
+                logger.info(f"Oczekiwanie na diaryzację ({len(pending)} segmentów wstrzymanych)...")
+            diarization = _diarization_result(diarization_future)
+            if diarization is not None:
+                from diarization import assign_speakers
+                segments = assign_speakers(pending, diarization)
+        exporter.append(segments)
+        if on_segments is not None:
+            on_segments(segments)
+        pending = []
+
+    complete = False
+    try:
+        if audio_source is not None:
+            windows = audio_source.blocks(window_seconds, start_seconds=offset)
+        else:
+            windows = stream_ffmpeg_windows(file_path, window_seconds, sr=sr, start_seconds=offset)
+        with cancellable(model, cancel_event):
+            for committed, offset, prompt, language in transcribe_windows(
+                    model, windows, options, offset=offset, prompt=state.get("prompt"),
+                    first_id=segment_count, vad_aggressiveness=vad_aggressiveness, sr=sr, repetition=repetition):
+                pending.extend(committed)
+                segment_count += len(committed)
+                flush()
+                if checkpoint is not None:
+                    checkpoint.save({"offset": offset, "prompt": prompt, "language": language,
+                                     "segment_count": segment_count, "pending_segments": pending,
+                                     "output_sizes": exporter.sizes()})
+                if on_window is not None:
+                    on_window(offset)
+                check_cancelled(cancel_event)
+        flush(wait=True)
+        check_cancelled(cancel_event)
+        complete = True
+    finally:
+        exporter.close(language, complete=complete)
+    return exporter.outputs, segment_count
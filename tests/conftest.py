@@ -0,0 +1,6 @@
+# Moduły programu leżą w katalogu głównym repozytorium (python main.py, python -m cli).
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
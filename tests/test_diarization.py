@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+for module in ("torch", "resemblyzer", "spectralcluster", "webrtcvad"):
+    pytest.importorskip(module)
+
+import diarization
+from diarization import DiarizationResult, assign_speakers, cluster_long, group_windows, segment_speakers
+
+def make_result(windows, labels, speaker_names=None):
+    starts = np.array([start for start, end in windows], dtype=np.float64)
+    ends = np.array([end for start, end in windows], dtype=np.float64)
+    return DiarizationResult(starts, ends, None, np.array(labels), 0.0, 0.0, speaker_names=speaker_names)
+
+def test_segment_speakers_votes_by_overlap():
+    result = make_result([(0.0, 1.0), (1.0, 2.0), (2.0, 3.0), (3.0, 4.0)], [0, 1, 1, 0])
+    segments = [{"start": 0.0, "end": 0.9}, {"start": 0.5, "end": 2.9}, {"start": 2.8, "end": 4.0}]
+    assert segment_speakers(segments, result) == [0, 1, 0]
+
+def test_segment_without_windows_gets_nearest_window():
+    result = make_result([(0.0, 1.0), (5.0, 6.0)], [0, 1])
+    segments = [{"start": 1.5, "end": 2.0}, {"start": 4.0, "end": 4.5}, {"start": 8.0, "end": 9.0}]
+    assert segment_speakers(segments, result) == [0, 1, 1]
+
+def test_assign_speakers_uses_gallery_names():
+    result = make_result([(0.0, 1.0), (1.0, 2.0)], [0, 1], speaker_names={1: "Jan Kowalski"})
+    segments = [{"start": 0.0, "end": 1.0, "text": " Dzień dobry"}, {"start": 1.0, "end": 2.0, "text": "Witam"}]
+    assert [seg["text"] for seg in assign_speakers(segments, result)] == ["Osoba1: Dzień dobry", "Jan Kowalski: Witam"]
+
+def unit(vector):
+    return np.asarray(vector, dtype=np.float64) / np.linalg.norm(vector)
+
+def two_speakers(blocks, block_windows):
+    a, b = unit([1.0, 0.1, 0.0]), unit([0.0, 0.1, 1.0])
+    return np.vstack([np.tile(a if i % 2 == 0 else b, (block_windows, 1)) for i in range(blocks)])
+
+def test_group_windows_splits_on_speaker_change_and_size():
+    embeddings = two_speakers(2, 5)
+    assert group_windows(embeddings, group_size=3).tolist() == [0, 0, 0, 1, 1, 2, 2, 2, 3, 3]
+
+# Zastępuje SpectralClusterer: etykieta z pierwszej współrzędnej, zapamiętuje, co dostał do klastrowania.
+class FakeClusterer:
+    calls = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    def predict(self, embeddings):
+        FakeClusterer.calls.append(len(embeddings))
+        return (np.asarray(embeddings)[:, 0] < 0.5).astype(int)
+
+@pytest.fixture
+def fake_clusterer(monkeypatch):
+    FakeClusterer.calls = []
+    monkeypatch.setattr(diarization, "SpectralClusterer", FakeClusterer)
+    return FakeClusterer
+
+def test_cluster_long_clusters_group_centroids(fake_clusterer):
+    # Sześć bloków po 32 okna – po dwie grupy (MIN_GROUP_WINDOWS = 16) na blok.
+    embeddings = two_speakers(6, 32)
+    labels = cluster_long(embeddings, max_centroids=100)
+    assert fake_clusterer.calls == [12]
+    assert labels.tolist() == ([0] * 32 + [1] * 32) * 3
+
+def test_cluster_long_merges_groups_above_limit(fake_clusterer):
+    embeddings = two_speakers(40, 16)
+    labels = cluster_long(embeddings, max_centroids=10)
+    assert 2 < fake_clusterer.calls[0] <= 10
+    assert len(labels) == len(embeddings)
+
+def test_cluster_long_with_few_groups_clusters_windows(fake_clusterer):
+    # Dwie grupy – za mało centroidów, więc klastrowane są bezpośrednio okna.
+    embeddings = two_speakers(2, 10)
+    labels = cluster_long(embeddings)
+    assert fake_clusterer.calls == [20]
+    assert labels.tolist() == [0] * 10 + [1] * 10
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+pytest.importorskip("webrtcvad")
+pytest.importorskip("msgpack")
+
+import job_queue
+from checkpoint import TranscriptionCancelled
+from engine import TranscriptionOptions
+from job_queue import JobQueue, QueueRunner, options_from_json, options_to_json
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "kolejka.sqlite"), max_attempts=2)
+
+# Silnik zwracający kolejne wyniki (słownik lub wyjątek) i zapamiętujący ustawienia wywołań.
+class FakeEngine:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def run_file(self, path, options):
+        self.calls.append(options)
+        result = self.results.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+def test_options_round_trip_ignores_unknown_fields():
+    options = TranscriptionOptions(model_size="small", export_formats=["srt"], vad=True)
+    assert options_from_json(options_to_json(options)) == options
+    assert options_from_json('{"model_size": "tiny", "removed_option": 1}').model_size == "tiny"
+
+def test_enqueue_returns_existing_pending_job(queue):
+    first = queue.enqueue("/nagrania/a.mp3", priority=1)
+    assert queue.enqueue("/nagrania/a.mp3", priority=5) == first
+    assert queue.get(first)["priority"] == 5
+    assert queue.counts()["pending"] == 1
+
+def test_claim_by_priority_then_age(queue):
+    low = queue.enqueue("/nagrania/a.mp3")
+    high = queue.enqueue("/nagrania/b.mp3", priority=3)
+    second_low = queue.enqueue("/nagrania/c.mp3")
+    assert [queue.claim()["id"] for _ in range(3)] == [high, low, second_low]
+    assert queue.claim() is None
+    assert queue.counts()["running"] == 3
+
+def test_claimed_job_is_not_claimed_twice(tmp_path):
+    path = str(tmp_path / "kolejka.sqlite")
+    JobQueue(path).enqueue("/nagrania/a.mp3")
+    job = JobQueue(path).claim()
+    assert job["state"] == "running" and job["attempts"] == 1
+    assert JobQueue(path).claim() is None
+
+def test_fail_schedules_retry_with_delay(queue):
+    job_id = queue.enqueue("/nagrania/a.mp3")
+    queue.claim()
+    assert queue.fail(job_id, "błąd dekodowania") == "pending"
+    job = queue.get(job_id)
+    assert job["not_before"] >= time.time() + job_queue.RETRY_DELAY_SECONDS - 5
+    assert job["resumable"] == 1
+    assert queue.claim() is None
+
+def test_job_fails_after_max_attempts(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "RETRY_DELAY_SECONDS", 0)
+    job_id = queue.enqueue("/nagrania/a.mp3")
+    queue.claim()
+    assert queue.fail(job_id, "błąd") == "pending"
+    queue.claim()
+    assert queue.fail(job_id, "błąd") == "failed"
+    assert queue.get(job_id)["error"] == "błąd"
+
+def test_release_does_not_count_attempt(queue):
+    job_id = queue.enqueue("/nagrania/a.mp3")
+    queue.claim()
+    queue.release(job_id)
+    job = queue.get(job_id)
+    assert (job["state"], job["attempts"], job["resumable"]) == ("pending", 0, 1)
+
+def test_recover_and_retry_resumable_state(queue):
+    job_id = queue.enqueue("/nagrania/a.mp3")
+    queue.claim()
+    assert queue.recover() == 1
+    assert queue.get(job_id)["resumable"] == 1
+    # Ponowienie na żądanie zaczyna od zera – bez punktu kontrolnego.
+    assert queue.retry(job_id)
+    job = queue.get(job_id)
+    assert (job["state"], job["attempts"], job["resumable"]) == ("pending", 0, 0)
+
+def test_runner_resumes_interrupted_job_with_checkpoints(queue):
+    engine = FakeEngine(TranscriptionCancelled(), {"txt": "/wyniki/a.txt"})
+    runner = QueueRunner(engine, queue)
+    job_id = queue.enqueue("/nagrania/a.mp3", TranscriptionOptions(model_size="small"))
+    assert runner.run_once() and runner.run_once()
+    first, second = engine.calls
+    assert (first.resume, first.checkpoints) == (False, False)
+    assert (second.resume, second.checkpoints) == (True, True)
+    assert second.model_size == "small"
+    job = queue.get(job_id)
+    assert (job["state"], job["attempts"], job["outputs"]) == ("done", 1, {"txt": "/wyniki/a.txt"})
+
+def test_runner_reports_failure(queue):
+    states = []
+    runner = QueueRunner(FakeEngine(Exception("brak pliku")), queue, job_callback=lambda job, state: states.append(state))
+    job_id = queue.enqueue("/nagrania/a.mp3")
+    runner.run_once()
+    assert states == ["pending"]
+    assert queue.get(job_id)["error"] == "brak pliku"
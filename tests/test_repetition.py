@@ -0,0 +1,74 @@
+import numpy as np
+
+from repetition import RepetitionFilter, find_suspect_spans, is_hallucination
+
+SR = 16000
+
+def seg(start, end, text, **extra):
+    return dict({"start": start, "end": end, "text": text}, **extra)
+
+# Model zwracający przygotowane segmenty (czasy względem fragmentu) i zapamiętujący wywołania.
+class FakeModel:
+    def __init__(self, segments):
+        self.segments = segments
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append((len(audio), options))
+        return {"segments": [dict(s) for s in self.segments]}
+
+def loop_segments():
+    return [seg(0.0, 2.0, "Dzień dobry."),
+            seg(2.0, 4.0, "Dziękuję za uwagę."),
+            seg(4.0, 6.0, "Dziękuję za uwagę!"),
+            seg(6.0, 8.0, "dziękuję za uwagę"),
+            seg(8.0, 10.0, "Do widzenia.")]
+
+def test_find_suspect_spans_detects_loops_and_hallucinations():
+    segments = loop_segments() + [seg(10.0, 12.0, "la la la", compression_ratio=3.1),
+                                  seg(12.0, 13.0, "...", no_speech_prob=0.9, avg_logprob=-1.5)]
+    # Stykające się fragmenty są łączone.
+    assert find_suspect_spans(segments) == [(2.0, 8.0), (10.0, 13.0)]
+
+def test_two_similar_segments_are_not_a_loop():
+    assert find_suspect_spans([seg(0.0, 1.0, "Tak."), seg(1.0, 2.0, "Tak.")]) == []
+
+def test_is_hallucination_needs_low_confidence_on_silence():
+    assert not is_hallucination(seg(0.0, 1.0, "Tak", no_speech_prob=0.9, avg_logprob=-0.2))
+    assert is_hallucination(seg(0.0, 1.0, "Tak", no_speech_prob=0.9, avg_logprob=-1.2))
+
+def test_repair_redecodes_only_the_loop():
+    model = FakeModel([seg(0.0, 3.0, "Dziękuję za uwagę."), seg(3.0, 6.0, "Pytania?")])
+    repetition = RepetitionFilter(model, {"language": "pl", "initial_prompt": "Transkrypcja"}, sr=SR)
+    audio = np.zeros(10 * SR, dtype=np.float32)
+    repaired = repetition.repair(audio, loop_segments(), language="pl")
+    assert [(s["start"], s["end"], s["text"]) for s in repaired] == [
+        (0.0, 2.0, "Dzień dobry."), (2.0, 5.0, "Dziękuję za uwagę."), (5.0, 8.0, "Pytania?"), (8.0, 10.0, "Do widzenia.")]
+    (samples, options), = model.calls
+    assert samples == 6 * SR
+    assert options["language"] == "pl"
+    assert options["condition_on_previous_text"] is False
+    assert "initial_prompt" not in options
+    assert repetition.stats()["redecoded_seconds"] == 6.0
+    assert repetition.stats()["redecoded_spans"] == 1
+
+def test_repair_suppresses_a_loop_that_survives_redecoding():
+    model = FakeModel([seg(0.0, 2.0, "Muzyka"), seg(2.0, 4.0, "Muzyka"), seg(4.0, 6.0, "Muzyka")])
+    repetition = RepetitionFilter(model, {}, sr=SR)
+    repaired = repetition.repair(np.zeros(10 * SR, dtype=np.float32), loop_segments())
+    assert [s["text"] for s in repaired] == ["Dzień dobry.", "Muzyka", "Do widzenia."]
+    assert repetition.suppressed_segments == 2
+    assert repetition.suppressed_seconds == 4.0
+
+def test_repair_without_suspects_does_not_decode():
+    model = FakeModel([])
+    segments = [seg(0.0, 1.0, "Raz"), seg(1.0, 2.0, "Dwa")]
+    assert RepetitionFilter(model, {}).repair(np.zeros(2 * SR, dtype=np.float32), segments) is segments
+    assert model.calls == []
+
+def test_drop_duplicates_across_windows():
+    repetition = RepetitionFilter(FakeModel([]), {})
+    first = repetition.drop_duplicates([seg(0.0, 1.0, "Raz"), seg(1.0, 2.0, "Dwa")])
+    second = repetition.drop_duplicates([seg(2.0, 3.0, "dwa."), seg(3.0, 4.0, "Trzy")])
+    assert [s["text"] for s in first + second] == ["Raz", "Dwa", "Trzy"]
+    assert repetition.stats()["dropped_duplicates"] == 1
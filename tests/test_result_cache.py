@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+
+from result_cache import ResultCache, hash_audio, output_settings
+
+# TranscriptionOptions z engine.py (import silnika wymaga webrtcvad i msgpack).
+@pytest.fixture
+def make_options():
+    pytest.importorskip("webrtcvad")
+    pytest.importorskip("msgpack")
+    from engine import TranscriptionOptions
+    return TranscriptionOptions
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache"))
+
+def test_key_ignores_export_settings(cache, make_options):
+    base = make_options(hardware_mode="cpu")
+    other = make_options(hardware_mode="cpu", export_formats=["srt"], output_dir="/tmp/wyniki", json_compact=True)
+    assert cache.make_key("abc", base) == cache.make_key("abc", other)
+
+@pytest.mark.parametrize("changes", [
+    {"model_size": "small"},
+    {"force_polish": False},
+    {"vad": True},
+    {"enable_speaker_diarization": False},
+    {"hardware_mode": "gpu"},
+    {"quantize": True},
+    {"remove_duplicates": True},
+    {"checkpoints": True},
+    {"speaker_gallery": True},
+    {"video_extraction": "moviepy"},
+])
+def test_key_depends_on_result_settings(cache, make_options, changes):
+    base = make_options(hardware_mode="cpu")
+    changed = make_options(**dict({"hardware_mode": "cpu"}, **changes))
+    assert cache.make_key("abc", base) != cache.make_key("abc", changed)
+
+def test_optional_settings_only_when_enabled(make_options):
+    settings = output_settings(make_options(hardware_mode="cpu"))
+    assert not {"remove_duplicates", "checkpoint_seconds", "speaker_gallery", "video_extraction"} & set(settings)
+
+def test_key_depends_on_audio(cache, make_options):
+    options = make_options()
+    assert cache.make_key("abc", options) != cache.make_key("abd", options)
+
+def test_hash_audio_is_content_based():
+    audio = np.linspace(-1.0, 1.0, 16000).astype(np.float32)
+    assert hash_audio(audio) == hash_audio(audio.astype(np.float64))
+    assert hash_audio(audio) != hash_audio(audio[::-1])
+
+def test_miss_then_hit(cache):
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, {"text": "Dzień dobry"}, [{"start": 0.0, "end": 1.0, "text": "Dzień dobry"}], source="/a.mp3")
+    entry = cache.get("ab" * 32)
+    assert entry["result"] == {"text": "Dzień dobry"}
+    assert entry["segments"][0]["text"] == "Dzień dobry"
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.stats()["entries"] == 1
+
+def test_known_audio_hash_requires_unchanged_file(cache, tmp_path):
+    path = tmp_path / "nagranie.wav"
+    path.write_bytes(b"RIFF")
+    cache.remember_file(str(path), "hash1")
+    assert cache.known_audio_hash(str(path)) == "hash1"
+    path.write_bytes(b"RIFF2")
+    assert cache.known_audio_hash(str(path)) is None
+
+def test_invalidate_by_source(cache):
+    cache.put("aa" * 32, {}, [], source=os.path.abspath("/a.mp3"))
+    cache.put("bb" * 32, {}, [], source=os.path.abspath("/b.mp3"))
+    assert cache.invalidate("/a.mp3") == 1
+    assert cache.get("aa" * 32) is None
+    assert cache.get("bb" * 32) is not None
+
+def test_evicts_least_recently_used(tmp_path):
+    # Limit mieści dwa wpisy po ~2 KB.
+    cache = ResultCache(str(tmp_path / "cache"), max_mb=0.005)
+    text = "x" * 2000
+    cache.put("aa" * 32, {"text": text}, [])
+    cache.put("bb" * 32, {"text": text}, [])
+    cache.get("aa" * 32)
+    cache.put("cc" * 32, {"text": text}, [])
+    assert cache.get("bb" * 32) is None
+    assert cache.get("aa" * 32) is not None
+    assert cache.get("cc" * 32) is not None
@@ -0,0 +1,60 @@
+import pytest
+
+from search_index import SearchIndex, fts_query, split_speakers
+
+def seg(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+def test_fts_query_requires_all_words():
+    assert fts_query("budżet gminy") == '"budżet" "gminy"'
+    assert fts_query("  rada, miasta! ") == '"rada" "miasta"'
+    assert fts_query("...") == ""
+
+def test_fts_query_passes_fts_syntax_through():
+    for query in ['"budżet gminy"', "budż*", "rada OR sejmik", "NEAR(rada miasta)"]:
+        assert fts_query(query) == query
+
+def test_split_speakers_after_diarization():
+    segments = [seg(0, 1, " Osoba1: Dzień dobry"), seg(1, 2, "Mówca7: Witam: wszystkich"), seg(2, 3, " ")]
+    assert split_speakers(segments) == [("Osoba1", "Dzień dobry"), ("Mówca7", "Witam: wszystkich"), (None, "")]
+
+def test_split_speakers_keeps_plain_colons():
+    # Tylko część segmentów ma "prefiks" – to zwykły tekst, a nie wynik diaryzacji.
+    segments = [seg(0, 1, "Uwaga: zaczynamy"), seg(1, 2, "Pierwszy punkt obrad")]
+    assert split_speakers(segments) == [(None, "Uwaga: zaczynamy"), (None, "Pierwszy punkt obrad")]
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "indeks.sqlite"))
+    index.add_segments(str(tmp_path / "wyniki_sesja" / "sesja"),
+                       [seg(0.0, 2.5, "Osoba1: Budżet gminy na przyszły rok"),
+                        seg(2.5, 4.0, "Osoba2: Głosowanie nad budżetem")],
+                       source=str(tmp_path / "sesja.mp3"))
+    index.add_segments(str(tmp_path / "wyniki_wywiad" / "wywiad"), [seg(10.0, 12.0, "Rozmowa o zdrowiu")])
+    return index
+
+def test_search_returns_file_times_and_speaker(index, tmp_path):
+    results = index.search("budzet gminy")
+    assert len(results) == 1
+    result = results[0]
+    assert result["file"] == str(tmp_path / "sesja.mp3")
+    assert (result["start_ms"], result["end_ms"], result["speaker"]) == (0, 2500, "Osoba1")
+    assert result["text"] == "Budżet gminy na przyszły rok"
+
+def test_search_filters(index):
+    assert sorted(r["speaker"] for r in index.search("budż*")) == ["Osoba1", "Osoba2"]
+    assert [r["speaker"] for r in index.search("budż*", speaker="Osoba2")] == ["Osoba2"]
+    assert index.search("zdrowiu", path_filter="wywiad")[0]["start_ms"] == 10000
+    assert index.search("zdrowiu", path_filter="sesja") == []
+
+def test_replace_and_remove_segments(index, tmp_path):
+    base = str(tmp_path / "wyniki_sesja" / "sesja")
+    index.add_segments(base, [seg(0.0, 1.0, "Nowa treść")], replace=True)
+    assert index.search("budżet") == []
+    assert index.stats()["files"] == 2
+    assert index.remove_segments(base, from_ms=0) == 1
+    assert index.search("treść") == []
+
+def test_invalid_query_raises(index):
+    with pytest.raises(Exception, match="Nieprawidłowe zapytanie"):
+        index.search('"niezamknięty')
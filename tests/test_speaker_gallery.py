@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from speaker_gallery import MIN_NEW_SPEAKER_WINDOWS, SpeakerGallery, VectorIndex, cluster_sums
+
+# Rozmiar osadzeń resemblyzer.
+DIM = 256
+
+def voice(seed, n, noise=0.05):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=DIM)
+    base /= np.linalg.norm(base)
+    windows = base + noise * np.random.default_rng(seed + 100).normal(size=(n, DIM))
+    return (windows / np.linalg.norm(windows, axis=1, keepdims=True)).astype(np.float32)
+
+# Nagranie z dwoma mówcami: okna obu głosów i etykiety klastrów (0 i 1).
+def recording(seed_a, seed_b, n=MIN_NEW_SPEAKER_WINDOWS):
+    return np.vstack([voice(seed_a, n), voice(seed_b, n)]), np.array([0] * n + [1] * n)
+
+def test_vector_index_finds_nearest():
+    index = VectorIndex(np.eye(3), dim=3)
+    similarities, positions = index.search(np.array([[0.1, 2.0, 0.0], [0.0, 0.0, -1.0]]))
+    assert positions.tolist()[0] == 1
+    assert similarities[0] == pytest.approx(2.0 / np.hypot(0.1, 2.0), abs=1e-6)
+    assert similarities[1] == pytest.approx(0.0)
+    assert index.add([0.0, 0.0, -3.0]) == 3
+    assert index.search([0.0, 0.0, -1.0])[1].tolist() == [3]
+
+def test_empty_vector_index():
+    similarities, positions = VectorIndex(dim=3).search(np.ones((2, 3)))
+    assert positions.tolist() == [-1, -1]
+
+def test_cluster_sums():
+    labels, sums, counts = cluster_sums(np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]]), [2, 0, 2])
+    assert labels.tolist() == [0, 2]
+    assert sums.tolist() == [[0.0, 1.0], [2.0, 1.0]]
+    assert counts.tolist() == [1, 2]
+
+@pytest.fixture
+def gallery(tmp_path):
+    return SpeakerGallery(str(tmp_path / "mowcy.sqlite"), threshold=0.8)
+
+def test_same_voices_get_same_names_across_files(gallery):
+    first = gallery.match(*recording(1, 2))
+    assert sorted(first.values()) == ["Mówca1", "Mówca2"]
+    second = gallery.match(*recording(2, 3))
+    assert second[0] == first[1]
+    assert second[1] == "Mówca3"
+    assert [s["files"] for s in gallery.speakers()] == [1, 2, 1]
+
+def test_short_unknown_cluster_is_not_added(gallery):
+    embeddings = np.vstack([voice(1, MIN_NEW_SPEAKER_WINDOWS), voice(2, 5)])
+    names = gallery.match(embeddings, [0] * MIN_NEW_SPEAKER_WINDOWS + [1] * 5)
+    assert names == {0: "Mówca1"}
+    assert len(gallery.speakers()) == 1
+
+def test_rename_is_used_by_later_matches_in_other_processes(gallery, tmp_path):
+    gallery.match(*recording(1, 2))
+    assert gallery.rename(1, "Jan Kowalski")
+    assert not gallery.rename(99, "Nikt")
+    # Inny obiekt (jak inny proces) odświeża indeks po zmianie wersji galerii.
+    other = SpeakerGallery(gallery.path)
+    assert other.match(voice(1, 10), [0] * 10) == {0: "Jan Kowalski"}
+
+def test_merge_keeps_target_and_name(gallery):
+    gallery.match(*recording(1, 2))
+    gallery.rename(2, "Anna")
+    assert gallery.merge(1, 2)
+    (speaker,) = gallery.speakers()
+    assert (speaker["id"], speaker["name"], speaker["windows"], speaker["files"]) == (1, "Anna", 2 * MIN_NEW_SPEAKER_WINDOWS, 2)
+    assert not gallery.merge(1, 1)
+    assert not gallery.merge(1, 2)
+
+def test_remove(gallery):
+    gallery.match(*recording(1, 2))
+    assert gallery.remove(1)
+    assert not gallery.remove(1)
+    assert [s["id"] for s in gallery.speakers()] == [2]
+    # Usunięty głos trafia do galerii ponownie jako nowy mówca.
+    assert gallery.match(voice(1, MIN_NEW_SPEAKER_WINDOWS), [0] * MIN_NEW_SPEAKER_WINDOWS) == {0: "Mówca3"}
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("webrtcvad")
+
+from vad import SpeechTimeline, pad_and_merge
+
+SR = 16000
+
+def test_pad_and_merge_pads_and_clips_to_duration():
+    assert pad_and_merge([(0.1, 1.0), (5.0, 9.9)], duration=10.0) == [(0.0, 1.3), (4.7, 10.0)]
+
+def test_pad_and_merge_joins_short_gaps():
+    # Przerwa 0,8 s minus marginesy 2 × 0,3 s = 0,2 s ≤ 0,5 s – jeden fragment.
+    assert pad_and_merge([(1.0, 2.0), (2.8, 4.0)], duration=10.0) == [(0.7, 4.3)]
+
+def test_pad_and_merge_keeps_distant_regions_apart():
+    assert pad_and_merge([(1.0, 2.0), (4.0, 5.0)], duration=10.0) == [(0.7, 2.3), (3.7, 5.3)]
+
+def test_pad_and_merge_drops_short_regions():
+    assert pad_and_merge([(1.0, 1.1), (3.0, 4.0)], duration=10.0) == [(2.7, 4.3)]
+
+def test_timeline_maps_compact_time_to_original():
+    timeline = SpeechTimeline([(2.0, 4.0), (10.0, 11.0)], sr=SR)
+    assert timeline.speech_seconds == pytest.approx(3.0)
+    assert timeline.to_original(0.0) == pytest.approx(2.0)
+    assert timeline.to_original(1.5) == pytest.approx(3.5)
+    assert timeline.to_original(2.0) == pytest.approx(10.0)
+    assert timeline.to_original(2.5) == pytest.approx(10.5)
+    # Czas za końcem bufora zostaje na końcu ostatniego fragmentu.
+    assert timeline.to_original(5.0) == pytest.approx(11.0)
+
+def test_timeline_remaps_segments_in_place():
+    timeline = SpeechTimeline([(2.0, 4.0), (10.0, 11.0)], sr=SR)
+    segments = [{"start": 0.5, "end": 1.9, "text": "a"}, {"start": 2.1, "end": 3.0, "text": "b"}]
+    assert timeline.remap_segments(segments) is segments
+    assert [(seg["start"], seg["end"]) for seg in segments] == [(2.5, 3.9), (10.1, 11.0)]
+
+def test_timeline_bounds_match_sample_slicing():
+    # Tysiące fragmentów o długości niebędącej wielokrotnością próbki – bez narastającego dryfu.
+    regions = [(i * 1.00003, i * 1.00003 + 0.50001) for i in range(5000)]
+    timeline = SpeechTimeline(regions, sr=SR)
+    lengths = timeline.sample_bounds[:, 1] - timeline.sample_bounds[:, 0]
+    last = len(regions) - 1
+    compact_start = lengths[:last].sum() / SR
+    assert timeline.to_original(compact_start) == pytest.approx(timeline.sample_bounds[last, 0] / SR)
+    assert timeline.compact_starts[last] == pytest.approx(compact_start)
+
+def test_empty_timeline():
+    timeline = SpeechTimeline([], sr=SR)
+    assert timeline.speech_seconds == 0.0
+    assert len(timeline.lengths) == 0
+    assert np.asarray(timeline.sample_bounds).shape == (0, 2)
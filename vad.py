@@ -0,0 +1,135 @@
+# Wstępna segmentacja VAD (webrtcvad) – pomijanie ciszy i muzyki przed Whisperem.
+#
+# Wykryte fragmenty mowy (z marginesem i połączone, gdy przerwa jest krótka) są sklejane w jeden
+# krótszy bufor, który trafia do Whispera. SpeechTimeline przelicza znaczniki czasu segmentów
+# z powrotem na oś czasu oryginalnego nagrania, więc SRT/VTT pozostają zsynchronizowane.
+
+import logging
+
+import numpy as np
+import webrtcvad
+
+from audio import SAMPLE_RATE
+
+logger = logging.getLogger("TranscriptionApp")
+
+# webrtcvad obsługuje ramki 10, 20 lub 30 ms.
+FRAME_MS = 30
+# Margines dodawany z obu stron fragmentu mowy oraz maksymalna przerwa, przy której fragmenty są łączone.
+PAD_SECONDS = 0.3
+MERGE_GAP_SECONDS = 0.5
+# Krótsze fragmenty mowy (np. pojedyncze trzaski) są odrzucane.
+MIN_SPEECH_SECONDS = 0.25
+
+# Wykrywanie mowy porcjami (feed) – np. przy odczycie długiego nagrania fragmentami bez bufora całości.
+# Niepełna ramka z końca porcji przechodzi do następnej; finish zwraca fragmenty jak detect_speech.
+class SpeechDetector:
+    def __init__(self, sr=SAMPLE_RATE, aggressiveness=2):
+        self.sr = sr
+        self.vad = webrtcvad.Vad(aggressiveness)
+        self.frame_len = int(sr * FRAME_MS / 1000)
+        self.samples = 0
+        self.regions = []
+        self._frame_index = 0
+        self._region_start = None
+        self._rest = np.zeros(0, dtype=np.int16)
+
+    def feed(self, audio):
+        self.samples += len(audio)
+        pcm = np.concatenate([self._rest, (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)])
+        n_frames = len(pcm) // self.frame_len
+        self._rest = pcm[n_frames * self.frame_len:]
+        data = pcm[:n_frames * self.frame_len].tobytes()
+        frame_bytes = self.frame_len * 2
+        for i in range(n_frames):
+            speech = self.vad.is_speech(data[i * frame_bytes:(i + 1) * frame_bytes], self.sr)
+            index = self._frame_index + i
+            if speech and self._region_start is None:
+                self._region_start = index
+            elif not speech and self._region_start is not None:
+                self.regions.append((self._region_start * FRAME_MS / 1000, index * FRAME_MS / 1000))
+                self._region_start = None
+        self._frame_index += n_frames
+
+    # Zwraca listę fragmentów mowy [(początek_s, koniec_s), ...] w osi czasu nagrania.
+    def finish(self):
+        regions = list(self.regions)
+        if self._region_start is not None:
+            regions.append((self._region_start * FRAME_MS / 1000, self._frame_index * FRAME_MS / 1000))
+        return pad_and_merge(regions, self.samples / self.sr)
+
+# Zwraca listę fragmentów mowy [(początek_s, koniec_s), ...] w osi czasu nagrania.
+def detect_speech(audio, sr=SAMPLE_RATE, aggressiveness=2):
+    detector = SpeechDetector(sr=sr, aggressiveness=aggressiveness)
+    detector.feed(audio)
+    return detector.finish()
+
+# Dodaje margines, łączy fragmenty oddzielone krótką przerwą i odrzuca zbyt krótkie.
+def pad_and_merge(regions, duration, pad=PAD_SECONDS, merge_gap=MERGE_GAP_SECONDS, min_speech=MIN_SPEECH_SECONDS):
+    merged = []
+    for start, end in regions:
+        if end - start < min_speech:
+            continue
+        start = max(0.0, start - pad)
+        end = min(duration, end + pad)
+        if merged and start - merged[-1][1] <= merge_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+# Mapa sklejonego bufora mowy na oś czasu oryginalnego nagrania.
+# Granice liczone są w próbkach (tak jak wycinanie bufora), więc przy tysiącach fragmentów nie narasta dryf.
+class SpeechTimeline:
+    def __init__(self, regions, sr=SAMPLE_RATE):
+        bounds = np.array([(int(start * sr), int(end * sr)) for start, end in regions], dtype=np.int64).reshape(-1, 2)
+        self.sample_bounds = bounds
+        self.orig_starts = bounds[:, 0] / sr
+        lengths = (bounds[:, 1] - bounds[:, 0]) / sr
+        self.compact_starts = np.concatenate([[0.0], np.cumsum(lengths)[:-1]]) if len(regions) else np.zeros(0)
+        self.lengths = lengths
+
+    @property
+    def speech_seconds(self):
+        return float(self.lengths.sum())
+
+    def to_original(self, t):
+        idx = int(np.searchsorted(self.compact_starts, t, side="right")) - 1
+        idx = max(0, min(idx, len(self.compact_starts) - 1))
+        return float(self.orig_starts[idx] + min(t - self.compact_starts[idx], self.lengths[idx]))
+
+    # Przelicza start/end segmentów Whispera (in place) na czas oryginalnego nagrania.
+    def remap_segments(self, segments):
+        for seg in segments:
+            seg["start"] = round(self.to_original(seg["start"]), 3)
+            seg["end"] = round(self.to_original(seg["end"]), 3)
+        return segments
+
+# Wycina z bufora same fragmenty mowy. Zwraca (sklejony bufor, SpeechTimeline).
+def compact_speech(audio, sr=SAMPLE_RATE, aggressiveness=2):
+    regions = detect_speech(audio, sr=sr, aggressiveness=aggressiveness)
+    timeline = SpeechTimeline(regions, sr=sr)
+    if not regions:
+        return np.zeros(0, dtype=np.float32), timeline
+    compact = np.concatenate([audio[start:end] for start, end in timeline.sample_bounds])
+    return compact, timeline
+
+# Opis do logu: jaka część nagrania została pominięta i jakiego przyspieszenia dekodowania można się spodziewać.
+def format_vad_stats(total_seconds, timeline):
+    speech = timeline.speech_seconds
+    skipped = 1.0 - speech / total_seconds if total_seconds > 0 else 0.0
+    speedup = total_seconds / speech if speech > 0 else float("inf")
+    return (f"VAD: mowa {speech:.1f} s z {total_seconds:.1f} s ({len(timeline.lengths)} fragmentów), "
+            f"pominięto {skipped:.0%} nagrania, szacowane przyspieszenie dekodowania {speedup:.1f}x")
+
+# Transkrypcja samych fragmentów mowy: Whisper dostaje sklejony bufor, a segmenty wyniku
+# mają znaczniki czasu przeliczone na oryginalne nagranie. Zwraca (wynik Whispera, SpeechTimeline).
+def transcribe_with_vad(model, audio, sr=SAMPLE_RATE, aggressiveness=2, **transcribe_options):
+    compact, timeline = compact_speech(audio, sr=sr, aggressiveness=aggressiveness)
+    logger.info(format_vad_stats(len(audio) / sr, timeline))
+    if len(compact) == 0:
+        logger.warning("VAD nie wykrył mowy – pomijam dekodowanie Whisperem.")
+        return {"text": "", "segments": [], "language": transcribe_options.get("language")}, timeline
+    result = model.transcribe(compact, **transcribe_options)
+    timeline.remap_segments(result.get("segments", []))
+    return result, timeline